@@ -0,0 +1,73 @@
+"""
+命令行启动时间预算：--help 和本地子命令必须在 STARTUP_BUDGET_SECONDS 内完成，
+并且不能加载重量级依赖
+
+运行方式（在 backend 目录下）：
+    python -m benchmarks.bench_cli_startup
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 每条命令的启动时间上限（秒，取多次运行的中位数）
+STARTUP_BUDGET_SECONDS = 0.15
+RUNS = 7
+COMMANDS = [
+    ['--help'],
+    ['search', '--help'],
+    ['simulate', '--help'],
+    ['config', '--help'],
+    ['count-rows', '--help'],
+    ['simulate', '--output', os.devnull],
+    ['search', '左上2并1'],
+]
+# 这些模块只应在真正需要它们的子命令里导入
+HEAVY_MODULES = ['openai', 'google.genai', 'pytesseract', 'dotenv', 'PIL', 'pdf2image', 'flask', 'pypdf']
+
+
+def heavy_modules_loaded(args):
+    """运行一条命令，返回其间被导入的重量级模块"""
+    code = (
+        "import sys, cli\n"
+        f"sys.argv = ['cli.py'] + {args!r}\n"
+        "try:\n"
+        "    cli.cli()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('HEAVY:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    marker = [line for line in result.stdout.splitlines() if line.startswith('HEAVY:')]
+    if not marker:
+        raise RuntimeError(result.stderr)
+    return [module for module in marker[-1][len('HEAVY:'):].split(',') if module]
+
+
+def median_time(command):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    # 作为参照：空的 Python 进程
+    baseline = median_time([sys.executable, '-c', 'pass'])
+    print(f"空 Python 进程: {baseline * 1000:.0f} ms，预算: {STARTUP_BUDGET_SECONDS * 1000:.0f} ms")
+    failed = False
+    for args in COMMANDS:
+        elapsed = median_time([sys.executable, 'cli.py'] + args)
+        heavy = heavy_modules_loaded(args)
+        ok = elapsed <= STARTUP_BUDGET_SECONDS and not heavy
+        failed |= not ok
+        print(f"{'OK ' if ok else 'FAIL'} {' '.join(args):<20} {elapsed * 1000:>6.0f} ms  重量级模块: {', '.join(heavy) or '无'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
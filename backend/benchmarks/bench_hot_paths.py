@@ -0,0 +1,295 @@
+"""
+本地文本处理热点的微基准：用合成的编织图解按规模（文本大小、部分数、重复长度）逐级放大，
+每次运行的结果追加到临时目录下的 knitting_benchmarks/hot_paths.jsonl（可用 --results-file 指定），并与上一次运行对比，
+同时按最小、最大规模估计时间随规模增长的阶数，用来发现变慢和复杂度退化
+全部离线运行：被测对象用 __new__ 创建，不初始化 API 客户端；需要的依赖没有安装时跳过对应用例
+
+运行方式（在 backend 目录下）：
+    python -m benchmarks.bench_hot_paths
+    python -m benchmarks.bench_hot_paths --quick --filter split
+    python -m benchmarks.bench_hot_paths --results-file ~/bench/hot_paths.jsonl
+安装了 pytest-benchmark 时也可以用 pytest 运行（结果由 pytest-benchmark 保存）：
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-autosave
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+# 结果默认写到临时目录，不在仓库里留下未跟踪的文件
+RESULTS_FILE = os.path.join(tempfile.gettempdir(), 'knitting_benchmarks', 'hot_paths.jsonl')
+# 比上一次运行慢这么多倍时标记为变慢
+REGRESSION_RATIO = 1.3
+# 时间随规模增长的阶数超过这个值时标记为超线性（这些用例都应该是线性的）
+SUPERLINEAR_EXPONENT = 1.3
+# 每个用例至少运行的轮数和总时间（秒）
+MIN_ROUNDS = 3
+MIN_TIME = 0.2
+MAX_ROUNDS = 100
+
+ROW_TEMPLATES = [
+    "第{row}行: 3下,【(左上 2 并1) 3次，(空加针，1 下) 5 次，空加针，(右 上2并1) 3次，1上】重复【 】再9次",
+    "第{row}行: 20 上,【1 下，17 上】到最后 3针，3 上",
+    "第{row} (72 - 78 - 84 - 84 - 84 - 92 - 92)行: 2 下，空加针，右上2并1，16 下",
+    "第{row}行: 46下, 收10针，下针到剩56针, 收10针，下针到底",
+]
+OCR_LINES = [
+    "第 62行: 1下， 右上2并1，下针到底一一剩45针",
+    "重复 第 62 行一一(45) 针",
+    "沿领窜共减了 8 次，碱了4次",
+    "用 3. 5mm 环针，起 370 《406 二 442》针",
+]
+SIZE_SEQUENCES = ["(406 - 442 - 478 - 514 - 586)", "(x-x-66-66-72)", "(S - M - L - XL)", "(左上 2 并1)"]
+
+
+def synthetic_rows(count: int, start: int = 1, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(ROW_TEMPLATES).format(row=row) for row in range(start, start + count)]
+
+
+def synthetic_pattern(sections: int, rows_per_section: int = 20, seed: int = 0) -> str:
+    """sections 个 # 标题的部分，每部分 rows_per_section 行，行号连续"""
+    lines = []
+    for i in range(sections):
+        lines.append(f"# 部分{i + 1}")
+        lines.extend(synthetic_rows(rows_per_section, i * rows_per_section + 1, seed + i))
+        lines.append(f"第 {i * rows_per_section + 1}-{(i + 1) * rows_per_section}行的所有奇数行: 上针")
+    return '\n'.join(lines)
+
+
+def synthetic_size_text(lines: int, seed: int = 0) -> str:
+    """含尺码序列的文本，每隔一段插入跨行的尺码括号"""
+    rng = random.Random(seed)
+    result = []
+    for i in range(lines):
+        if i % 50 == 49:
+            result.extend(["重复【 】再8 (9 - 10 - 11", "- 11 - 14 - 15 - 16) 次"])
+        else:
+            result.append(rng.choice(ROW_TEMPLATES).format(row=i + 1))
+    return '\n'.join(result)
+
+
+def repeat_section(repeat_length: int) -> Dict[str, str]:
+    """根解析器能展开的重复说明：重复的区间长度为 repeat_length"""
+    return {"title": "重复", "content": f"第1行: 下针\n第1行: 重复第1行到第{repeat_length}行再1次\n"}
+
+
+def sparse_section(rows: int) -> str:
+    """只写了少数行、其余行由奇偶规则补全的部分"""
+    lines = [f"第{row}行: 3下，空加针" for row in range(1, rows + 1, 10)]
+    return '\n'.join(lines + ["所有奇数行: 上针", "所有偶数行: 下针"]) + '\n'
+
+
+@contextlib.contextmanager
+def quiet():
+    """被测函数里的调试输出不计入耗时"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def setup_split_row_counter(size):
+    from count_rows import RowCounter
+    return RowCounter.__new__(RowCounter).split_pattern_by_sections, (synthetic_pattern(size),)
+
+
+def setup_split_parser(size):
+    from parser.knitting_parser import KnittingPatternParser
+    return KnittingPatternParser.__new__(KnittingPatternParser).split_pattern_by_sections, (synthetic_pattern(size),)
+
+
+def setup_split_root_parser(size):
+    from knitting_parser import KnittingPatternParser
+    parser = KnittingPatternParser.__new__(KnittingPatternParser)
+
+    def split(text):
+        with quiet():
+            return parser.split_pattern_by_sections(text)
+    return split, (synthetic_pattern(size),)
+
+
+def setup_preprocess_text(size):
+    from parser.size_extractor import SizeExtractor
+    return SizeExtractor.__new__(SizeExtractor).preprocess_text, (synthetic_size_text(size),)
+
+
+def setup_is_size_sequence(size):
+    from parser.size_extractor import SizeExtractor
+    extractor = SizeExtractor.__new__(SizeExtractor)
+    items = [SIZE_SEQUENCES[i % len(SIZE_SEQUENCES)] for i in range(size)]
+
+    def check_all(items):
+        return sum(1 for item in items if extractor.is_size_sequence(item))
+    return check_all, (items,)
+
+
+def setup_post_processor(size):
+    from ocr.ocr_post_processor import OCRPostProcessor
+    text = '\n'.join(OCR_LINES[i % len(OCR_LINES)] for i in range(size))
+    return OCRPostProcessor().process, (text,)
+
+
+def setup_root_parse_section(size):
+    from knitting_parser import KnittingPatternParser
+    parser = KnittingPatternParser.__new__(KnittingPatternParser)
+
+    def parse(section):
+        with quiet():
+            return parser.parse_section(section)
+    return parse, (repeat_section(size),)
+
+
+def setup_fill_missing_rows(size):
+    from knitting_parser import KnittingPatternParser
+    parser = KnittingPatternParser.__new__(KnittingPatternParser)
+    return parser.fill_missing_rows, (sparse_section(size), 1, size)
+
+
+def setup_extracted_sizes(size):
+    import main
+    directory = tempfile.mkdtemp(prefix='bench_hot_paths_')
+    os.makedirs(os.path.join(directory, 'data', 'processed'))
+    with open(os.path.join(directory, 'data', 'processed', 'extracted_sizes.txt'), 'w', encoding='utf-8') as f:
+        f.write(synthetic_pattern(size))
+
+    def load():
+        # load_extracted_sections 按相对路径读取文件
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            return main.load_extracted_sections()
+        finally:
+            os.chdir(cwd)
+    return load, ()
+
+
+# (名称, 规模的含义, 各级规模, 准备函数)
+CASES: List[Tuple[str, str, List[int], Callable[[int], Tuple[Callable, tuple]]]] = [
+    ('split_sections/row_counter', '部分数', [10, 100, 1000], setup_split_row_counter),
+    ('split_sections/parser', '部分数', [10, 100, 1000], setup_split_parser),
+    ('split_sections/root_parser', '部分数', [10, 100, 1000], setup_split_root_parser),
+    ('size_extractor/preprocess_text', '行数', [1000, 10000, 50000], setup_preprocess_text),
+    ('size_extractor/is_size_sequence', '括号数', [1000, 10000, 100000], setup_is_size_sequence),
+    ('ocr_post_processor/process', '行数', [1000, 10000, 50000], setup_post_processor),
+    ('root_parser/parse_section_repeat', '重复长度', [100, 1000, 10000], setup_root_parse_section),
+    ('root_parser/fill_missing_rows', '行数', [100, 1000, 10000], setup_fill_missing_rows),
+    ('main/extracted_sizes', '部分数', [10, 100, 1000], setup_extracted_sizes),
+]
+
+
+class Benchmark:
+    """与 pytest-benchmark 的 benchmark 夹具用法相同：benchmark(func, *args) 运行并计时，返回 func 的结果"""
+    def __init__(self):
+        self.times: List[float] = []
+
+    def __call__(self, func, *args):
+        result = None
+        total = 0.0
+        while len(self.times) < MAX_ROUNDS and (len(self.times) < MIN_ROUNDS or total < MIN_TIME):
+            start = time.perf_counter()
+            result = func(*args)
+            self.times.append(time.perf_counter() - start)
+            total += self.times[-1]
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {"min": min(self.times), "median": statistics.median(self.times), "rounds": len(self.times)}
+
+
+def pytest_generate_tests(metafunc):
+    """用 pytest 运行时按 CASES 生成用例；作为脚本运行时不需要 pytest"""
+    if 'setup' in metafunc.fixturenames:
+        metafunc.parametrize('name,unit,sizes,setup', CASES, ids=[case[0] for case in CASES])
+
+
+def test_hot_path(benchmark, name, unit, sizes, setup):
+    func, args = setup(sizes[-1])
+    benchmark(func, *args)
+
+
+def scaling_exponent(results: List[Dict[str, Any]]) -> float:
+    """最小、最大规模之间耗时增长的阶数：线性约为 1，平方约为 2"""
+    first, last = results[0], results[-1]
+    if first["min"] <= 0 or last["size"] == first["size"]:
+        return 0.0
+    return math.log(last["min"] / first["min"]) / math.log(last["size"] / first["size"])
+
+
+def load_previous(results_file: str) -> Dict[Tuple[str, int], float]:
+    if not os.path.exists(results_file):
+        return {}
+    try:
+        with open(results_file, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()]
+        last = json.loads(lines[-1]) if lines else {}
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"读取上一次的基准结果出错: {e}")
+        return {}
+    return {(result["name"], result["size"]): result["min"] for result in last.get("results", [])}
+
+
+def run(cases, quick: bool = False) -> List[Dict[str, Any]]:
+    results = []
+    for name, unit, sizes, setup in cases:
+        case_results = []
+        for size in sizes[:2] if quick else sizes:
+            try:
+                func, args = setup(size)
+            except ImportError as e:
+                print(f"{name}: 缺少依赖，跳过（{e}）")
+                break
+            benchmark = Benchmark()
+            benchmark(func, *args)
+            case_results.append({"name": name, "unit": unit, "size": size, **benchmark.stats()})
+        if len(case_results) > 1:
+            case_results[-1]["exponent"] = round(scaling_exponent(case_results), 2)
+        results.extend(case_results)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--quick', action='store_true', help='每个用例只跑最小的两级规模')
+    parser.add_argument('--filter', default='', help='只运行名称包含该字符串的用例')
+    parser.add_argument('--results-file', default=RESULTS_FILE, help='结果追加写入的文件，默认在临时目录下')
+    parser.add_argument('--no-save', action='store_true', help='不保存本次结果')
+    args = parser.parse_args()
+
+    previous = load_previous(args.results_file)
+    results = run([case for case in CASES if args.filter in case[0]], args.quick)
+
+    print(f"{'用例':<36} {'规模':>14} {'最短(ms)':>10} {'中位数(ms)':>10} {'轮数':>5} {'对比上次':>9}")
+    for result in results:
+        size = f"{result['size']} {result['unit']}"
+        line = (f"{result['name']:<36} {size:>14} {result['min'] * 1000:>10.3f} "
+                f"{result['median'] * 1000:>10.3f} {result['rounds']:>5}")
+        before = previous.get((result['name'], result['size']))
+        if before:
+            ratio = result['min'] / before
+            line += f" {ratio:>8.2f}x" + (' 变慢' if ratio > REGRESSION_RATIO else '')
+        print(line)
+        if 'exponent' in result:
+            flag = ' 超线性' if result['exponent'] > SUPERLINEAR_EXPONENT else ''
+            print(f"{'':<36} 增长阶数 {result['exponent']:.2f}{flag}")
+
+    if results and not args.no_save:
+        os.makedirs(os.path.dirname(args.results_file), exist_ok=True)
+        with open(args.results_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                "time": time.strftime('%Y-%m-%d %H:%M:%S'),
+                "python": sys.version.split()[0],
+                "quick": args.quick,
+                "results": results
+            }, ensure_ascii=False) + '\n')
+        print(f"结果已追加到 {args.results_file}")
+
+
+if __name__ == '__main__':
+    main()
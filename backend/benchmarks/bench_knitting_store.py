@@ -0,0 +1,94 @@
+"""
+KnittingData 存储格式基准：JSON（indent=2）与二进制格式的体积、整体读取、读取单个部分
+
+运行方式（在 backend 目录下）：
+    python -m benchmarks.bench_knitting_store
+"""
+import json
+import os
+import random
+import tempfile
+import time
+from parser.knitting_store import save_knitting_data, load_knitting_data, KnittingStore
+
+INSTRUCTIONS = [
+    ("上针", [{"repeat": 1, "stitches": [{"stitch_type": "上针"}]}]),
+    ("下针", [{"repeat": 1, "stitches": [{"stitch_type": "下针"}]}]),
+    ("1下， 右上2并1，下针到底", [{"repeat": 1, "stitches": [{"stitch_type": "下针"}, {"stitch_type": "右上二并一"}]}]),
+    ("【左上 2 并1，空加针】到最后1针，1 下", [{"repeat": 202, "stitches": [{"stitch_type": "左上2并1"}, {"stitch_type": "空加针"}]}]),
+    ("20 上,【1 下，17 上】到最后 3针，3 上", [{"repeat": 21, "stitches": [{"stitch_type": "下针"}, {"stitch_type": "上针"}]}]),
+]
+REPEATS = 20
+
+
+def synthetic_data(section_count, rows_per_section, seed=0):
+    """生成 section_count 个部分、每部分 rows_per_section 行的解析结果"""
+    rng = random.Random(seed)
+    sections = []
+    row_number = 1
+    for i in range(section_count):
+        rows = [{"type": "meta", "instruction": f"第{i}部分说明"}]
+        for _ in range(rows_per_section):
+            text, repeat = rng.choice(INSTRUCTIONS)
+            rows.append({
+                "type": "row",
+                "row_number": row_number,
+                "stitches_per_row": rng.randrange(10, 400),
+                "instruction": f"第{row_number}行: {text}",
+                "stitch_repeat": repeat
+            })
+            row_number += 1
+        sections.append({"section_title": f"部分{i}", "start_row": row_number - rows_per_section,
+                         "end_row": row_number - 1, "rows": rows})
+    pattern_text = '\n'.join(row["instruction"] for section in sections for row in section["rows"])
+    return "合成图解", pattern_text, {"sections": sections, "total_rows": row_number - 1}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = func(*args)
+    return (time.perf_counter() - start) / REPEATS * 1000, result
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_json_section(path, index):
+    return load_json(path)["pattern_json"]["sections"][index]
+
+
+def load_binary_section(path, index):
+    with KnittingStore(path) as store:
+        return store.section(index)
+
+
+def main():
+    print(f"{'部分x行':>10} {'JSON(KB)':>9} {'二进制(KB)':>10} {'JSON读(ms)':>10} {'二进制读(ms)':>12} "
+          f"{'JSON单部分':>10} {'二进制单部分':>12}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path = os.path.join(temp_dir, 'knitting_data.json')
+        binary_path = os.path.join(temp_dir, 'knitting_data.knit')
+        for section_count, rows_per_section in [(13, 20), (50, 100), (200, 200)]:
+            title, pattern_text, pattern_json = synthetic_data(section_count, rows_per_section)
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({"title": title, "pattern_text": pattern_text, "pattern_json": pattern_json},
+                          f, ensure_ascii=False, indent=2)
+            save_knitting_data(binary_path, title, pattern_text, pattern_json)
+            assert load_knitting_data(binary_path) == (title, pattern_text, pattern_json)
+
+            middle = section_count // 2
+            json_time, _ = timed(load_json, json_path)
+            binary_time, _ = timed(load_knitting_data, binary_path)
+            json_section_time, expected = timed(load_json_section, json_path, middle)
+            binary_section_time, section = timed(load_binary_section, binary_path, middle)
+            assert section == expected
+            print(f"{section_count:>4}x{rows_per_section:<5} {os.path.getsize(json_path) / 1024:>9.1f} "
+                  f"{os.path.getsize(binary_path) / 1024:>10.1f} {json_time:>10.2f} {binary_time:>12.2f} "
+                  f"{json_section_time:>10.2f} {binary_section_time:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
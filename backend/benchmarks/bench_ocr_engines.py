@@ -0,0 +1,81 @@
+"""
+OCR 引擎逐页延迟对比：pytesseract（每次调用启动 tesseract 进程）与常驻引擎池（tesserocr）
+两种引擎使用相同的预处理和 OCR_CONFIG；第一页单独列出（引擎池的初始化开销算在第一页里）
+
+运行方式（在 backend 目录下，需要安装 tesseract、chi_sim 语言包和 tesserocr）：
+    python -m benchmarks.bench_ocr_engines ../data/raw/imgs
+    python -m benchmarks.bench_ocr_engines ../data/raw/imgs --layout
+"""
+import argparse
+import os
+import statistics
+import time
+
+from PIL import Image
+
+from ocr.image_to_text import ROOT_DIR, OCR_CONFIG, list_images, preprocess_image, ocr_page
+from ocr.layout_analyzer import analyze_pages
+from ocr.tesseract_pool import ENGINES, PytesseractEngine, TesseractPool, DEFAULT_POOL_SIZE
+
+
+def time_engine(create_engine, images, layouts):
+    """返回 (引擎初始化耗时, 每页耗时列表, 每页文本)"""
+    start = time.perf_counter()
+    engine = create_engine()
+    setup = time.perf_counter() - start
+    times, texts = [], []
+    try:
+        for path, image in images:
+            start = time.perf_counter()
+            texts.append(ocr_page(image, layouts.get(path), engine))
+            times.append(time.perf_counter() - start)
+    finally:
+        engine.close()
+    return setup, times, texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('image_dir', nargs='?', default=os.path.join(ROOT_DIR, 'data', 'raw', 'imgs'))
+    parser.add_argument('--layout', action='store_true', help='先做版面分析，按文字块识别')
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE)
+    args = parser.parse_args()
+
+    paths = list_images(args.image_dir)
+    if not paths:
+        raise SystemExit(f"{args.image_dir} 中没有 PNG 图片")
+    images = [(path, preprocess_image(Image.open(path))) for path in paths]
+    layouts = {}
+    if args.layout:
+        layouts = {layout.path: layout for layout in analyze_pages(paths, preprocess=preprocess_image)}
+
+    creators = {
+        'pytesseract': lambda: PytesseractEngine('chi_sim', OCR_CONFIG),
+        'pool': lambda: TesseractPool('chi_sim', OCR_CONFIG, args.pool_size),
+    }
+    results = {}
+    for name in ENGINES:
+        try:
+            results[name] = time_engine(creators[name], images, layouts)
+        except ImportError as e:
+            print(f"跳过 {name}: {e}")
+
+    print(f"{len(images)} 页，{'按文字块' if args.layout else '整页'}识别，引擎池大小 {args.pool_size}")
+    print(f"{'引擎':<12} {'初始化':>8} {'第一页':>8} {'中位数':>8} {'平均':>8} {'总计':>8}  (ms)")
+    for name, (setup, times, _) in results.items():
+        rest = times[1:] or times
+        print(f"{name:<12} {setup * 1000:>8.0f} {times[0] * 1000:>8.0f} "
+              f"{statistics.median(rest) * 1000:>8.0f} {statistics.mean(rest) * 1000:>8.0f} "
+              f"{(setup + sum(times)) * 1000:>8.0f}")
+
+    if len(results) == len(ENGINES):
+        base_times, pool_times = results['pytesseract'][1], results['pool'][1]
+        print("\n逐页对比 (ms):")
+        for (path, _), base, pool in zip(images, base_times, pool_times):
+            print(f"  {os.path.basename(path):<24} {base * 1000:>8.0f} {pool * 1000:>8.0f}  x{base / pool:.1f}")
+        differing = sum(a != b for a, b in zip(results['pytesseract'][2], results['pool'][2]))
+        print(f"识别结果不同的页: {differing}")
+
+
+if __name__ == '__main__':
+    main()
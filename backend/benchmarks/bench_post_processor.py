@@ -0,0 +1,75 @@
+"""
+OCRPostProcessor 吞吐量基准：术语规则数量增长时，逐条替换与字典树单次扫描的对比
+
+运行方式（在 backend 目录下）：
+    python -m benchmarks.bench_post_processor
+"""
+import random
+import re
+import time
+from ocr.ocr_post_processor import OCRPostProcessor
+from ocr.correction_rules import TERM_MAPPING, REMOVE_PATTERNS, NUMBER_PATTERNS, BRACKET_PATTERNS, CONTEXT_PATTERNS
+
+SAMPLE_LINES = [
+    "第 62行: 1下， 右上2并1，下针到底一一剩45针",
+    "第10行: 3下,【(左上 2 并1) 3次，(空加针，1 下) 5 次，空加针，(右 上2并1) 3次，1上】",
+    "重复 第 62 行一一(45) 针",
+    "沿领窜共减了 8 次，碱了4次",
+    "用 3. 5mm 环针，起 370 《406 二 442》针",
+]
+RULE_COUNTS = [10, 100, 1000, 5000, 20000]
+TEXT_LINES = 5000
+
+
+def legacy_process(text, term_mapping):
+    """改造前的实现：每条规则各扫描一遍全文"""
+    for pattern in REMOVE_PATTERNS:
+        text = re.compile(pattern).sub('', text)
+    for pattern, replacement in NUMBER_PATTERNS:
+        text = re.compile(pattern).sub(replacement, text)
+    for old, new in BRACKET_PATTERNS:
+        text = text.replace(old, new)
+    for pattern, replacement in CONTEXT_PATTERNS:
+        text = re.compile(pattern).sub(replacement, text)
+    for old, new in term_mapping.items():
+        text = text.replace(old, new)
+    return text
+
+
+def synthetic_terms(count, seed=0):
+    """生成 count 条虚构的 错字->正字 规则（由常用字随机组合）"""
+    rng = random.Random(seed)
+    chars = [chr(code) for code in range(0x4e00, 0x4e00 + 2000)]
+    terms = dict(TERM_MAPPING)
+    while len(terms) < count:
+        wrong = ''.join(rng.choice(chars) for _ in range(rng.randint(2, 4)))
+        terms[wrong] = wrong[::-1]
+    return terms
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    text = '\n'.join(SAMPLE_LINES[i % len(SAMPLE_LINES)] for i in range(TEXT_LINES))
+    size_mb = len(text.encode('utf-8')) / 1024 / 1024
+    print(f"文本大小: {size_mb:.2f} MB")
+    print(f"{'规则数':>8} {'逐条(MB/s)':>12} {'字典树(MB/s)':>12} {'编译(ms)':>10}")
+    for count in RULE_COUNTS:
+        terms = synthetic_terms(count)
+        start = time.perf_counter()
+        processor = OCRPostProcessor(term_mapping=terms)
+        compile_ms = (time.perf_counter() - start) * 1000
+        legacy = timed(legacy_process, text, terms)
+        compiled = timed(processor.process, text)
+        print(f"{count:>8} {size_mb / legacy:>12.2f} {size_mb / compiled:>12.2f} {compile_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
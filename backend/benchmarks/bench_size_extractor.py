@@ -0,0 +1,95 @@
+"""
+SizeExtractor.preprocess_text 基准：合成的编织图解文本，其中夹杂OCR造成的未闭合括号
+
+运行方式（在 backend 目录下）：
+    python -m benchmarks.bench_size_extractor
+"""
+import random
+import time
+from parser.size_extractor import SizeExtractor
+
+SAMPLE_LINES = [
+    "用 3.5mm 环针，起 370 (406 - 442 - 478 - 514 - 586 - 622 - 658)针",
+    "第72 (72 - 78 - 84 - 84 - 84 - 92 - 92)行和第92 (82 - 100 - 102 - 102 - 102 - 112 - 112) 行各增加一个扣眼",
+    "第10行: 3下,【(左上 2 并1) 3次，(空加针，1 下) 5 次，空加针，(右 上2并1) 3次，1上】",
+    "重复【 】再8 (9 - 10 - 11",
+    "- 11 - 14 - 15 - 16) 次",
+    "第 61行: 上针",
+]
+# 旧实现为平方复杂度，只在较小的文本上运行
+LEGACY_MAX_BYTES = 1024 * 1024
+
+
+def synthetic_pattern(size_bytes, unbalanced_every=200, seed=0):
+    """
+    生成约 size_bytes 大小的图解文本，每隔若干行插入一个OCR漏掉右括号或左括号的行，
+    使远处的左括号被很久之后的右括号闭合
+    """
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size_bytes:
+        roll = rng.randrange(unbalanced_every)
+        if roll == 0:
+            line = "第 9行(反面: 上针"
+        elif roll == 1:
+            line = "第 12行: 2 下)，空加针"
+        else:
+            line = rng.choice(SAMPLE_LINES)
+        lines.append(line)
+        total += len(line.encode('utf-8')) + 1
+    return '\n'.join(lines)
+
+
+def legacy_preprocess(extractor, text):
+    """改造前的实现：逐字符拼接字符串，每个右括号都对括号内容切片"""
+    text = extractor.normalize_brackets(text)
+    processed_lines = []
+    current_line = ""
+    bracket_stack = []
+    for line in text.split('\n'):
+        for char in line:
+            if char in ['(', '（']:
+                bracket_stack.append(len(current_line))
+                current_line += '('
+            elif char in [')', '）']:
+                if bracket_stack:
+                    start_pos = bracket_stack.pop()
+                    extractor.is_size_sequence(current_line[start_pos:])
+                current_line += ')'
+            else:
+                current_line += char
+        if not bracket_stack:
+            processed_lines.append(current_line)
+            current_line = ""
+        else:
+            current_line += ' '
+    if current_line:
+        processed_lines.append(current_line)
+    return '\n'.join(processed_lines)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    # 预处理不需要 API 客户端
+    extractor = SizeExtractor.__new__(SizeExtractor)
+    print(f"{'大小(KB)':>10} {'旧实现(s)':>10} {'新实现(s)':>10} {'尺码括号数':>10}")
+    for size_kb in [64, 256, 1024, 4096]:
+        text = synthetic_pattern(size_kb * 1024)
+        new_time, (merged, spans) = timed(extractor.preprocess_with_spans, text)
+        if size_kb * 1024 <= LEGACY_MAX_BYTES:
+            legacy_time, legacy_merged = timed(legacy_preprocess, extractor, text)
+            assert legacy_merged == merged
+            legacy = f"{legacy_time:.3f}"
+        else:
+            legacy = '-'
+        print(f"{size_kb:>10} {legacy:>10} {new_time:>10.3f} {len(spans):>10}")
+
+
+if __name__ == '__main__':
+    main()
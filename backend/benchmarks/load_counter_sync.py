@@ -0,0 +1,123 @@
+"""
+计数器同步的压测：大量空闲连接 + 一次广播
+
+默认在进程内测试 CounterHub：每个连接一个线程阻塞在 channel.wait 上（与 threaded Flask 中
+SSE 连接的占用方式相同），测量空闲时的 CPU 占用和一次发布扇出到所有连接的耗时。
+指定 --url 时对运行中的服务端（python main.py）建立真实的 SSE 连接：
+
+运行方式（在 backend 目录下）：
+    python -m benchmarks.load_counter_sync --connections 2000
+    python -m benchmarks.load_counter_sync --connections 2000 --url http://localhost:8080
+"""
+import argparse
+import json
+import selectors
+import socket
+import threading
+import time
+import urllib.request
+from urllib.parse import urlparse
+from counter_sync import CounterHub
+
+PATTERN_ID = 'bench'
+# 空闲连接分布在这么多个用户频道上
+USERS = 10
+
+
+def run_in_process(connections, idle_seconds):
+    hub = CounterHub()
+    # 数千个线程时减小线程栈
+    threading.stack_size(256 * 1024)
+    received = []
+    ready = threading.Barrier(connections + 1)
+    lock = threading.Lock()
+
+    def client(user_id):
+        channel = hub.channel(PATTERN_ID, user_id)
+        ready.wait()
+        events, _ = channel.wait(0, idle_seconds + 30)
+        with lock:
+            received.append((time.perf_counter(), events[0]['id'] if events else None))
+
+    threads = [threading.Thread(target=client, args=(f'user{i % USERS}',), daemon=True) for i in range(connections)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+
+    cpu_start = time.process_time()
+    time.sleep(idle_seconds)
+    idle_cpu = time.process_time() - cpu_start
+
+    start = time.perf_counter()
+    for i in range(USERS):
+        hub.publish(PATTERN_ID, f'user{i}', {'section_id': 'section-1', 'current': 12})
+    for thread in threads:
+        thread.join()
+    fanout = max(at for at, _ in received) - start
+    assert len(received) == connections and all(event_id == 1 for _, event_id in received)
+    print(f"进程内: {connections} 个空闲连接，空闲 {idle_seconds}s 期间 CPU {idle_cpu * 1000:.1f} ms，"
+          f"广播到全部连接 {fanout * 1000:.1f} ms")
+
+
+def run_against_server(url, connections, idle_seconds):
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for i in range(connections):
+        sock = socket.create_connection((host, port))
+        path = f"/api/counter/{PATTERN_ID}/user{i % USERS}/events"
+        sock.sendall(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ)
+        buffers[sock] = b''
+    print(f"已建立 {connections} 个 SSE 连接，空闲 {idle_seconds}s")
+    time.sleep(idle_seconds)
+
+    # 丢弃连接时收到的快照和心跳
+    for key, _ in selector.select(timeout=1):
+        try:
+            key.fileobj.recv(65536)
+        except BlockingIOError:
+            pass
+
+    start = time.perf_counter()
+    for i in range(USERS):
+        request = urllib.request.Request(
+            f"{url}/api/counter/{PATTERN_ID}/user{i}",
+            data=json.dumps({'section_id': 'section-1', 'current': 12}).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        urllib.request.urlopen(request).read()
+
+    pending = set(buffers)
+    deadline = time.time() + 30
+    while pending and time.time() < deadline:
+        for key, _ in selector.select(timeout=1):
+            sock = key.fileobj
+            try:
+                buffers[sock] += sock.recv(65536)
+            except BlockingIOError:
+                continue
+            if b'"current": 12' in buffers[sock] and sock in pending:
+                pending.discard(sock)
+    elapsed = time.perf_counter() - start
+    print(f"服务端: {connections - len(pending)}/{connections} 个连接在 {elapsed * 1000:.1f} ms 内收到广播")
+    for sock in buffers:
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='计数器同步压测')
+    parser.add_argument('--connections', type=int, default=2000)
+    parser.add_argument('--idle', type=float, default=5, help='广播前空闲的秒数')
+    parser.add_argument('--url', help='运行中的服务端地址，不指定时只测进程内的 CounterHub')
+    args = parser.parse_args()
+    if args.url:
+        run_against_server(args.url.rstrip('/'), args.connections, args.idle)
+    else:
+        run_in_process(args.connections, args.idle)
+
+
+if __name__ == '__main__':
+    main()
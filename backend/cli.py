@@ -0,0 +1,210 @@
+"""
+编织图解处理的统一命令行入口（在 backend 目录下运行）：
+
+    python cli.py --help
+    python cli.py pipeline data/raw/PDF/大吉岭背心-text.pdf
+    python cli.py search 左上2并1 20行
+    python cli.py --profile pipeline data/raw/PDF/大吉岭背心-text.pdf
+
+模块顶层只导入 click；openai、google.genai、pytesseract、dotenv、Flask 等重量级依赖
+都在各子命令内部导入，--help 和本地子命令（simulate、search、index、config）不会加载它们。
+"""
+import json
+import os
+
+import click
+
+DEFAULT_EXTRACTED = os.path.join('data', 'processed', 'extracted_sizes.txt')
+DEFAULT_ALL_TEXT = os.path.join('data', 'processed', 'all_processed_text.txt')
+DEFAULT_PROFILE_DIR = os.path.join('data', 'output', 'profile')
+
+
+def read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def write_json(data, output: str = None):
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        click.echo(f"结果已保存到: {output}")
+    else:
+        click.echo(text)
+
+
+@click.group()
+@click.option('--profile', is_flag=True,
+              help='按阶段做性能分析（cProfile + tracemalloc），输出每个阶段的 pstats 文件、分配最多的位置和最大常驻内存')
+@click.option('--profile-dir', default=DEFAULT_PROFILE_DIR, show_default=True, help='性能分析结果目录')
+@click.pass_context
+def cli(ctx, profile, profile_dir):
+    """编织图解处理工具：PDF -> 文本 -> 尺码提取 -> 行数统计/解析"""
+    if profile:
+        from utils.profiling import start_profiling, stage, finish_profiling
+        start_profiling(profile_dir)
+        # 退出时先结束整个子命令的阶段，再写报告
+        ctx.call_on_close(finish_profiling)
+        ctx.with_resource(stage(ctx.invoked_subcommand))
+
+
+@cli.command('pdf-to-images')
+@click.argument('pdf_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--out-dir', default=os.path.join('data', 'raw', 'images'), show_default=True, help='图片输出目录')
+@click.option('--dpi', default=300, show_default=True)
+def pdf_to_images_command(pdf_path, out_dir, dpi):
+    """把 PDF 每页转成 PNG 图片"""
+    from pdf_to_images import pdf_to_images
+    paths = pdf_to_images(pdf_path, out_dir, dpi)
+    click.echo(f"共生成 {len(paths)} 张图片: {out_dir}")
+
+
+@cli.command('ocr')
+@click.argument('image_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--no-layout', is_flag=True, help='不做版面分析，整页 OCR')
+@click.option('--restart', is_flag=True, help='忽略断点日志，从第一页重新识别')
+@click.option('--engine', type=click.Choice(['pytesseract', 'pool']), envvar='OCR_ENGINE', default='pytesseract',
+              show_default=True, help='pool 为常驻的 tesseract 引擎池（需要 tesserocr）')
+@click.option('--full-correction', is_flag=True, help='把全文交给 Gemini 纠错（默认只发送低置信度的行）')
+def ocr_command(image_dir, no_layout, restart, engine, full_correction):
+    """对图片目录 OCR，并用 Gemini 纠错，输出 all_processed_text.txt"""
+    from ocr.image_to_text import images_to_text
+    images_to_text(image_dir, use_layout=not no_layout, resume=not restart, engine=engine,
+                   selective=not full_correction)
+
+
+@cli.command('pdf-text')
+@click.argument('pdf_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dpi', default=300, show_default=True, help='需要 OCR 的页面的栅格化分辨率')
+def pdf_text_command(pdf_path, dpi):
+    """优先读取 PDF 文字层，纯图片页才 OCR，输出 all_processed_text.txt"""
+    from ocr.pdf_text import pdf_to_text
+    pdf_to_text(pdf_path, dpi)
+
+
+@cli.command('extract-sizes')
+@click.argument('input_file', default=DEFAULT_ALL_TEXT, type=click.Path(exists=True, dir_okay=False))
+@click.argument('output_file', default=DEFAULT_EXTRACTED)
+@click.option('--no-batch', is_flag=True, help='逐行调用 LLM（不合并批量请求）')
+def extract_sizes_command(input_file, output_file, no_batch):
+    """从多尺码文本中提取第二个尺码"""
+    from parser.size_extractor import SizeExtractor
+    result = SizeExtractor().process_knitting_pattern(read_text(input_file), batched=not no_batch)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(result)
+    click.echo(f"处理完成！结果已保存到: {output_file}")
+
+
+@cli.command('pipeline')
+@click.argument('pdf_path', type=click.Path(exists=True, dir_okay=False))
+@click.argument('output_file', default=DEFAULT_EXTRACTED)
+@click.option('--no-sizes', is_flag=True, help='只切分章节，不提取尺码')
+def pipeline_command(pdf_path, output_file, no_sizes):
+    """流式处理 PDF：读取/OCR -> 后处理 -> 尺码提取 -> 章节，并更新搜索索引"""
+    from pipeline import StreamingPipeline, pdf_pages
+    from search_index import index_file
+    size_extractor = None
+    if not no_sizes:
+        from parser.size_extractor import SizeExtractor
+        size_extractor = SizeExtractor()
+    count = StreamingPipeline(size_extractor=size_extractor).run_to_file(pdf_pages(pdf_path), output_file)
+    if not count:
+        raise click.ClickException(f"没有从 {pdf_path} 得到任何内容，{output_file} 未修改")
+    index_file(output_file, os.path.splitext(os.path.basename(pdf_path))[0])
+    click.echo(f"处理完成！共 {count} 个章节，结果已保存到: {output_file}")
+
+
+@cli.command('count-rows')
+@click.argument('input_file', default=DEFAULT_EXTRACTED, type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', default=os.path.join('data', 'output', 'row_counts.json'), show_default=True)
+@click.option('--manifest', default=os.path.join('data', 'output', 'row_counts_manifest.json'), show_default=True,
+              help='部分缓存文件，未修改的部分不会重新统计')
+@click.option('--journal', default=os.path.join('data', 'output', 'row_counts.journal'), show_default=True,
+              help='断点日志，中断后重跑从上次完成的部分继续')
+def count_rows_command(input_file, output, manifest, journal):
+    """用 LLM 统计每个部分的行号范围"""
+    from count_rows import RowCounter
+    write_json(RowCounter().count_pattern_rows(read_text(input_file), manifest, journal), output)
+
+
+@cli.command('parse')
+@click.argument('input_file', default=DEFAULT_EXTRACTED, type=click.Path(exists=True, dir_okay=False))
+@click.option('--title', default='', help='图解标题')
+def parse_command(input_file, title):
+    """解析图解，生成 data/output/knitting_data.json 和 .knit"""
+    from parser.knitting_parser import KnittingPatternParser
+    data = KnittingPatternParser().create_knitting_data(title, read_text(input_file))
+    click.echo(f"共 {data.pattern_json.get('total_rows', 0)} 行")
+
+
+@cli.command('simulate')
+@click.argument('input_file', default=DEFAULT_EXTRACTED, type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', help='输出 JSON 文件，不指定时打印')
+def simulate_command(input_file, output):
+    """本地逐行计算针数（不调用 LLM），列出无法计算的行"""
+    from parser.stitch_simulator import StitchSimulator
+    from search_index import split_sections
+    simulator = StitchSimulator()
+    results = []
+    for section in split_sections(read_text(input_file)):
+        result = simulator.parse_section(section['content'], section['title'])
+        results.append({"section_title": section['title'], **result})
+    write_json(results, output)
+
+
+@cli.command('index')
+@click.argument('input_file', default=DEFAULT_EXTRACTED, type=click.Path(exists=True, dir_okay=False))
+@click.option('--pattern-id', help='图解编号，默认取文件名')
+def index_command(input_file, pattern_id):
+    """把 extracted_sizes 格式的文件导入搜索索引"""
+    from search_index import index_file
+    changed = index_file(input_file, pattern_id)
+    click.echo("索引已更新" if changed else "内容没有变化，索引未修改")
+
+
+@cli.command('search')
+@click.argument('query', nargs=-1, required=True)
+@click.option('--limit', default=20, show_default=True)
+def search_command(query, limit):
+    """在已导入的图解中搜索部分，例如：search 左上2并1 20行"""
+    from search_index import get_search_index
+    for result in get_search_index().search(' '.join(query), limit):
+        click.echo(f"{result['score']:>8} {result['pattern_id']} / {result['title']}")
+
+
+@cli.group('config')
+def config_group():
+    """API 密钥配置"""
+
+
+@config_group.command('set-api-key')
+@click.argument('api_key')
+def set_api_key_command(api_key):
+    """保存 OpenAI API 密钥到 ~/.knitting_config/config.json"""
+    from utils.config import set_api_key
+    set_api_key(api_key)
+    click.echo("已保存")
+
+
+@config_group.command('show')
+def show_config_command():
+    """显示当前使用的 API 密钥（只显示前 6 位）"""
+    from utils.config import get_api_key
+    api_key = get_api_key()
+    click.echo(f"{api_key[:6]}..." if api_key else "未设置")
+
+
+@cli.command('serve')
+@click.option('--host', default='0.0.0.0', show_default=True)
+@click.option('--port', default=8080, show_default=True)
+@click.option('--debug', is_flag=True)
+def serve_command(host, port, debug):
+    """启动后端 API 服务"""
+    from main import app
+    app.run(host=host, port=port, debug=debug, threaded=True)
+
+
+if __name__ == '__main__':
+    cli()
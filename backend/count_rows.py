@@ -1,50 +1,22 @@
-import openai
 import json
+import re
 from typing import Dict, List, Any, Optional
 import os
 from dotenv import load_dotenv
+from utils.section_cache import SectionCache
+from utils.checkpoint import Checkpoint, fingerprint
+from utils.hedged_llm import HedgedCaller, LATENCY_STATS_FILE
+from utils.model_router import ModelRouter
+from utils.prompt_builder import PromptBuilder, print_prompt_stats, reset_prompt_stats
+from utils.llm_clients import get_openai_client
 
 # 加载环境变量
 load_dotenv()
 
-class RowCounter:
-    def __init__(self):
-        """初始化计数器，使用环境变量中的API密钥"""
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("未找到 OPENAI_API_KEY 环境变量")
-        print(f"API密钥前6位: {api_key[:6]}...")
-        self.client = openai.OpenAI(api_key=api_key)
-
-    def split_pattern_by_sections(self, pattern_text: str) -> List[Dict[str, str]]:
-        """按#标记切分编织内容，支持全角#"""
-        sections = []
-        current_section = {"title": "", "content": ""}
-
-        for line in pattern_text.split('\n'):
-            line = line.lstrip()
-            if line.startswith('#') or line.startswith('＃'):
-                if current_section["title"]:
-                    sections.append(current_section)
-                current_section = {
-                    "title": line.lstrip('#＃').strip(),
-                    "content": ""
-                }
-            else:
-                if current_section["title"]:
-                    current_section["content"] += line + '\n'
+# 统计行数的固定提示词：每次调用完全相同，放在最前面以便命中前缀缓存
+COUNT_ROWS_PROMPT = """你是一个专业的编织图解分析助手，擅长准确统计行号。你必须返回一个有效的JSON字符串。对于区间表达式和重复指令，必须展开为连续的行号列表。不要统计针数，x针代表一行要织的针数，而不是行数。
 
-        if current_section["title"]:
-            sections.append(current_section)
-
-        return sections
-
-    def count_section_rows(self, section: Dict[str, str]) -> Dict[str, Any]:
-        """使用AI统计单个部分的行数（优化提示词）"""
-        print(f"\n统计部分: {section['title']}")
-        
-        # 优化后的提示词
-        prompt = f"""请分析以下编织图解的【{section['title']}】部分，只统计本区间内容中明确出现的所有行号。注意：
+请分析用户给出的编织图解部分，只统计本区间内容中明确出现的所有行号。注意：
 
 1. 只统计本区间（即本段落）出现的行号，不要统计其它区间的行号。
 2. 处理所有行号表达式，包括：
@@ -60,67 +32,140 @@ class RowCounter:
 6. 不要推测或补全未在本区间出现的行号。
 7. 不要统计针数，x针代表一行要织的针数，而不是行数。
 8. 返回JSON字符串，格式如下（注意rows为升序、无重复的行号列表）：
-{{
+{
     "row_count": 总行数,
     "start_row": 起始行号,
     "end_row": 结束行号,
     "rows": [所有行号的升序列表]
-}}
+}
 9. 如果区间内没有有效行号，row_count为0，start_row和end_row为null。
 
 示例：
 如果内容包含"第1到3行"和"第5行"，应该返回：
-{{
+{
     "row_count": 4,
     "start_row": 1,
     "end_row": 5,
     "rows": [1, 2, 3, 5]
-}}
+}
 
 如果内容包含"第9到20行"，应该返回：
-{{
+{
     "row_count": 12,
     "start_row": 9,
     "end_row": 20,
     "rows": [9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20]
-}}
+}
 
 如果内容包含"第11-18行的所有奇数行"，应该返回：
-{{
+{
     "row_count": 4,
     "start_row": 11,
     "end_row": 17,
     "rows": [11, 13, 15, 17]
-}}
+}
 
 如果内容包含"重复第40到59行再1次"，应该返回：
-{{
+{
     "row_count": 20,
     "start_row": 40,
     "end_row": 59,
     "rows": [40, 41, 42, ..., 59]
-}}
+}"""
+
+# 内容中提到的行号，只认“第N行”“第N到M行”“第N-M行”“第N和M行”这种行号写法，例如“第 9到20行”中的 9 和 20；
+# “织 1行上针”（行数）、“第 3 和第 4 列”不是行号
+_ROW_MENTION = re.compile(r'第\s*(\d+)\s*(?:(?:到|至|-|和)\s*第?\s*(\d+)\s*)?行')
+
+def check_row_count(result: Dict[str, Any], section_content: str):
+    """一致性校验：起止行号要成对、有序，并且与内容中出现的行号有交集"""
+    start, end = result["start_row"], result["end_row"]
+    mentioned = [int(n) for pair in _ROW_MENTION.findall(section_content) for n in pair if n]
+    if start is None or end is None:
+        if mentioned:
+            raise ValueError("内容中有行号，但返回的起止行号为空")
+        return
+    if not isinstance(start, int) or not isinstance(end, int) or start > end:
+        raise ValueError(f"起止行号无效: {start} - {end}")
+    if mentioned and (end < min(mentioned) or start > max(mentioned)):
+        raise ValueError(f"返回的行号范围 {start}-{end} 与内容中的行号不符")
+
+def parse_row_count_response(response, section_content: Optional[str] = None) -> Dict[str, Any]:
+    """
+    解析并校验行数统计的返回，格式不对时抛出 ValueError（对冲调用会等待其他请求）
+    传入 section_content 时还做一致性校验，不通过时换更强的模型
+    """
+    content = response.choices[0].message.content
+    # 打印AI返回的原始内容
+    print(f"AI返回内容: {content}")
+    result = json.loads(content)
+    if not isinstance(result, dict) or not {"row_count", "start_row", "end_row"} <= result.keys():
+        raise ValueError(f"返回的JSON缺少字段: {content}")
+    if section_content is not None:
+        check_row_count(result, section_content)
+    return result
+
+class RowCounter:
+    def __init__(self):
+        """初始化计数器，使用环境变量中的API密钥"""
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("未找到 OPENAI_API_KEY 环境变量")
+        print(f"API密钥前6位: {api_key[:6]}...")
+        self.client = get_openai_client(api_key)
+        # 统计出错的次数，出错的结果不写入缓存
+        self.errors = 0
+        # 每次调用有总时限，慢请求会触发对冲请求
+        self.llm = HedgedCaller('count_rows', stats_file=LATENCY_STATS_FILE)
+        # 按部分难度选择模型，校验不通过时升级
+        self.router = ModelRouter('count_rows', caller=self.llm)
+        self.prompt = PromptBuilder('count_rows', COUNT_ROWS_PROMPT)
+
+    def split_pattern_by_sections(self, pattern_text: str) -> List[Dict[str, str]]:
+        """按#标记切分编织内容，支持全角#"""
+        sections = []
+        current_section = {"title": "", "content": ""}
+
+        for line in pattern_text.split('\n'):
+            line = line.lstrip()
+            if line.startswith('#') or line.startswith('＃'):
+                if current_section["title"]:
+                    sections.append(current_section)
+                current_section = {
+                    "title": line.lstrip('#＃').strip(),
+                    "content": ""
+                }
+            else:
+                if current_section["title"]:
+                    current_section["content"] += line + '\n'
 
-【{section['title']}】部分内容如下：
-{section['content']}"""
+        if current_section["title"]:
+            sections.append(current_section)
+
+        return sections
+
+    def count_section_rows(self, section: Dict[str, str]) -> Dict[str, Any]:
+        """使用AI统计单个部分的行数（优化提示词）"""
+        print(f"\n统计部分: {section['title']}")
+        
+        def request(model, timeout):
+            return self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.1,
+                timeout=timeout
+            )
 
         try:
-            # 调用AI
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "你是一个专业的编织图解分析助手，擅长准确统计行号。你必须返回一个有效的JSON字符串。对于区间表达式和重复指令，必须展开为连续的行号列表。不要统计针数，x针代表一行要织的针数，而不是行数。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1
+            # 规则和示例是固定前缀，每次只附上本部分的内容；超出 token 预算时按出错处理
+            messages = self.prompt.messages(f"【{section['title']}】部分内容如下：\n{section['content']}")
+
+            # 调用AI，先返回且通过校验的结果胜出
+            result = self.router.call(
+                section['content'], request,
+                lambda response: parse_row_count_response(response, section['content'])
             )
             
-            # 打印AI返回的原始内容
-            print(f"AI返回内容: {response.choices[0].message.content}")
-            
-            # 解析AI返回的JSON
-            result = json.loads(response.choices[0].message.content)
-            
             # 使用起始行和结束行计算总行数
             if result["start_row"] is not None and result["end_row"] is not None:
                 result["row_count"] = result["end_row"] - result["start_row"] + 1
@@ -133,27 +178,57 @@ class RowCounter:
             }
             
         except Exception as e:
+            self.errors += 1
             print(f"AI统计出错: {str(e)}")
-            print(f"AI返回内容: {response.choices[0].message.content if 'response' in locals() else '无返回'}")
             return {
                 "section_title": section['title'],
                 "row_count": 0,
                 "start_row": None,
-                "end_row": None
+                "end_row": None,
+                "error": str(e)
             }
 
-    def count_pattern_rows(self, pattern_text: str) -> Dict[str, Any]:
-        """统计编织图解的行数"""
+    def count_pattern_rows(self, pattern_text: str, manifest_file: Optional[str] = None,
+                           journal_file: Optional[str] = None) -> Dict[str, Any]:
+        """
+        统计编织图解的行数
+        传入 manifest_file 时按部分内容哈希复用上一次的统计，只重新统计修改过的部分；
+        传入 journal_file 时每统计完一个部分就写入断点日志，中断后重跑从断点继续
+        """
         print("\n开始统计编织图解行数...")
         
         # 按部分切分内容
         sections = self.split_pattern_by_sections(pattern_text)
+        self.router.reset()
+        reset_prompt_stats('count_rows')
+        cache = SectionCache(manifest_file, 'count_rows') if manifest_file else None
+        checkpoint = Checkpoint(journal_file, fingerprint([pattern_text])) if journal_file else None
         
         # 统计每个部分的行数
         section_counts = []
-        for section in sections:
-            section_count = self.count_section_rows(section)
+        errors_before = self.errors
+        for i, section in enumerate(sections):
+            unit = f"{i}:{section['title']}"
+            section_count = checkpoint.get(unit) if checkpoint else None
+            if section_count is None and cache:
+                section_count = cache.get(section)
+            if section_count is None:
+                errors = self.errors
+                section_count = self.count_section_rows(section)
+                if self.errors == errors:
+                    if cache:
+                        cache.put(section, section_count)
+                    if checkpoint:
+                        checkpoint.record(unit, section_count)
             section_counts.append(section_count)
+        if cache:
+            cache.save()
+        # 有部分统计出错时保留断点日志，下次重跑只重新统计出错的部分
+        if checkpoint and self.errors == errors_before:
+            checkpoint.clear()
+        self.llm.save_stats()
+        self.router.print_report()
+        print_prompt_stats('count_rows')
         
         # 合并所有部分的结果
         result = {
@@ -220,7 +295,9 @@ def main():
         pattern_text = f.read()
     
     # 统计行数
-    result = counter.count_pattern_rows(pattern_text)
+    manifest_file = '../data/output/row_counts_manifest.json'
+    journal_file = '../data/output/row_counts.journal'
+    result = counter.count_pattern_rows(pattern_text, manifest_file, journal_file)
     
     # 打印结果
     print("\n统计结果:")
@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
+
+# 每个频道保留的最近事件数，断线重连时 last-event-id 落在这个范围内就只补发增量
+EVENT_BUFFER_SIZE = 500
+# SSE 心跳间隔（秒），防止代理断开空闲连接
+HEARTBEAT_SECONDS = 15
+# 长轮询最长等待时间（秒）
+LONG_POLL_SECONDS = 25
+# 计数器增量里允许的字段
+DELTA_FIELDS = ('section_id', 'start', 'end', 'current', 'is_knitting', 'device')
+
+
+class CounterChannel:
+    """
+    一个图解 + 一个用户的计数器频道：
+    保存最近的增量事件和各部分的最新状态（用于补发不了增量时整体同步）
+    """
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self.events = deque(maxlen=buffer_size)
+        self.state: Dict[str, Dict[str, Any]] = {}
+        self.last_id = 0
+        self.condition = threading.Condition()
+
+    def publish(self, delta: Dict[str, Any]) -> Dict[str, Any]:
+        with self.condition:
+            self.last_id += 1
+            event = {"id": self.last_id, "delta": delta}
+            self.events.append(event)
+            section_state = self.state.setdefault(delta['section_id'], {})
+            section_state.update({key: value for key, value in delta.items() if key != 'device'})
+            self.condition.notify_all()
+            return event
+
+    def since(self, last_id: Optional[int]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        返回 (增量事件, 快照)：
+        last_id 仍在缓冲区内时只返回之后的增量；太旧或来自服务重启前时返回快照
+        调用方需持有 condition
+        """
+        if last_id is None or last_id == self.last_id:
+            return [], None
+        oldest = self.events[0]['id'] if self.events else self.last_id + 1
+        if last_id > self.last_id or last_id < oldest - 1:
+            return [], self.snapshot()
+        return [event for event in self.events if event['id'] > last_id], None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"id": self.last_id, "state": {key: dict(value) for key, value in self.state.items()}}
+
+    def wait(self, last_id: Optional[int], timeout: float) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """等到有新事件或超时；空闲连接只阻塞在 condition 上，不占用 CPU"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                events, snapshot = self.since(last_id if last_id is not None else self.last_id)
+                if events or snapshot:
+                    return events, snapshot
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], None
+                self.condition.wait(remaining)
+
+
+class CounterHub:
+    """按 (图解, 用户) 管理计数器频道"""
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.channels: Dict[Tuple[str, str], CounterChannel] = {}
+        self.lock = threading.Lock()
+
+    def channel(self, pattern_id: str, user_id: str) -> CounterChannel:
+        key = (pattern_id, user_id)
+        with self.lock:
+            channel = self.channels.get(key)
+            if channel is None:
+                channel = self.channels[key] = CounterChannel(self.buffer_size)
+            return channel
+
+    def publish(self, pattern_id: str, user_id: str, delta: Dict[str, Any]) -> Dict[str, Any]:
+        """发布一个增量，只保留约定的字段"""
+        delta = {key: delta[key] for key in DELTA_FIELDS if key in delta}
+        if not delta.get('section_id'):
+            raise ValueError("缺少 section_id")
+        if not isinstance(delta['section_id'], str):
+            raise ValueError("section_id 必须是字符串")
+        return self.channel(pattern_id, user_id).publish(delta)
+
+
+def format_sse(events: List[Dict[str, Any]], snapshot: Optional[Dict[str, Any]]) -> str:
+    """编码成 SSE 文本：增量事件带 id，供浏览器断线重连时通过 Last-Event-ID 续传"""
+    if snapshot:
+        return f"id: {snapshot['id']}\nevent: snapshot\ndata: {json.dumps(snapshot['state'], ensure_ascii=False)}\n\n"
+    return ''.join(
+        f"id: {event['id']}\ndata: {json.dumps(event['delta'], ensure_ascii=False)}\n\n"
+        for event in events
+    )
+
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+
+def sse_stream(channel: CounterChannel, last_id: Optional[int], heartbeat: float = HEARTBEAT_SECONDS):
+    """SSE 响应体：先补发 last_id 之后的事件，然后阻塞等待新事件，空闲时发送心跳注释"""
+    # 告诉浏览器断线 3 秒后重连
+    yield 'retry: 3000\n\n'
+    if last_id is None:
+        # 首次连接：先发一份快照
+        with channel.condition:
+            snapshot = channel.snapshot()
+        last_id = snapshot['id']
+        yield format_sse([], snapshot)
+    while True:
+        events, snapshot = channel.wait(last_id, heartbeat)
+        if snapshot:
+            last_id = snapshot['id']
+        elif events:
+            last_id = events[-1]['id']
+        else:
+            yield ': heartbeat\n\n'
+            continue
+        yield format_sse(events, snapshot)
+
+
+hub = CounterHub()
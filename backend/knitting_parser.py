@@ -1,8 +1,8 @@
-import openai
 import json
 from typing import Dict, List, Any, Optional
 import os
 from dotenv import load_dotenv
+from utils.llm_clients import get_openai_client
 
 # 加载环境变量
 load_dotenv()
@@ -45,7 +45,7 @@ class KnittingPatternParser:
         if not api_key:
             raise ValueError("未找到 OPENAI_API_KEY 环境变量")
         print(f"API密钥前6位: {api_key[:6]}...")  # 打印API密钥前6位，确认是否正确加载
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = get_openai_client(api_key)
 
     def split_pattern_by_sections(self, pattern_text: str) -> List[Dict[str, str]]:
         """按#标记切分编织内容，支持全角#，并打印每一行的内容用于调试"""
@@ -1,6 +1,21 @@
-from flask import Flask, jsonify, render_template, send_from_directory
 import os
+
+# 计数器同步的 SSE/长轮询是长连接：默认的 threaded 开发服务器每个连接占一个系统线程，
+# 适合少量设备；连接多时设置 COUNTER_SERVER=gevent 用 gevent 运行，空闲连接只占一个协程。
+# gevent 的补丁必须在导入 threading 相关模块（counter_sync 等）之前打上
+COUNTER_SERVER = os.getenv('COUNTER_SERVER', 'threaded')
+if __name__ == '__main__' and COUNTER_SERVER == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, Response, jsonify, render_template, request, send_from_directory
 import json
+import hashlib
+
+from row_index import get_row_index, ROW_COUNTS_FILE, MAX_RANGE_ROWS
+from row_layout import get_row_layout
+from counter_sync import hub, sse_stream, parse_event_id, LONG_POLL_SECONDS
+from search_index import get_search_index
 
 # 跨域支持
 try:
@@ -24,19 +39,133 @@ def index():
 # row_counts API
 @app.route('/api/row-counts')
 def row_counts():
-    json_path = os.path.join('data', 'output', 'row_counts.json')
-    if not os.path.exists(json_path):
+    layout = get_row_layout()
+    if layout is None:
         return jsonify({'error': '数据文件不存在'}), 404
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return jsonify(data)
+    # 返回应用了修改记录之后的范围；total_rows 与 row_counts.json 含义相同（各部分行数之和），last_row 为最后一行
+    return jsonify({'sections': layout.ranges(), 'total_rows': layout.total_rows, 'last_row': layout.last_row})
 
-# extracted_sizes API
-@app.route('/api/extracted-sizes')
-def extracted_sizes():
+# 单行查询 API：计数器每次只取当前行
+@app.route('/api/rows/<int:row_number>')
+def row_detail(row_number):
+    if not os.path.exists(ROW_COUNTS_FILE):
+        return jsonify({'error': '数据文件不存在'}), 404
+    row = get_row_index().lookup(row_number)
+    if row is None:
+        return jsonify({'error': f'第{row_number}行不在任何部分内'}), 404
+    return jsonify(row)
+
+# 行范围查询 API：/api/rows?from=10&to=20，最多返回 MAX_RANGE_ROWS 行
+@app.route('/api/rows')
+def row_range():
+    if not os.path.exists(ROW_COUNTS_FILE):
+        return jsonify({'error': '数据文件不存在'}), 404
+    index = get_row_index()
+    start = request.args.get('from', default=1, type=int)
+    end = request.args.get('to', default=start + MAX_RANGE_ROWS - 1, type=int)
+    if start < 1 or end < start:
+        return jsonify({'error': 'from/to 参数无效'}), 400
+    end = min(end, start + MAX_RANGE_ROWS - 1)
+    return jsonify({
+        'from': start,
+        'to': end,
+        'total_rows': index.total_rows,
+        'rows': index.lookup_range(start, end)
+    })
+
+def update_section_range(index, row_count, start_row=None):
+    """修改一个部分的行数（传入 start_row 时同时修改起始行），只返回起止行发生变化的部分"""
+    layout = get_row_layout()
+    if layout is None:
+        return jsonify({'error': '数据文件不存在'}), 404
+    try:
+        if start_row is None:
+            changed = layout.update_row_count(index, row_count)
+        else:
+            changed = layout.update_range(index, start_row, start_row + row_count - 1)
+    except IndexError:
+        return jsonify({'error': f'部分 {index} 不存在'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'changed': changed, 'total_rows': layout.total_rows, 'last_row': layout.last_row})
+
+# 修改行数 API：POST {"row_count": n}
+@app.route('/api/sections/<int:index>/row-count', methods=['POST'])
+def section_row_count(index):
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get('row_count'), int):
+        return jsonify({'error': '缺少 row_count'}), 400
+    return update_section_range(index, data['row_count'])
+
+# 前端保存起止行：{"sectionId": "section-3", "start": 1, "end": 20}
+@app.route('/api/sections/save', methods=['POST'])
+def save_section():
+    data = request.get_json(silent=True) or {}
+    section_id = str(data.get('sectionId', ''))
+    if not section_id.startswith('section-') or not section_id[len('section-'):].isdigit():
+        return jsonify({'error': 'sectionId 无效'}), 400
+    try:
+        start, end = int(data['start']), int(data['end'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'start/end 参数无效'}), 400
+    if end < start:
+        return jsonify({'error': 'end 不能小于 start'}), 400
+    return update_section_range(int(section_id[len('section-'):]), end - start + 1, start)
+
+# 计数器同步：发布增量 POST {"section_id": "section-3", "current": 12, "device": "..."}
+@app.route('/api/counter/<pattern_id>/<user_id>', methods=['POST'])
+def publish_counter(pattern_id, user_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        event = hub.publish(pattern_id, user_id, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'id': event['id']})
+
+# 计数器同步：SSE 推送，浏览器重连时自动带上 Last-Event-ID
+@app.route('/api/counter/<pattern_id>/<user_id>/events')
+def counter_events(pattern_id, user_id):
+    last_id = parse_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    channel = hub.channel(pattern_id, user_id)
+    return Response(
+        sse_stream(channel, last_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# 计数器同步：不支持 SSE 时的长轮询
+@app.route('/api/counter/<pattern_id>/<user_id>/poll')
+def counter_poll(pattern_id, user_id):
+    last_id = parse_event_id(request.args.get('last_event_id'))
+    timeout = min(request.args.get('timeout', default=LONG_POLL_SECONDS, type=float), LONG_POLL_SECONDS)
+    channel = hub.channel(pattern_id, user_id)
+    if last_id is None:
+        with channel.condition:
+            snapshot = channel.snapshot()
+        return jsonify({'last_event_id': snapshot['id'], 'events': [], 'snapshot': snapshot['state']})
+    events, snapshot = channel.wait(last_id, timeout)
+    if snapshot:
+        return jsonify({'last_event_id': snapshot['id'], 'events': [], 'snapshot': snapshot['state']})
+    return jsonify({
+        'last_event_id': events[-1]['id'] if events else last_id,
+        'events': events,
+        'snapshot': None
+    })
+
+# 全文搜索 API：/api/search?q=左上2并1 20行&limit=20
+@app.route('/api/search')
+def search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '缺少查询参数 q'}), 400
+    limit = max(1, min(request.args.get('limit', default=20, type=int), 100))
+    return jsonify({'query': query, 'results': get_search_index().search(query, limit)})
+
+def load_extracted_sections():
+    """读取 extracted_sizes.txt 并按 # 标题切分，文件不存在时返回 None"""
     path = os.path.join('data', 'processed', 'extracted_sizes.txt')
     if not os.path.exists(path):
-        return jsonify({'error': 'extracted_sizes.txt 不存在'}), 404
+        return None
     with open(path, 'r', encoding='utf-8') as f:
         content = f.read()
     sections = []
@@ -50,7 +179,61 @@ def extracted_sizes():
             current['content'] += line + '\n'
     if current['title']:
         sections.append(current)
-    return jsonify({'sections': sections})
+    return sections
+
+def pattern_id_of(sections):
+    """图解的标识（计数器同步的频道）：由各部分标题得出，修改内容或行数不会改变，换了图解才会变"""
+    titles = '\n'.join(section['title'] for section in sections)
+    return hashlib.sha1(titles.encode('utf-8')).hexdigest()[:12]
+
+# extracted_sizes API
+@app.route('/api/extracted-sizes')
+def extracted_sizes():
+    sections = load_extracted_sections()
+    if sections is None:
+        return jsonify({'error': 'extracted_sizes.txt 不存在'}), 404
+    return jsonify({'sections': sections, 'pattern_id': pattern_id_of(sections)})
+
+_knitting_parser = None
+
+def get_knitting_parser():
+    """解析器（及 openai 客户端）在第一次需要时才创建"""
+    global _knitting_parser
+    if _knitting_parser is None:
+        from parser.knitting_parser import KnittingPatternParser
+        _knitting_parser = KnittingPatternParser()
+    return _knitting_parser
+
+# 流式解析一个部分（SSE）：本地能算的行立即推送，其余行随 LLM 的流式输出逐行推送，
+# 事件类型为 row / reset / done，见 KnittingPatternParser.parse_section_stream
+@app.route('/api/sections/<int:index>/parse/stream')
+def parse_section_stream(index):
+    sections = load_extracted_sections()
+    if sections is None:
+        return jsonify({'error': 'extracted_sizes.txt 不存在'}), 404
+    if not 0 <= index < len(sections):
+        return jsonify({'error': f'部分 {index} 不存在'}), 404
+    try:
+        knitting_parser = get_knitting_parser()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 503
+
+    from parser.stitch_simulator import StitchSimulator
+    simulator = StitchSimulator()
+    # 先在本地模拟前面的部分，得到本部分的起始针数
+    for section in sections[:index]:
+        simulator.parse_section(section['content'], section['title'])
+    next_section = sections[index + 1] if index + 1 < len(sections) else None
+
+    def generate():
+        for event in knitting_parser.parse_section_stream(sections[index], next_section, simulator):
+            yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 # 图片列表 API
 @app.route('/api/images')
@@ -72,4 +255,10 @@ def static_files(filename):
     return send_from_directory(app.static_folder, filename)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
+    if COUNTER_SERVER == 'gevent':
+        from gevent.pywsgi import WSGIServer
+        print("使用 gevent 运行，端口 8080")
+        WSGIServer(('0.0.0.0', 8080), app).serve_forever()
+    else:
+        # threaded：每个 SSE/长轮询连接占一个线程，空闲时阻塞等待，连接数受线程数限制
+        app.run(host='0.0.0.0', port=8080, debug=True, threaded=True)
\ No newline at end of file
@@ -0,0 +1,186 @@
+import os
+import re
+import json
+import time
+import tempfile
+from typing import Dict, List, Optional
+
+# 默认的 badcase 文件：记录人工确认过的 错字->正字 修正
+DEFAULT_BADCASE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'badcases.json')
+
+
+class TermTrie:
+    """
+    字面量术语的字典树，一次扫描完成全部替换（最长匹配）
+    先用术语首字组成的字符集正则跳到候选位置，再沿字典树向下走，
+    每个位置的开销只与术语长度有关，与术语数量无关
+    """
+    _END = ''
+
+    def __init__(self, mapping: Optional[Dict[str, str]] = None):
+        self.root = {}
+        self.mapping = {}
+        self._first_chars = None
+        for wrong, correct in (mapping or {}).items():
+            self.add(wrong, correct)
+
+    def __len__(self) -> int:
+        return len(self.mapping)
+
+    def add(self, wrong: str, correct: str):
+        """添加或覆盖一条术语"""
+        if not wrong:
+            return
+        if wrong[0] not in self.root:
+            self._first_chars = None
+        node = self.root
+        for char in wrong:
+            node = node.setdefault(char, {})
+        node[self._END] = True
+        self.mapping[wrong] = correct
+
+    def remove(self, wrong: str):
+        """删除一条术语，并清理不再使用的分支"""
+        if wrong not in self.mapping:
+            return
+        del self.mapping[wrong]
+        path = [self.root]
+        for char in wrong:
+            path.append(path[-1][char])
+        del path[-1][self._END]
+        for i in range(len(wrong) - 1, -1, -1):
+            if path[i + 1]:
+                break
+            del path[i][wrong[i]]
+        self._first_chars = None
+
+    def longest_match(self, text: str, start: int) -> int:
+        """返回从start开始能匹配到的最长术语的结束位置，没有匹配返回-1"""
+        node = self.root
+        end = -1
+        for i in range(start, len(text)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            if self._END in node:
+                end = i + 1
+        return end
+
+    def first_chars(self):
+        """术语首字的字符集正则，字典树变化后重新编译"""
+        if self._first_chars is None:
+            chars = ''.join(re.escape(char) for char in self.root)
+            self._first_chars = re.compile(f'[{chars}]') if chars else False
+        return self._first_chars
+
+    def replace(self, text: str) -> str:
+        """把文本中的所有术语替换为正确写法"""
+        finder = self.first_chars()
+        if not finder:
+            return text
+        parts = []
+        last = 0
+        match = finder.search(text)
+        while match:
+            start = match.start()
+            end = self.longest_match(text, start)
+            if end > 0:
+                parts.append(text[last:start])
+                parts.append(self.mapping[text[start:end]])
+                last = end
+                match = finder.search(text, end)
+            else:
+                match = finder.search(text, start + 1)
+        if not parts:
+            return text
+        parts.append(text[last:])
+        return ''.join(parts)
+
+
+class CorrectionDictionary:
+    """
+    OCR 纠错词典：静态规则（correction_rules.py）+ badcases.json
+    - 所有术语索引在一棵 TermTrie 里，替换耗时与规则数量无关
+    - badcase 文件变化后自动热加载，只把增删改的条目同步到字典树
+    - 同一个错字出现多次时，时间最新的 badcase 生效；badcase 优先于静态规则
+    """
+    def __init__(self, static_terms: Optional[Dict[str, str]] = None, badcase_file: Optional[str] = DEFAULT_BADCASE_FILE):
+        self.static_terms = dict(static_terms or {})
+        self.badcase_file = badcase_file
+        self.trie = TermTrie()
+        self._mtime = None
+        self.reload(force=True)
+
+    def __len__(self) -> int:
+        return len(self.trie)
+
+    def load_badcases(self) -> List[Dict]:
+        """读取 badcase 列表，文件不存在或格式错误时返回空列表"""
+        if not self.badcase_file or not os.path.exists(self.badcase_file):
+            return []
+        try:
+            with open(self.badcase_file, 'r', encoding='utf-8') as f:
+                badcases = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"读取 badcase 文件出错: {e}")
+            return []
+        return badcases if isinstance(badcases, list) else []
+
+    def build_mapping(self, badcases: List[Dict]) -> Dict[str, str]:
+        """合并静态规则和 badcase，得到完整的 错字->正字 映射"""
+        mapping = dict(self.static_terms)
+        term_cases = [case for case in badcases if case.get('type', 'term') == 'term' and case.get('wrong')]
+        for case in sorted(term_cases, key=lambda case: case.get('time', '')):
+            mapping[case['wrong']] = case.get('correct', '')
+        return mapping
+
+    def _badcase_mtime(self):
+        if not self.badcase_file:
+            return None
+        try:
+            return os.stat(self.badcase_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self, force: bool = False) -> bool:
+        """badcase 文件有变化时重新加载，返回是否发生了变化"""
+        mtime = self._badcase_mtime()
+        if not force and mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        mapping = self.build_mapping(self.load_badcases())
+
+        # 只同步有变化的条目
+        for wrong in [wrong for wrong in self.trie.mapping if wrong not in mapping]:
+            self.trie.remove(wrong)
+        for wrong, correct in mapping.items():
+            if self.trie.mapping.get(wrong) != correct:
+                self.trie.add(wrong, correct)
+        return True
+
+    def add_badcase(self, wrong: str, correct: str, case_type: str = 'term'):
+        """追加一条 badcase 并立即生效（原子写入文件）"""
+        if not wrong:
+            raise ValueError("错字不能为空")
+        badcases = self.load_badcases()
+        badcases.append({
+            "wrong": wrong,
+            "correct": correct,
+            "type": case_type,
+            "time": time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        if self.badcase_file:
+            directory = os.path.dirname(self.badcase_file) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(badcases, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.badcase_file)
+            self._mtime = self._badcase_mtime()
+        if case_type == 'term':
+            self.trie.add(wrong, correct)
+
+    def replace(self, text: str) -> str:
+        """热加载检查后做术语替换"""
+        self.reload()
+        return self.trie.replace(text)
@@ -1,11 +1,21 @@
 import os
 from dotenv import load_dotenv
-from google import genai
 from PIL import Image
-import pytesseract
 import glob
 from tqdm import tqdm
 import re
+try:
+    from .layout_analyzer import analyze_pages
+    from .tesseract_pool import get_engine
+    from .selective_correction import SelectiveCorrector, merge_page_lines
+except ImportError:
+    from layout_analyzer import analyze_pages
+    from tesseract_pool import get_engine
+    from selective_correction import SelectiveCorrector, merge_page_lines
+from utils.checkpoint import Checkpoint, fingerprint, file_fingerprint
+from utils.prompt_builder import PromptBuilder, print_prompt_stats
+from utils.llm_clients import get_gemini_client
+from utils.profiling import stage
 
 # 加载环境变量
 load_dotenv()
@@ -22,66 +32,65 @@ def setup_gemini():
     if not GOOGLE_API_KEY:
         raise ValueError("未找到 GOOGLE_API_KEY 环境变量")
     
-    client = genai.Client(api_key=GOOGLE_API_KEY)
-    return client
+    # 进程内共享同一个客户端和连接池，多次调用不会重新建立连接
+    return get_gemini_client(GOOGLE_API_KEY)
+
+# 整篇纠错的固定提示词，文本内容放在最后
+FULL_CORRECTION_PROMPT = PromptBuilder('ocr_full_correction', """
+你是一个专业的编织图解处理助手。请帮我处理以下文本，要求：
+
+1. 完整性要求（最重要）：
+   - 严格保持所有原始内容，不允许任何信息丢失
+   - 特别注意保持所有标题的完整性，如"选项一"、"选项二"等
+   - 保持所有括号内的补充说明，如"（见折叠边）"等
+   - 保持所有数字和符号的原始形式，包括"x"等特殊字符
+   - 不允许删除或合并任何内容，即使看起来是重复的
+
+2. 上下文理解：
+   - 这是一个编织图解文本，包含针法说明、尺寸数据等专业内容
+   - 特别注意识别编织相关的专业术语，如"上针"、"下针"、"空加针"等
+   - 数字通常表示针数、行数或尺寸，需要保持其准确性
+   - 括号内的数字序列通常表示不同尺寸的对应数据
+
+3. 页眉页脚处理：
+   - 识别并删除每页重复出现的页眉、页脚、页码等无关内容
+   - 页眉示例：如"V: WDmaoxianwo 我的毛线窝翻译——《大吉岭》背心"
+   - 页脚示例：如"见小红书号;2639400533 淘宝和微店: 我的毛线窝"
+   - 注意：页眉页脚可能包含社交媒体账号、店铺信息、页码等，这些都需要删除
+
+4. 专业术语识别：
+   - 结合上下文识别并纠正编织术语
+   - 常见术语示例：
+     * 针法：上针、下针、空加针、并针、挑针等
+     * 部位：前片、后片、袖笼、领口等
+     * 工具：环针、棒针等
+   - 注意数字和单位的组合，如"3.5mm环针"、"185针"等
+
+5. 段落结构保持：
+   - 严格保持原有的段落结构和换行
+   - 每个编织步骤应该单独成段
+   - 保持标题的层级结构（如"选项一"、"选项二"等）
+   - 保持数字序列的格式，如"185 (203 - 221 - 239 - 257 - 293 - 311 - 329)针"
+
+6. 特别注意事项：
+   - 不要修改任何以"选项"或"第X行"开头的内容
+   - 不要合并或删除任何段落
+   - 保持数字的准确性，特别是括号内的尺寸数据
+   - 保持专业术语的准确性，不要随意替换
+   - 保持所有补充说明的完整性，如"（见折叠边）"等
+   - 保持所有特殊字符，如"x"等
+
+只输出处理后的文本内容，不要回复任何额外说明、请求或客套话。
+""")
 
 def process_text_with_gemini(text, client):
     """
     使用 Gemini 处理文本，只处理页眉页脚和术语纠错
     """
-    prompt = """
-    你是一个专业的编织图解处理助手。请帮我处理以下文本，要求：
-
-    1. 完整性要求（最重要）：
-       - 严格保持所有原始内容，不允许任何信息丢失
-       - 特别注意保持所有标题的完整性，如"选项一"、"选项二"等
-       - 保持所有括号内的补充说明，如"（见折叠边）"等
-       - 保持所有数字和符号的原始形式，包括"x"等特殊字符
-       - 不允许删除或合并任何内容，即使看起来是重复的
-
-    2. 上下文理解：
-       - 这是一个编织图解文本，包含针法说明、尺寸数据等专业内容
-       - 特别注意识别编织相关的专业术语，如"上针"、"下针"、"空加针"等
-       - 数字通常表示针数、行数或尺寸，需要保持其准确性
-       - 括号内的数字序列通常表示不同尺寸的对应数据
-
-    3. 页眉页脚处理：
-       - 识别并删除每页重复出现的页眉、页脚、页码等无关内容
-       - 页眉示例：如"V: WDmaoxianwo 我的毛线窝翻译——《大吉岭》背心"
-       - 页脚示例：如"见小红书号;2639400533 淘宝和微店: 我的毛线窝"
-       - 注意：页眉页脚可能包含社交媒体账号、店铺信息、页码等，这些都需要删除
-
-    4. 专业术语识别：
-       - 结合上下文识别并纠正编织术语
-       - 常见术语示例：
-         * 针法：上针、下针、空加针、并针、挑针等
-         * 部位：前片、后片、袖笼、领口等
-         * 工具：环针、棒针等
-       - 注意数字和单位的组合，如"3.5mm环针"、"185针"等
-
-    5. 段落结构保持：
-       - 严格保持原有的段落结构和换行
-       - 每个编织步骤应该单独成段
-       - 保持标题的层级结构（如"选项一"、"选项二"等）
-       - 保持数字序列的格式，如"185 (203 - 221 - 239 - 257 - 293 - 311 - 329)针"
-
-    6. 特别注意事项：
-       - 不要修改任何以"选项"或"第X行"开头的内容
-       - 不要合并或删除任何段落
-       - 保持数字的准确性，特别是括号内的尺寸数据
-       - 保持专业术语的准确性，不要随意替换
-       - 保持所有补充说明的完整性，如"（见折叠边）"等
-       - 保持所有特殊字符，如"x"等
-
-    文本内容：
-    {text}
-    只输出处理后的文本内容，不要回复任何额外说明、请求或客套话。
-    """
-    
     try:
         response = client.models.generate_content(
             model="gemini-2.0-flash",
-            contents=prompt.format(text=text)
+            contents=FULL_CORRECTION_PROMPT.text(f"文本内容：\n{text}")
         )
         return response.text
     except Exception as e:
@@ -103,70 +112,177 @@ def preprocess_image(image):
     
     return image
 
-def images_to_text(image_dir):
+# OCR配置
+OCR_CONFIG = r'--oem 3 --psm 6 -c preserve_interword_spaces=1 -c textord_heavy_nr=1 -c textord_min_linesize=2.5 -c textord_force_make_prop_words=0 -c textord_force_make_prop_fract=0 -c textord_parallel_baselines=1 -c textord_parallel_desc=1'
+
+# 裁剪文字块时上下留出的边距，避免切掉字的笔画
+BLOCK_PADDING = 6
+
+def clean_page_text(text):
     """
-    处理图片并提取文本，所有页合并后统一处理
+    清理单页OCR文本，但保持所有原始内容
     """
-    client = setup_gemini()
-    all_text = []
-    image_files = sorted(glob.glob(os.path.join(image_dir, '*.png')))
+    # 1. 保持所有原始换行和空格
+    # 2. 只处理明显的OCR错误，如多余的空格
+    text = re.sub(r'(?<=\S) {2,}(?=\S)', ' ', text)  # 只处理行内多余的空格
+    
+    # 3. 保持所有数字和符号的原始形式
+    # 4. 保持所有括号和补充说明
+    text = re.sub(r'(\d+)\s*[（(]\s*(\d+)', r'\1 (\2', text)  # 只处理数字和括号之间的空格
+    
+    # 5. 保护标题格式
+    text = re.sub(r'选项\s*(\d+)\s*:', r'选项\1:', text)  # 修复选项标题格式
+    
+    # 6. 保护数字和单位
+    text = re.sub(r'(\d+)\s*个', r'\1个', text)  # 修复数字和"个"之间的空格
+    text = re.sub(r'(\d+)\s*行', r'\1行', text)  # 修复数字和"行"之间的空格
+    text = re.sub(r'(\d+)\s*针', r'\1针', text)  # 修复数字和"针"之间的空格
+    
+    # 7. 保护括号内的内容
+    text = re.sub(r'[（(]\s*([^）)]+)\s*[）)]', r'(\1)', text)  # 统一括号格式
+    return text
+
+def get_ocr_engine(name=None):
+    """
+    获取 OCR 引擎：pytesseract（默认）或 pool（常驻引擎池），也可用环境变量 OCR_ENGINE 指定
+    """
+    return get_engine(name, lang='chi_sim', config=OCR_CONFIG)
+
+def ocr_page(image, layout=None, engine=None):
+    """
+    识别单页图片；有版面分析结果时只识别文字块
+    """
+    engine = engine or get_ocr_engine()
+    if layout is None:
+        return engine.image_to_string(image)
+    
+    return '\n'.join(engine.images_to_strings(crop_text_blocks(image, layout)))
+
+def crop_text_blocks(image, layout):
+    width, height = image.size
+    blocks = []
+    for left, top, right, bottom in layout.text_blocks:
+        blocks.append(image.crop((
+            left,
+            max(0, top - BLOCK_PADDING),
+            right,
+            min(height, bottom + BLOCK_PADDING)
+        )))
+    return blocks
+
+def ocr_page_lines(image, layout=None, engine=None):
+    """
+    识别单页图片，返回带置信度的行：[{"text": 清理后的行文本, "conf": 行内最低的词置信度}]
+    """
+    engine = engine or get_ocr_engine()
+    if layout is None:
+        lines = engine.image_to_lines(image)
+    else:
+        lines = []
+        for block_lines in engine.images_to_lines(crop_text_blocks(image, layout)):
+            if lines and block_lines:
+                lines.append({"text": "", "conf": None})
+            lines.extend(block_lines)
+    return [{"text": clean_page_text(line["text"]), "conf": line["conf"]} for line in lines]
+
+def list_images(image_dir):
+    return sorted(glob.glob(os.path.join(image_dir, '*.png')))
+
+def iter_page_texts(image_dir, use_layout=True, skip=None, engine=None, with_confidence=False):
+    """
+    逐页OCR，每识别完一页就产出 (图片路径, 清理后的文本)
+    use_layout 为 True 时先做版面分析，跳过重复的页眉页脚和图片/图表区域
+    skip 中的图片（例如断点记录里已完成的页）不再识别
+    engine 为 OCR 引擎名称（pytesseract 或 pool），见 get_ocr_engine
+    with_confidence 为 True 时产出的是带置信度的行列表（见 ocr_page_lines）而不是文本
+    """
+    image_files = list_images(image_dir)
+    ocr_engine = get_ocr_engine(engine)
     
-    # OCR配置
-    custom_config = r'--oem 3 --psm 6 -c preserve_interword_spaces=1 -c textord_heavy_nr=1 -c textord_min_linesize=2.5 -c textord_force_make_prop_words=0 -c textord_force_make_prop_fract=0 -c textord_parallel_baselines=1 -c textord_parallel_desc=1'
+    layouts = {}
+    if use_layout and image_files:
+        for layout in analyze_pages(image_files, preprocess=preprocess_image):
+            layouts[layout.path] = layout
+            skipped = len(layout.skipped_blocks)
+            if skipped:
+                print(f"{os.path.basename(layout.path)}: 跳过 {skipped} 个非正文区域")
     
+    skip = skip or set()
     for img_path in tqdm(image_files, desc="处理图片"):
+        if img_path in skip:
+            continue
         try:
             # 打开并预处理图片
             image = Image.open(img_path)
             image = preprocess_image(image)
             
-            # 使用 pytesseract 进行OCR识别
-            text = pytesseract.image_to_string(
-                image,
-                lang='chi_sim',
-                config=custom_config
-            )
-            
-            # 清理文本，但保持所有原始内容
-            # 1. 保持所有原始换行和空格
-            # 2. 只处理明显的OCR错误，如多余的空格
-            text = re.sub(r'(?<=\S) {2,}(?=\S)', ' ', text)  # 只处理行内多余的空格
-            
-            # 3. 保持所有数字和符号的原始形式
-            # 4. 保持所有括号和补充说明
-            text = re.sub(r'(\d+)\s*[（(]\s*(\d+)', r'\1 (\2', text)  # 只处理数字和括号之间的空格
-            
-            # 5. 保护标题格式
-            text = re.sub(r'选项\s*(\d+)\s*:', r'选项\1:', text)  # 修复选项标题格式
-            
-            # 6. 保护数字和单位
-            text = re.sub(r'(\d+)\s*个', r'\1个', text)  # 修复数字和"个"之间的空格
-            text = re.sub(r'(\d+)\s*行', r'\1行', text)  # 修复数字和"行"之间的空格
-            text = re.sub(r'(\d+)\s*针', r'\1针', text)  # 修复数字和"针"之间的空格
-            
-            # 7. 保护括号内的内容
-            text = re.sub(r'[（(]\s*([^）)]+)\s*[）)]', r'(\1)', text)  # 统一括号格式
-            
-            all_text.append(text)
+            # OCR识别
+            if with_confidence:
+                yield img_path, ocr_page_lines(image, layouts.get(img_path), ocr_engine)
+                continue
+            text = ocr_page(image, layouts.get(img_path), ocr_engine)
+            yield img_path, clean_page_text(text)
         except Exception as e:
             print(f"处理图片 {img_path} 时出错: {e}")
             continue
-    
-    # 合并所有页的文本，保持段落结构
-    merged_text = '\n\n'.join(all_text)
-    
-    # 用Gemini处理页眉页脚和术语纠错
-    processed_text = process_text_with_gemini(merged_text, client)
+
+def images_to_text(image_dir, use_layout=True, resume=True, engine=None, selective=False):
+    """
+    处理图片并提取文本，所有页合并后统一处理
+    selective 为 True 时按OCR置信度纠错：只有低置信度的行连同少量上下文发给 Gemini，
+    其余行用 OCRPostProcessor 本地处理；默认为 False，把全文交给 Gemini（原来的做法），命令行 ocr 默认开启
+    每识别完一页就写入断点日志，中断后重跑只识别剩下的页；Gemini 的结果也会记录
+    """
+    client = setup_gemini()
     
     # 确保输出目录存在
     output_dir = os.path.join(ROOT_DIR, 'data', 'processed')
     os.makedirs(output_dir, exist_ok=True)
     
+    image_files = list_images(image_dir)
+    checkpoint = Checkpoint(
+        os.path.join(output_dir, 'images_to_text.journal'),
+        fingerprint([file_fingerprint(image_files), use_layout, selective]),
+        resume=resume
+    )
+    
+    done_pages = {path for path in image_files if checkpoint.done(path)}
+    with stage('ocr_pages'):
+        pages = iter_page_texts(image_dir, use_layout, skip=done_pages, engine=engine, with_confidence=selective)
+        for img_path, page in pages:
+            checkpoint.record(img_path, page)
+        all_text = [checkpoint.get(path) for path in image_files if checkpoint.done(path)]
+    
+    # 纠错结果只在所有页都识别成功时记录和复用：有页失败时，重跑补上的页必须重新纠错
+    complete = len(all_text) == len(image_files)
+    processed_text = checkpoint.get('gemini') if complete else None
+    if processed_text is None and selective:
+        # 只把低置信度的行交给 Gemini
+        with stage('correction'):
+            processed_text, ok = SelectiveCorrector(client).correct(merge_page_lines(all_text))
+        if ok and complete:
+            checkpoint.record('gemini', processed_text)
+    elif processed_text is None:
+        with stage('correction'):
+            # 合并所有页的文本，保持段落结构
+            merged_text = '\n\n'.join(all_text)
+            
+            # 用Gemini处理页眉页脚和术语纠错
+            processed_text = process_text_with_gemini(merged_text, client)
+        # 出错时 process_text_with_gemini 返回原文，这种结果不记录，下次重试
+        if processed_text != merged_text and complete:
+            checkpoint.record('gemini', processed_text)
+    print_prompt_stats('ocr_correction', 'ocr_full_correction')
+    
     # 保存所有处理结果到一个文件
     output_file = os.path.join(output_dir, 'all_processed_text.txt')
-    with open(output_file, 'w', encoding='utf-8') as f:
+    with stage('write_output'), open(output_file, 'w', encoding='utf-8') as f:
         f.write(processed_text)
     
+    # 只有所有页都成功识别、Gemini 纠错也成功记录才删除断点日志，失败的部分下次重跑
+    if complete and checkpoint.done('gemini'):
+        checkpoint.clear()
+    
     return processed_text
 
 if __name__ == '__main__':
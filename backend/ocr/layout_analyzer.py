@@ -0,0 +1,196 @@
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
+from PIL import Image
+
+# 二值化阈值：灰度低于该值视为墨迹
+INK_THRESHOLD = 128
+# 页眉页脚只在页面上下这部分高度内查找
+MARGIN_RATIO = 0.12
+# 同一条带在至少这么多比例的页面上出现，才认为是重复的页眉页脚
+REPEAT_PAGE_RATIO = 0.5
+# 一行中墨迹比例低于该值视为空白行
+BLANK_ROW_RATIO = 0.002
+# 文本块之间的最小空白行数（按像素计），没有按页面估算行高时使用
+BLOCK_GAP = 12
+# 墨迹密度高于该值的块视为图片或图表
+MAX_TEXT_DENSITY = 0.35
+# 连续无空白的高度超过该值的块视为图片或图表（文字行不会这么高），没有按页面估算行高时使用
+MAX_TEXT_LINE_HEIGHT = 160
+# 以下阈值按页面的行高换算，扫描分辨率不同（例如 5170x7311 的扫描页）也适用：
+# 块之间的空白至少为行高的这么多倍
+BLOCK_GAP_LINES = 1.2
+# 连续墨迹超过行高的这么多倍才视为图片（标题的字比正文大，约为正文行高的2倍）
+FIGURE_LINES = 4
+# 估算的行高不超过页面高度的这个比例（整页都是图片时中位数没有意义）
+MAX_LINE_HEIGHT_RATIO = 0.04
+# 页眉页脚签名的缩略图尺寸
+SIGNATURE_SIZE = (48, 6)
+
+
+class PageLayout:
+    """单页的版面分析结果"""
+    def __init__(self, path: str, size: Tuple[int, int]):
+        self.path = path
+        self.size = size
+        self.text_blocks: List[Tuple[int, int, int, int]] = []
+        self.skipped_blocks: List[Dict] = []
+
+    def to_dict(self) -> Dict:
+        return {
+            "path": self.path,
+            "size": list(self.size),
+            "text_blocks": [list(box) for box in self.text_blocks],
+            "skipped_blocks": self.skipped_blocks
+        }
+
+
+def to_ink_mask(image: Image.Image) -> Image.Image:
+    """转换为墨迹掩码：墨迹为255，背景为0"""
+    if image.mode != 'L':
+        image = image.convert('L')
+    return image.point(lambda p: 255 if p < INK_THRESHOLD else 0)
+
+
+def row_profile(mask: Image.Image) -> List[float]:
+    """水平投影：每一行的墨迹比例"""
+    width, height = mask.size
+    column = mask.resize((1, height), Image.BOX)
+    return [value / 255 for value in column.getdata()]
+
+
+def find_blocks(profile: List[float], gap: int = BLOCK_GAP) -> List[Tuple[int, int]]:
+    """根据水平投影把页面切成若干块，块之间至少隔gap个空白行"""
+    blocks = []
+    start = None
+    blank_run = 0
+    for y, ratio in enumerate(profile):
+        if ratio > BLANK_ROW_RATIO:
+            if start is None:
+                start = y
+            blank_run = 0
+        elif start is not None:
+            blank_run += 1
+            if blank_run >= gap:
+                blocks.append((start, y - blank_run + 1))
+                start = None
+                blank_run = 0
+    if start is not None:
+        blocks.append((start, len(profile) - blank_run))
+    return blocks
+
+
+def ink_runs(profile: List[float]) -> List[int]:
+    """所有连续非空白行的高度"""
+    runs = []
+    current = 0
+    for ratio in profile:
+        if ratio > BLANK_ROW_RATIO:
+            current += 1
+        elif current:
+            runs.append(current)
+            current = 0
+    if current:
+        runs.append(current)
+    return runs
+
+
+def estimate_line_height(profile: List[float]) -> Optional[int]:
+    """页面的文字行高：连续墨迹高度的中位数，没有墨迹时返回 None"""
+    runs = sorted(ink_runs(profile))
+    if not runs:
+        return None
+    return max(1, min(runs[len(runs) // 2], int(len(profile) * MAX_LINE_HEIGHT_RATIO)))
+
+
+def longest_ink_run(profile: List[float], top: int, bottom: int) -> int:
+    """块内最长的连续非空白行数，用于区分文字行和图片"""
+    longest = current = 0
+    for ratio in profile[top:bottom]:
+        if ratio > BLANK_ROW_RATIO:
+            current += 1
+            longest = max(longest, current)
+        else:
+            current = 0
+    return longest
+
+
+def band_signature(mask: Image.Image, top: int, bottom: int) -> bytes:
+    """计算条带的签名：缩成小图后二值化，对OCR噪声和轻微偏移不敏感"""
+    width, _ = mask.size
+    band = mask.crop((0, top, width, bottom)).resize(SIGNATURE_SIZE, Image.BOX)
+    return bytes(1 if value > 32 else 0 for value in band.getdata())
+
+
+def classify_block(profile: List[float], top: int, bottom: int,
+                   max_line_height: int = MAX_TEXT_LINE_HEIGHT) -> Optional[str]:
+    """
+    判断块是否为非文字区域，返回跳过原因；文字块返回None
+    max_line_height 为本页文字行的最大高度（按页面行高换算），只有比它更高的连续墨迹才算图片
+    """
+    height = bottom - top
+    if height <= 0:
+        return "empty"
+    density = sum(profile[top:bottom]) / height
+    if density > MAX_TEXT_DENSITY:
+        return "dense"
+    if longest_ink_run(profile, top, bottom) > max_line_height:
+        return "figure"
+    return None
+
+
+def _scan_page(path: str, preprocess=None) -> Dict:
+    """扫描单页，得到分块和页边条带签名"""
+    with Image.open(path) as image:
+        if preprocess:
+            image = preprocess(image)
+        mask = to_ink_mask(image)
+        size = mask.size
+    profile = row_profile(mask)
+    line_height = estimate_line_height(profile)
+    if line_height is None:
+        gap, max_line_height = BLOCK_GAP, MAX_TEXT_LINE_HEIGHT
+    else:
+        gap, max_line_height = max(2, round(line_height * BLOCK_GAP_LINES)), line_height * FIGURE_LINES
+    blocks = find_blocks(profile, gap)
+    margin = int(size[1] * MARGIN_RATIO)
+    signatures = {}
+    for top, bottom in blocks:
+        if bottom <= margin or top >= size[1] - margin:
+            signatures[(top, bottom)] = band_signature(mask, top, bottom)
+    return {"size": size, "profile": profile, "blocks": blocks, "signatures": signatures,
+            "max_line_height": max_line_height}
+
+
+def analyze_pages(image_paths: List[str], preprocess=None) -> List[PageLayout]:
+    """
+    对所有页做版面分析：
+    1. 找出在多数页面重复出现的页眉页脚条带
+    2. 找出图片、图表等非文字区域
+    只有剩下的文字块需要OCR
+    """
+    scans = [_scan_page(path, preprocess) for path in image_paths]
+
+    # 统计每个页边签名出现在多少页上
+    signature_pages = Counter()
+    for scan in scans:
+        for signature in set(scan["signatures"].values()):
+            signature_pages[signature] += 1
+    min_pages = max(2, int(len(scans) * REPEAT_PAGE_RATIO))
+    repeated = {sig for sig, count in signature_pages.items() if count >= min_pages}
+
+    layouts = []
+    for path, scan in zip(image_paths, scans):
+        layout = PageLayout(path, scan["size"])
+        width = scan["size"][0]
+        for top, bottom in scan["blocks"]:
+            signature = scan["signatures"].get((top, bottom))
+            if signature is not None and signature in repeated:
+                reason = "header_footer"
+            else:
+                reason = classify_block(scan["profile"], top, bottom, scan["max_line_height"])
+            if reason:
+                layout.skipped_blocks.append({"box": [0, top, width, bottom], "reason": reason})
+            else:
+                layout.text_blocks.append((0, top, width, bottom))
+        layouts.append(layout)
+    return layouts
@@ -1,39 +1,66 @@
 import re
+from typing import Dict, List, Optional, Tuple
 from .correction_rules import TERM_MAPPING, REMOVE_PATTERNS, NUMBER_PATTERNS, BRACKET_PATTERNS, CONTEXT_PATTERNS
+from .correction_dict import TermTrie, CorrectionDictionary, DEFAULT_BADCASE_FILE
+
 
 class OCRPostProcessor:
-    def __init__(self):
-        self.term_mapping = TERM_MAPPING
-        self.remove_patterns = [re.compile(pattern) for pattern in REMOVE_PATTERNS]
-        self.number_patterns = [(re.compile(pattern), replacement) for pattern, replacement in NUMBER_PATTERNS]
-        self.bracket_patterns = BRACKET_PATTERNS
-        self.context_patterns = [(re.compile(pattern), replacement) for pattern, replacement in CONTEXT_PATTERNS]
+    """
+    OCR 文本后处理器，所有规则在初始化时编译一次：
+    - 顺序与原来相同：删除 -> 数字 -> 括号 -> 上下文 -> 术语
+    - 正则规则（删除、数字、上下文）数量固定且很少，各扫描一遍
+    - 括号标准化是一棵小字典树；术语映射和 badcase 合并成一棵字典树，一次扫描完成替换，
+      术语表增长到成千上万条时处理时间基本不变
+    badcase_file 为 None 时只使用静态规则
+    """
+    def __init__(self,
+                 term_mapping: Optional[Dict[str, str]] = None,
+                 remove_patterns: Optional[List[str]] = None,
+                 number_patterns: Optional[List[Tuple[str, str]]] = None,
+                 bracket_patterns: Optional[List[Tuple[str, str]]] = None,
+                 context_patterns: Optional[List[Tuple[str, str]]] = None,
+                 badcase_file: Optional[str] = None):
+        term_mapping = TERM_MAPPING if term_mapping is None else term_mapping
+        remove_patterns = REMOVE_PATTERNS if remove_patterns is None else remove_patterns
+        number_patterns = NUMBER_PATTERNS if number_patterns is None else number_patterns
+        bracket_patterns = BRACKET_PATTERNS if bracket_patterns is None else bracket_patterns
+        context_patterns = CONTEXT_PATTERNS if context_patterns is None else context_patterns
+
+        # 正则规则：(已编译模式, 替换模板)，删除规则的替换为空
+        self.regex_rules = [(re.compile(pattern), '') for pattern in remove_patterns]
+        self.regex_rules += [(re.compile(pattern), replacement) for pattern, replacement in number_patterns]
+        self.brackets = TermTrie(dict(bracket_patterns))
+        self.context_rules = [(re.compile(pattern), replacement) for pattern, replacement in context_patterns]
+        self.dictionary = CorrectionDictionary(term_mapping, badcase_file)
 
     def process(self, text: str) -> str:
         """处理OCR文本"""
-        # 1. 删除不需要的文本
-        for pattern in self.remove_patterns:
-            text = pattern.sub('', text)
-
-        # 2. 修复数字模式
-        for pattern, replacement in self.number_patterns:
+        # 1. 删除不需要的文本  2. 修复数字模式
+        for pattern, replacement in self.regex_rules:
             text = pattern.sub(replacement, text)
 
         # 3. 标准化括号
-        for old, new in self.bracket_patterns:
-            text = text.replace(old, new)
+        text = self.brackets.replace(text)
 
         # 4. 上下文相关的替换
-        for pattern, replacement in self.context_patterns:
+        for pattern, replacement in self.context_rules:
             text = pattern.sub(replacement, text)
 
-        # 5. 替换术语
-        for old, new in self.term_mapping.items():
-            text = text.replace(old, new)
+        # 5. 替换术语（badcase 文件有变化时自动热加载）
+        return self.dictionary.replace(text)
+
+
+_default_processor = None
+
+
+def get_processor() -> OCRPostProcessor:
+    """获取模块级缓存的处理器，避免每次调用都重新编译规则"""
+    global _default_processor
+    if _default_processor is None:
+        _default_processor = OCRPostProcessor(badcase_file=DEFAULT_BADCASE_FILE)
+    return _default_processor
 
-        return text
 
 def process_text(text: str) -> str:
     """处理文本的便捷函数"""
-    processor = OCRPostProcessor()
-    return processor.process(text) 
\ No newline at end of file
+    return get_processor().process(text)
@@ -0,0 +1,24 @@
+import re
+from typing import List, Optional
+
+# 页首、页尾各检查这么多个非空行，用于识别页眉页脚
+MARGIN_LINES = 2
+# 编织说明的特征词，含这些词的行不会被当成页眉页脚
+_INSTRUCTION = re.compile(r'行|针|重复')
+_DIGITS = re.compile(r'\d+')
+
+
+def margin_indexes(lines: List[str], margin_lines: int = MARGIN_LINES) -> List[int]:
+    """页首、页尾各 margin_lines 个非空行的下标"""
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    return sorted(set(content[:margin_lines] + content[-margin_lines:]))
+
+
+def margin_key(line: str) -> Optional[str]:
+    """
+    页边一行用于比较是否重复的键：数字都视为相同（逐页变化的页码）
+    像编织说明的行（含“行”“针”“重复”）返回 None，不当成页眉页脚
+    """
+    if _INSTRUCTION.search(line):
+        return None
+    return _DIGITS.sub('0', line.strip())
@@ -0,0 +1,153 @@
+import os
+from collections import Counter
+from typing import Iterator, List, Tuple
+
+from utils.profiling import stage
+
+try:
+    from pypdf import PdfReader
+    pypdf_available = True
+except ImportError:
+    pypdf_available = False
+
+try:
+    from .page_margins import margin_indexes, margin_key
+except ImportError:
+    from page_margins import margin_indexes, margin_key
+
+# 项目根目录（与 image_to_text.ROOT_DIR 相同）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 文字层少于这么多个非空白字符的页面视为纯图片页，需要OCR
+MIN_TEXT_CHARS = 20
+# 页边的一行文字在超过这么多比例的页面上出现（且至少 MIN_REPEAT_PAGES 页），视为页眉页脚
+REPEAT_LINE_RATIO = 0.5
+MIN_REPEAT_PAGES = 3
+
+
+def _image_to_text():
+    """OCR 和 Gemini 纠错的依赖较重，只在有页面需要OCR时才导入"""
+    try:
+        from . import image_to_text
+    except ImportError:
+        import image_to_text
+    return image_to_text
+
+
+def extract_text_layer(pdf_path: str) -> List[str]:
+    """读取PDF每一页的内嵌文字层，没有文字层的页面返回空字符串"""
+    if not pypdf_available:
+        return []
+    reader = PdfReader(pdf_path)
+    pages = []
+    for page in reader.pages:
+        try:
+            pages.append(page.extract_text() or '')
+        except Exception as e:
+            print(f"读取文字层时出错: {e}")
+            pages.append('')
+    return pages
+
+
+def has_text_layer(text: str, min_chars: int = MIN_TEXT_CHARS) -> bool:
+    """判断页面是否带有可用的文字层"""
+    return sum(1 for char in text if not char.isspace()) >= min_chars
+
+
+def remove_repeated_lines(pages: List[str]) -> List[str]:
+    """
+    删除页眉、页脚：只看每页页首、页尾的几行，在多数页面的页边重复出现的行才删除
+    比较时数字都视为相同（逐页变化的页码）；像编织说明的行（含“行”“针”“重复”）即使在页边重复也保留
+    """
+    if len(pages) < MIN_REPEAT_PAGES:
+        return pages
+    split_pages = [text.split('\n') for text in pages]
+    line_pages = Counter()
+    for lines in split_pages:
+        line_pages.update({margin_key(lines[i]) for i in margin_indexes(lines)} - {None})
+    min_pages = max(MIN_REPEAT_PAGES, int(len(pages) * REPEAT_LINE_RATIO) + 1)
+    repeated = {line for line, count in line_pages.items() if count >= min_pages}
+    result = []
+    for lines in split_pages:
+        margins = margin_indexes(lines)
+        result.append('\n'.join(
+            line for i, line in enumerate(lines)
+            if i not in margins or margin_key(line) not in repeated
+        ))
+    return result
+
+
+def ocr_pdf_page(pdf_path: str, page_number: int, dpi: int = 300) -> str:
+    """只把单页栅格化后OCR（页码从1开始）"""
+    from pdf2image import convert_from_path
+    with stage('rasterize'):
+        images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    if not images:
+        return ''
+    image_to_text = _image_to_text()
+    with stage('ocr'):
+        image = image_to_text.preprocess_image(images[0])
+        return image_to_text.clean_page_text(image_to_text.ocr_page(image))
+
+
+def iter_pdf_page_texts(pdf_path: str, dpi: int = 300) -> Iterator[Tuple[int, str, bool]]:
+    """
+    逐页产出 (页码, 文本, 是否使用了OCR)：有文字层的页面直接读取，纯图片页才OCR
+    """
+    with stage('text_layer'):
+        layer_pages = extract_text_layer(pdf_path)
+    if not layer_pages:
+        # 没有 pypdf 或 PDF 无法解析时，整本走OCR
+        from pdf2image import pdfinfo_from_path
+        layer_pages = [''] * pdfinfo_from_path(pdf_path)['Pages']
+
+    for page_number, text in enumerate(layer_pages, start=1):
+        if has_text_layer(text):
+            yield page_number, text, False
+        else:
+            yield page_number, ocr_pdf_page(pdf_path, page_number, dpi), True
+
+
+def pdf_to_page_texts(pdf_path: str, dpi: int = 300) -> Tuple[List[str], List[int]]:
+    """
+    逐页提取文本，返回 (每页文本, 使用了OCR的页码列表)
+    """
+    texts = []
+    ocr_pages = []
+    for page_number, text, used_ocr in iter_pdf_page_texts(pdf_path, dpi):
+        texts.append(text)
+        if used_ocr:
+            ocr_pages.append(page_number)
+    return texts, ocr_pages
+
+
+def pdf_to_text(pdf_path: str, dpi: int = 300) -> str:
+    """
+    PDF转文本的入口：文字版PDF直接提取文字层，只有OCR过的页面才交给Gemini纠错
+    """
+    texts, ocr_pages = pdf_to_page_texts(pdf_path, dpi)
+    print(f"共 {len(texts)} 页，其中 {len(ocr_pages)} 页使用OCR")
+    texts = remove_repeated_lines(texts)
+
+    if ocr_pages:
+        image_to_text = _image_to_text()
+        client = image_to_text.setup_gemini()
+        with stage('correction'):
+            for page_number in ocr_pages:
+                texts[page_number - 1] = image_to_text.process_text_with_gemini(texts[page_number - 1], client)
+
+    merged_text = '\n\n'.join(texts)
+
+    # 确保输出目录存在
+    output_dir = os.path.join(ROOT_DIR, 'data', 'processed')
+    os.makedirs(output_dir, exist_ok=True)
+
+    output_file = os.path.join(output_dir, 'all_processed_text.txt')
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(merged_text)
+
+    return merged_text
+
+
+if __name__ == '__main__':
+    pdf_path = os.path.join(ROOT_DIR, 'data', 'raw', 'PDF', '大吉岭背心-text.pdf')
+    print(pdf_to_text(pdf_path))
@@ -0,0 +1,126 @@
+import re
+import json
+from typing import Any, Dict, List, Tuple
+
+try:
+    from .ocr_post_processor import get_processor
+except ImportError:
+    from ocr_post_processor import get_processor
+from utils.prompt_builder import PromptBuilder
+
+# tesseract 的词置信度为 0-100，行内最低词置信度低于此值的行交给 LLM 纠错
+LOW_CONFIDENCE = 80
+# 每个低置信度行前后附带的上下文行数
+CONTEXT_LINES = 1
+GEMINI_MODEL = "gemini-2.0-flash"
+
+PROMPT = """
+你是一个专业的编织图解OCR纠错助手。下面是编织图解OCR结果中的若干片段，
+标有 [编号] 的行识别置信度较低，其余行只是上下文，不需要修改。
+
+要求：
+1. 只纠正标有编号的行中的OCR错误，例如错字、错误的编织术语（上针、下针、空加针、左上2并1等）、
+   数字与符号的识别错误
+2. 保持所有数字、括号内的尺寸数据和补充说明，不允许删除或合并内容
+3. 如果某行是页眉、页脚或页码（例如社交媒体账号、店铺信息），纠正结果为空字符串
+4. 不确定时保持原文
+
+以 JSON 对象返回，键为编号，值为纠正后的整行文本，例如 {"12": "第 1行: 下针"}。
+只输出 JSON，不要任何额外说明。
+"""
+
+
+class SelectiveCorrector:
+    """
+    按置信度选择性纠错：所有行先用 OCRPostProcessor 在本地处理，
+    只有低置信度的行（连同前后少量上下文）发给 LLM，LLM 的输入只是全文的一小部分
+    client 为 None 时只做本地处理
+    """
+    def __init__(self, client=None, threshold: float = LOW_CONFIDENCE, context_lines: int = CONTEXT_LINES,
+                 processor=None, model: str = GEMINI_MODEL):
+        self.client = client
+        self.threshold = threshold
+        self.context_lines = context_lines
+        self.processor = processor or get_processor()
+        self.model = model
+        # 说明和输出格式是固定前缀，片段放在最后
+        self.prompt = PromptBuilder('ocr_correction', PROMPT)
+        self.stats = {}
+
+    def select(self, lines: List[Dict[str, Any]]) -> List[int]:
+        """低置信度行的下标"""
+        return [
+            i for i, line in enumerate(lines)
+            if line["text"].strip() and line["conf"] is not None and line["conf"] < self.threshold
+        ]
+
+    def build_fragments(self, texts: List[str], selected: List[int]) -> str:
+        """低置信度行及其上下文，相邻的窗口合并成一个片段"""
+        windows = []
+        for i in selected:
+            start, end = max(0, i - self.context_lines), min(len(texts), i + self.context_lines + 1)
+            if windows and start <= windows[-1][1]:
+                windows[-1][1] = max(windows[-1][1], end)
+            else:
+                windows.append([start, end])
+        marked = set(selected)
+        fragments = []
+        for start, end in windows:
+            fragment = [
+                f"[{i}] {texts[i]}" if i in marked else f"    {texts[i]}"
+                for i in range(start, end)
+                if texts[i].strip() or i in marked
+            ]
+            fragments.append('\n'.join(fragment))
+        return '\n---\n'.join(fragments)
+
+    def request_corrections(self, fragments: str, full_text: str = '') -> Dict[int, str]:
+        """full_text 为整篇交给 LLM 时会发送的全文，只用于统计省下的 token"""
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=self.prompt.text(f"片段：\n{fragments}", full_content=full_text),
+            config={"response_mime_type": "application/json"}
+        )
+        content = re.sub(r'^```(?:json)?\s*|\s*```$', '', response.text.strip())
+        return {int(key): value for key, value in json.loads(content).items()}
+
+    def correct(self, lines: List[Dict[str, Any]]) -> Tuple[str, bool]:
+        """
+        返回 (纠错后的全文, 是否成功)；LLM 调用失败时返回只经过本地处理的文本，成功标记为 False
+        """
+        texts = [self.processor.process(line["text"]) for line in lines]
+        selected = self.select(lines)
+        ok = True
+        fragments = ''
+        if selected and self.client is not None:
+            fragments = self.build_fragments(texts, selected)
+            try:
+                corrections = self.request_corrections(fragments, '\n'.join(texts))
+                for i in selected:
+                    if i in corrections and isinstance(corrections[i], str):
+                        texts[i] = self.processor.process(corrections[i])
+            except Exception as e:
+                print(f"LLM 纠错出错: {e}")
+                ok = False
+
+        total_chars = sum(len(text) for text in texts)
+        self.stats = {
+            "lines": sum(1 for line in lines if line["text"].strip()),
+            "low_confidence_lines": len(selected),
+            "total_chars": total_chars,
+            "llm_chars": len(fragments),
+        }
+        share = len(fragments) / total_chars * 100 if total_chars else 0
+        print(f"低置信度行: {len(selected)}/{self.stats['lines']}，"
+              f"发送给 LLM 的字符: {len(fragments)}/{total_chars}（{share:.1f}%）")
+        return '\n'.join(texts), ok
+
+
+def merge_page_lines(pages: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """把各页的行合并成一个列表，页与页之间空一行"""
+    lines = []
+    for page in pages:
+        if lines:
+            lines.append({"text": "", "conf": None})
+        lines.extend(page)
+    return lines
@@ -0,0 +1,198 @@
+import os
+import queue
+import shlex
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Tuple
+
+# 可选的 OCR 引擎：pytesseract 每次调用都启动一个 tesseract 进程；
+# pool 使用 tesserocr 在进程内常驻若干个已初始化的引擎（需要 pip install tesserocr）
+ENGINES = ['pytesseract', 'pool']
+DEFAULT_ENGINE = os.getenv('OCR_ENGINE', 'pytesseract')
+DEFAULT_POOL_SIZE = int(os.getenv('OCR_POOL_SIZE', min(4, os.cpu_count() or 1)))
+
+
+def parse_tesseract_config(config: str) -> Tuple[int, int, Dict[str, str]]:
+    """
+    把 pytesseract 的命令行参数（--oem、--psm、-c 变量=值）转换成 (oem, psm, 变量)，
+    两种引擎使用同一份 OCR_CONFIG，识别结果才可比
+    """
+    oem, psm, variables = 3, 3, {}
+    args = shlex.split(config)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '--oem':
+            oem = int(args[i + 1])
+            i += 1
+        elif arg == '--psm':
+            psm = int(args[i + 1])
+            i += 1
+        elif arg == '-c':
+            name, _, value = args[i + 1].partition('=')
+            variables[name] = value
+            i += 1
+        i += 1
+    return oem, psm, variables
+
+
+def _needs_space(left: str, right: str) -> bool:
+    """只有两侧都是 ASCII 字符（数字、字母、括号等）时才用空格分隔，汉字之间不加空格"""
+    return ord(left) < 128 and ord(right) < 128
+
+
+def group_words(words: Iterable[Tuple[Any, Any, str, float]]) -> List[Dict[str, Any]]:
+    """
+    把 (行号, 段落号, 词, 置信度) 序列合并成行：{"text": 行文本, "conf": 行内最低的词置信度}
+    段落之间插入一个空行（conf 为 None），与 image_to_string 的输出格式一致
+    """
+    lines = []
+    current_line = current_para = None
+    for line_key, para_key, word, conf in words:
+        word = word.strip()
+        if not word:
+            continue
+        if line_key != current_line:
+            if lines and para_key != current_para:
+                lines.append({"text": "", "conf": None})
+            lines.append({"text": "", "conf": None})
+            current_line, current_para = line_key, para_key
+        line = lines[-1]
+        if line["text"] and _needs_space(line["text"][-1], word[0]):
+            line["text"] += ' '
+        line["text"] += word
+        if conf >= 0:
+            line["conf"] = conf if line["conf"] is None else min(line["conf"], conf)
+    return lines
+
+
+class PytesseractEngine:
+    """原来的实现：每张图片写临时文件，再启动一次 tesseract 进程（每次都重新加载语言模型）"""
+    name = 'pytesseract'
+
+    def __init__(self, lang: str = 'chi_sim', config: str = ''):
+        self.lang = lang
+        self.config = config
+
+    def image_to_string(self, image) -> str:
+        import pytesseract
+        return pytesseract.image_to_string(image, lang=self.lang, config=self.config)
+
+    def images_to_strings(self, images: List) -> List[str]:
+        return [self.image_to_string(image) for image in images]
+
+    def image_to_lines(self, image) -> List[Dict[str, Any]]:
+        """按行识别，并保留每行的置信度（见 group_words）"""
+        import pytesseract
+        data = pytesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                         output_type=pytesseract.Output.DICT)
+        words = []
+        for i, level in enumerate(data['level']):
+            # level 5 为词
+            if level != 5:
+                continue
+            para_key = (data['block_num'][i], data['par_num'][i])
+            words.append((para_key + (data['line_num'][i],), para_key, data['text'][i], float(data['conf'][i])))
+        return group_words(words)
+
+    def images_to_lines(self, images: List) -> List[List[Dict[str, Any]]]:
+        return [self.image_to_lines(image) for image in images]
+
+    def close(self):
+        pass
+
+
+class TesseractPool:
+    """
+    常驻的 tesseract 引擎池：每个引擎只初始化一次（语言模型只加载一次），
+    图片以内存缓冲区直接交给引擎，不写临时文件
+    tesserocr 识别时会释放 GIL，所以同一页的多个文字块可以由多个引擎并行识别
+    """
+    name = 'pool'
+
+    def __init__(self, lang: str = 'chi_sim', config: str = '', size: int = DEFAULT_POOL_SIZE):
+        import tesserocr
+        oem, psm, variables = parse_tesseract_config(config)
+        self.size = max(1, size)
+        self._apis = queue.Queue()
+        for _ in range(self.size):
+            # 部分 textord_* 参数只在初始化时生效，所以通过 variables 传入而不是之后 SetVariable
+            self._apis.put(tesserocr.PyTessBaseAPI(lang=lang, oem=oem, psm=psm, variables=variables))
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='tesseract')
+        print(f"OCR 引擎池已启动：{self.size} 个 tesseract 引擎（{lang}）")
+
+    @contextmanager
+    def _acquire(self):
+        api = self._apis.get()
+        try:
+            yield api
+        finally:
+            self._apis.put(api)
+
+    def image_to_string(self, image) -> str:
+        with self._acquire() as api:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+
+    def images_to_strings(self, images: List) -> List[str]:
+        """并行识别多张图片，结果顺序与输入一致"""
+        return self._map(self.image_to_string, images)
+
+    def image_to_lines(self, image) -> List[Dict[str, Any]]:
+        """按行识别，并保留每行的置信度（见 group_words）"""
+        from tesserocr import RIL, iterate_level
+        words = []
+        with self._acquire() as api:
+            api.SetImage(image)
+            api.Recognize()
+            iterator = api.GetIterator()
+            if iterator is None:
+                return []
+            line_key = para_key = 0
+            for word in iterate_level(iterator, RIL.WORD):
+                if word.IsAtBeginningOf(RIL.PARA):
+                    para_key += 1
+                if word.IsAtBeginningOf(RIL.TEXTLINE):
+                    line_key += 1
+                words.append((line_key, para_key, word.GetUTF8Text(RIL.WORD) or '', word.Confidence(RIL.WORD)))
+        return group_words(words)
+
+    def images_to_lines(self, images: List) -> List[List[Dict[str, Any]]]:
+        return self._map(self.image_to_lines, images)
+
+    def _map(self, function, images: List) -> List:
+        if len(images) <= 1:
+            return [function(image) for image in images]
+        return list(self._executor.map(function, images))
+
+    def close(self):
+        self._executor.shutdown()
+        for _ in range(self.size):
+            self._apis.get().End()
+
+
+_engines: Dict[Tuple[str, str, str], object] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name: str = None, lang: str = 'chi_sim', config: str = ''):
+    """
+    按名称获取（并缓存）OCR 引擎，默认取环境变量 OCR_ENGINE
+    选择 pool 但没有安装 tesserocr 时退回 pytesseract
+    """
+    name = name or DEFAULT_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"未知的 OCR 引擎: {name}，可选: {', '.join(ENGINES)}")
+    key = (name, lang, config)
+    with _engines_lock:
+        if key not in _engines:
+            if name == 'pool':
+                try:
+                    _engines[key] = TesseractPool(lang, config)
+                except ImportError as e:
+                    print(f"无法启动 OCR 引擎池（{e}），改用 pytesseract")
+                    _engines[key] = PytesseractEngine(lang, config)
+            else:
+                _engines[key] = PytesseractEngine(lang, config)
+        return _engines[key]
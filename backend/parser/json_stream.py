@@ -0,0 +1,90 @@
+import json
+from typing import Any, Dict, List, Optional
+
+
+class RowStreamParser:
+    """
+    增量 JSON 解析器：逐块喂入 LLM 的流式输出，"rows" 数组里的每个对象一闭合就解析出来
+    只跟踪括号层级、字符串和键名，不会重复扫描已处理的文本；
+    根对象 '{' 之前和之后的内容（例如 ```json 标记或说明文字）都被忽略，与 find('{')/rfind('}') 的做法一致
+    """
+    def __init__(self, array_key: str = 'rows'):
+        self.array_key = array_key
+        self.text = ''
+        self.pos = 0
+        # 每层容器：{"type": '{' 或 '[', "key": 最近的键, "expect_key": 是否在等待键}
+        self.stack: List[Dict[str, Any]] = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.rows_depth: Optional[int] = None
+        self.item_start: Optional[int] = None
+        self.root_start: Optional[int] = None
+        self.root_end: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """喂入一块文本，返回这块文本里闭合的行对象"""
+        self.text += chunk
+        rows = []
+        text = self.text
+        while self.pos < len(text) and self.root_end is None:
+            char = text[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    self._string_closed(text[self.string_start:self.pos + 1])
+            elif self.root_start is None:
+                if char == '{':
+                    self.root_start = self.pos
+                    self.stack.append({"type": '{', "key": None, "expect_key": True})
+            elif char == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif char in '{[':
+                parent = self.stack[-1]
+                if char == '[' and parent["type"] == '{' and parent["key"] == self.array_key and self.rows_depth is None:
+                    self.rows_depth = len(self.stack) + 1
+                if char == '{' and self.rows_depth is not None and len(self.stack) == self.rows_depth:
+                    self.item_start = self.pos
+                self.stack.append({"type": char, "key": None, "expect_key": char == '{'})
+            elif char in '}]':
+                self.stack.pop()
+                if char == '}' and self.item_start is not None and len(self.stack) == self.rows_depth:
+                    row = self._loads(text[self.item_start:self.pos + 1])
+                    if isinstance(row, dict):
+                        rows.append(row)
+                    self.item_start = None
+                if char == ']' and self.rows_depth is not None and len(self.stack) == self.rows_depth - 1:
+                    self.rows_depth = None
+                if not self.stack:
+                    self.root_end = self.pos + 1
+            elif char == ':' and self.stack[-1]["type"] == '{':
+                self.stack[-1]["expect_key"] = False
+            elif char == ',' and self.stack[-1]["type"] == '{':
+                self.stack[-1]["expect_key"] = True
+            self.pos += 1
+        return rows
+
+    def _string_closed(self, literal: str):
+        if not self.stack:
+            return
+        top = self.stack[-1]
+        if top["type"] == '{' and top["expect_key"]:
+            top["key"] = self._loads(literal)
+
+    @staticmethod
+    def _loads(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
+
+    def result(self) -> Dict[str, Any]:
+        """流结束后解析完整的根对象；没有完整的 JSON 时抛出 ValueError"""
+        if self.root_start is None or self.root_end is None:
+            raise ValueError("无法在响应中找到有效的JSON")
+        return json.loads(self.text[self.root_start:self.root_end])
@@ -1,13 +1,108 @@
-import openai
 import json
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, Iterator, List, Any, Optional
 import os
 from dotenv import load_dotenv
-from src.parser.size_extractor import SizeExtractor
+from parser.size_extractor import SizeExtractor
+from parser.stitch_simulator import StitchSimulator, STITCH_TYPES
+from parser.knitting_store import save_knitting_data, load_knitting_data
+from parser.row_offsets import RowOffsets
+from utils.section_cache import SectionCache
+from parser.json_stream import RowStreamParser
+from utils.hedged_llm import HedgedCaller, DeadlineExceeded, LATENCY_STATS_FILE
+from utils.model_router import ModelRouter, difficulty_score
+from utils.prompt_builder import PromptBuilder, first_line, print_prompt_stats, reset_prompt_stats
+from utils.llm_clients import get_openai_client
 
 # 加载环境变量
 load_dotenv()
 
+# 解析说明的固定提示词：针法列表和 JSON 结构每次调用都相同，放在最前面以便命中前缀缓存
+SECTION_PROMPT = f"""你是一个专业的编织图解解析器，请严格按照要求输出JSON格式的解析结果。
+
+请解析用户给出的编织图解部分，并以JSON格式输出结果。要求如下：
+
+1. 前端针法符号配置如下（stitch_type字段必须严格使用下列内容，不要有多余空格、不要用变体、不要用同义词）：
+{STITCH_TYPES}
+
+2. JSON 结构如下：
+   {{
+     "section_title": "部分标题",
+     "rows": [
+       {{
+         "type": "row",
+         "row_number": 行号,
+         "stitches_per_row": 针数,
+         "instruction": "该行的原始编织说明文本",
+         "stitch_repeat": [
+           {{
+             "repeat": 重复次数,
+             "stitches": [
+               {{"stitch_type": "针法1"}},
+               {{"stitch_type": "针法2"}},
+               ...
+             ]
+           }}
+         ]
+       }},
+       {{
+         "type": "meta",
+         "instruction": "非针法类说明"
+       }}
+     ]
+   }}
+
+3. 对于每一行针法，需要：
+   - 准确计算针数
+   - 正确识别重复模式
+   - 保持原始说明文本
+   - 所有stitch_type必须严格从上述列表中选取
+
+4. 对于非针法类说明，使用meta类型"""
+
+def parse_section_response(response) -> Dict[str, Any]:
+    """从返回内容中取出 JSON 并校验，无效时抛出 ValueError（对冲调用会等待其他请求）"""
+    content = response.choices[0].message.content.strip()
+    json_start = content.find('{')
+    json_end = content.rfind('}') + 1
+    if json_start < 0 or json_end <= json_start:
+        raise ValueError("无法在响应中找到有效的JSON")
+    result = json.loads(content[json_start:json_end])
+    if not isinstance(result.get('rows'), list):
+        raise ValueError("返回的JSON缺少 rows 列表")
+    check_section_rows(result['rows'])
+    return result
+
+def check_section_rows(rows: List[Any]):
+    """格式校验：每行的类型、行号和针法名称，不通过时换更强的模型"""
+    for row in rows:
+        if not isinstance(row, dict) or row.get('type') not in ('row', 'meta'):
+            raise ValueError(f"无效的行: {row}")
+        if row['type'] != 'row':
+            continue
+        if not isinstance(row.get('row_number'), int):
+            raise ValueError(f"行号无效: {row}")
+        for repeat in row.get('stitch_repeat') or []:
+            for stitch in repeat.get('stitches', []):
+                if stitch.get('stitch_type') not in STITCH_TYPES:
+                    raise ValueError(f"第{row['row_number']}行的针法不在列表中: {stitch.get('stitch_type')}")
+
+def merge_rows(local_rows: List[Dict[str, Any]], llm_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """本地已算出的行优先，LLM 只补充缺失的行号，按行号插回原文顺序中"""
+    known = {row['row_number'] for row in local_rows if row['type'] == 'row'}
+    pending = sorted(
+        (row for row in llm_rows
+         if row.get('type') == 'row' and isinstance(row.get('row_number'), int) and row['row_number'] not in known),
+        key=lambda row: row['row_number']
+    )
+    rows = []
+    for row in local_rows:
+        while pending and row['type'] == 'row' and pending[0]['row_number'] < row['row_number']:
+            rows.append(pending.pop(0))
+        rows.append(row)
+    rows.extend(pending)
+    return rows
+
 class KnittingData:
     """编织数据管理类"""
     def __init__(self, title: str = "", pattern_text: str = "", pattern_json: Dict = None):
@@ -39,14 +134,29 @@ class KnittingData:
                 pattern_json=data.get('pattern_json', {})
             )
 
+    def save_to_binary(self, filename: str):
+        """保存为紧凑的二进制格式（见 knitting_store），体积更小、读取更快"""
+        save_knitting_data(filename, self.title, self.pattern_text, self.pattern_json)
+
+    @classmethod
+    def load_from_binary(cls, filename: str) -> 'KnittingData':
+        """从二进制文件加载；只需要个别部分时可直接用 KnittingStore 按需读取"""
+        title, pattern_text, pattern_json = load_knitting_data(filename)
+        return cls(title=title, pattern_text=pattern_text, pattern_json=pattern_json)
+
 class KnittingPatternParser:
     def __init__(self):
         """初始化解析器，使用环境变量中的API密钥"""
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
             raise ValueError("未找到 OPENAI_API_KEY 环境变量")
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = get_openai_client(api_key)
         self.size_extractor = SizeExtractor()
+        # 每次调用有总时限，慢请求会触发对冲请求
+        self.llm = HedgedCaller('parse_section', stats_file=LATENCY_STATS_FILE)
+        # 按部分难度选择模型，校验不通过时升级
+        self.router = ModelRouter('parse_section', caller=self.llm)
+        self.prompt = PromptBuilder('parse_section', SECTION_PROMPT)
 
     def split_pattern_by_sections(self, pattern_text: str) -> List[Dict[str, str]]:
         """按#标记切分编织内容"""
@@ -74,135 +184,210 @@ class KnittingPatternParser:
         return sections
 
     def calculate_row_ranges(self, sections: List[Dict[str, str]]) -> List[Dict[str, Any]]:
-        """计算每个部分的行数范围"""
-        current_row = 1
+        """
+        计算每个部分的行数范围
+        行号偏移保存在 self.row_offsets（树状数组）里，之后修改某个部分的行数时
+        可以直接用它求出受影响的范围
+        """
+        self.row_offsets = RowOffsets([section["row_count"] for section in sections])
         processed_sections = []
         
-        for section in sections:
-            row_count = section["row_count"]
-            if row_count > 0:
-                section_data = {
-                    "title": section["title"],
-                    "content": section["content"],
-                    "start_row": current_row,
-                    "end_row": current_row + row_count - 1,
-                    "row_count": row_count
-                }
-                current_row += row_count
-            else:
-                section_data = {
-                    "title": section["title"],
-                    "content": section["content"],
-                    "start_row": current_row,
-                    "end_row": current_row,
-                    "row_count": 0
-                }
-            processed_sections.append(section_data)
+        for i, section in enumerate(sections):
+            start_row, end_row = self.row_offsets.row_range(i)
+            processed_sections.append({
+                "title": section["title"],
+                "content": section["content"],
+                "start_row": start_row,
+                "end_row": end_row,
+                "row_count": section["row_count"]
+            })
             
         return processed_sections
 
-    def parse_section(self, section: Dict[str, str], next_section: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-        """解析单个部分的编织内容"""
-        stitch_types = [
-            '上针', '下针', '空针', '空加针', '挂针', '加针', '并针', '反针', '绞针', '长针', '引线',
-            '左上2并1', '左下二并一', '右上二并一', '右下二并一', 'M1L', 'M1R', 'M1LP', 'M1RP'
-        ]
-        
-        # 准备提示文本
-        prompt = f"""
-        请解析以下编织图解部分，并以JSON格式输出结果。要求如下：
+    def parse_section(self, section: Dict[str, str], next_section: Optional[Dict[str, str]] = None,
+                      simulator: Optional[StitchSimulator] = None) -> Dict[str, Any]:
+        """
+        解析单个部分的编织内容
+        针数先由本地模拟器逐行计算，只有模拟器无法分词的行才交给 LLM（按难度选择模型）；
+        解析多个部分时传入同一个 simulator，针数会从上一部分延续
+        """
+        simulator = simulator or StitchSimulator()
+        start_stitches = simulator.stitches
+        local = simulator.parse_section(section['content'], section['title'])
+        if not local['unresolved']:
+            return {"section_title": section['title'], "rows": local['rows']}
 
-        1. 前端针法符号配置如下（stitch_type字段必须严格使用下列内容，不要有多余空格、不要用变体、不要用同义词）：
-        {stitch_types}
+        print(f"{section['title']}: {len(local['unresolved'])} 行无法本地计算，交给 LLM")
+        unresolved_section = {"title": section['title'], "content": '\n'.join(local['unresolved'])}
+        llm_result = self.parse_section_with_llm(unresolved_section, next_section, start_stitches)
 
-        2. JSON 结构如下：
-           {{
-             "section_title": "部分标题",
-             "rows": [
-               {{
-                 "type": "row",
-                 "row_number": 行号,
-                 "stitches_per_row": 针数,
-                 "instruction": "该行的原始编织说明文本",
-                 "stitch_repeat": [
-                   {{
-                     "repeat": 重复次数,
-                     "stitches": [
-                       {{"stitch_type": "针法1"}},
-                       {{"stitch_type": "针法2"}},
-                       ...
-                     ]
-                   }}
-                 ]
-               }},
-               {{
-                 "type": "meta",
-                 "instruction": "非针法类说明"
-               }}
-             ]
-           }}
+        result = {"section_title": section['title'], "rows": merge_rows(local['rows'], llm_result.get('rows', []))}
+        if 'error' in llm_result:
+            # 不要把 LLM 失败当成“没有更多的行”静默吞掉
+            result['error'] = llm_result['error']
+        return result
 
-        3. 对于每一行针法，需要：
-           - 准确计算针数
-           - 正确识别重复模式
-           - 保持原始说明文本
-           - 所有stitch_type必须严格从上述列表中选取
+    def parse_section_stream(self, section: Dict[str, str], next_section: Optional[Dict[str, str]] = None,
+                             simulator: Optional[StitchSimulator] = None) -> Iterator[Dict[str, Any]]:
+        """
+        parse_section 的流式版本，产出事件：
+        {"event": "row", "source": "local"|"llm", "row": ...}  本地算出的行立即产出，LLM 的行在流式输出中一闭合就产出
+        {"event": "reset"}             流式请求失败、改用普通请求时产出，之前产出的 LLM 行作废
+        {"event": "done", "result": ...} 与 parse_section 返回值相同的完整结果（按行号排好序）
+        """
+        simulator = simulator or StitchSimulator()
+        start_stitches = simulator.stitches
+        local = simulator.parse_section(section['content'], section['title'])
+        for row in local['rows']:
+            yield {"event": "row", "source": "local", "row": row}
+        if not local['unresolved']:
+            yield {"event": "done", "result": {"section_title": section['title'], "rows": local['rows']}}
+            return
 
-        4. 对于非针法类说明，使用meta类型
+        print(f"{section['title']}: {len(local['unresolved'])} 行无法本地计算，交给 LLM（流式）")
+        unresolved_section = {"title": section['title'], "content": '\n'.join(local['unresolved'])}
+        known = {row['row_number'] for row in local['rows'] if row['type'] == 'row'}
+        for event in self.stream_section_with_llm(unresolved_section, next_section, start_stitches):
+            if event['event'] == 'row':
+                row = event['row']
+                # 与 merge_rows 一致：只补充本地没有的行
+                if row.get('type') == 'row' and row['row_number'] not in known:
+                    yield event
+            elif event['event'] == 'reset':
+                yield event
+            else:
+                llm_result = event['result']
+                result = {"section_title": section['title'], "rows": merge_rows(local['rows'], llm_result.get('rows', []))}
+                if 'error' in llm_result:
+                    result['error'] = llm_result['error']
+                yield {"event": "done", "result": result}
 
-        当前部分内容：
-        {section['content']}
+    def build_section_messages(self, section: Dict[str, str], next_section: Optional[Dict[str, str]] = None,
+                               start_stitches: Optional[int] = None) -> List[Dict[str, str]]:
+        """解析说明的提示词：规则是固定前缀，下一部分只附第一行用于参考针数"""
+        content = f"本部分起始针数：{start_stitches}\n\n" if start_stitches else ''
+        content += f"当前部分内容：\n{section['content']}"
+        context = first_line(next_section['content']) if next_section else ''
+        return self.prompt.messages(
+            content,
+            context=f"下一部分的第一行（用于参考针数）：{context}" if context else '',
+            full_context=next_section['content'] if next_section else ''
+        )
 
-        {'下一部分内容（用于参考针数）：' + next_section['content'] if next_section else ''}
-        """
+    def parse_section_with_llm(self, section: Dict[str, str], next_section: Optional[Dict[str, str]] = None,
+                               start_stitches: Optional[int] = None) -> Dict[str, Any]:
+        """用 LLM 解析本地模拟器无法处理的说明，简单的部分先用快的模型，校验不通过再升级"""
+        def request(model, timeout):
+            return self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.1,
+                timeout=timeout
+            )
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "你是一个专业的编织图解解析器，请严格按照要求输出JSON格式的解析结果。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1
-            )
-            
-            content = response.choices[0].message.content.strip()
-            json_start = content.find('{')
-            json_end = content.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_str = content[json_start:json_end]
-                try:
-                    result = json.loads(json_str)
-                    result['section_title'] = section['title']
-                    return result
-                except json.JSONDecodeError as e:
-                    print(f"JSON解析错误: {str(e)}")
-                    return {
-                        "section_title": section['title'],
-                        "rows": []
-                    }
-            else:
-                print("无法在响应中找到有效的JSON")
-                return {
-                    "section_title": section['title'],
-                    "rows": []
-                }
-                
+            messages = self.build_section_messages(section, next_section, start_stitches)
+            # 先返回且包含有效 JSON 的结果胜出
+            result = self.router.call(section['content'], request, parse_section_response)
+            result['section_title'] = section['title']
+            return result
         except Exception as e:
             print(f"解析错误: {str(e)}")
             return {
                 "section_title": section['title'],
-                "rows": []
+                "rows": [],
+                "error": str(e)
             }
+        finally:
+            self.llm.save_stats()
+            print_prompt_stats('parse_section')
 
-    def parse_pattern(self, pattern_text: str) -> Dict[str, Any]:
-        """解析编织图解文本，返回JSON格式的解析结果"""
-        # 首先提取第二个尺码的数据
-        processed_text = self.size_extractor.process_knitting_pattern(pattern_text)
-        
-        # 按部分切分内容
-        sections = self.split_pattern_by_sections(processed_text)
+    def stream_section_with_llm(self, section: Dict[str, str], next_section: Optional[Dict[str, str]] = None,
+                                start_stitches: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        流式请求 LLM，每个行对象一闭合（并通过校验）就产出 {"event": "row"}，最后产出 {"event": "done"}
+        使用难度对应的模型、不做对冲；流式请求出错或完整结果没通过校验时产出 {"event": "reset"}，
+        再退回 parse_section_with_llm（带对冲和升级）
+        """
+        model = self.router.tiers[self.router.start_tier(difficulty_score(section['content'])['score'])]
+        parser = RowStreamParser()
+        emitted = 0
+        begin = time.monotonic()
+        try:
+            messages = self.build_section_messages(section, next_section, start_stitches)
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.1,
+                timeout=self.llm.deadline,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            # 校验失败、超时或前端断开（GeneratorExit）时都要关闭流，归还连接和并发名额
+            try:
+                for chunk in stream:
+                    if getattr(chunk, 'usage', None):
+                        self.router.record_usage(model, chunk)
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    if time.monotonic() - begin > self.llm.deadline:
+                        raise DeadlineExceeded(f"流式解析超过 {self.llm.deadline:.0f} 秒")
+                    for row in parser.feed(chunk.choices[0].delta.content):
+                        check_section_rows([row])
+                        emitted += 1
+                        yield {"event": "row", "source": "llm", "row": row}
+            finally:
+                stream.close()
+            result = parser.result()
+            if not isinstance(result.get('rows'), list):
+                raise ValueError("返回的JSON缺少 rows 列表")
+            result['section_title'] = section['title']
+            self.router.record_call(model, time.monotonic() - begin)
+            print_prompt_stats('parse_section')
+        except Exception as e:
+            self.router.record_call(model, time.monotonic() - begin, failed=True)
+            print(f"流式解析出错，改用普通请求: {e}")
+            if emitted:
+                yield {"event": "reset"}
+            result = self.parse_section_with_llm(section, next_section, start_stitches)
+            for row in result.get('rows', []):
+                yield {"event": "row", "source": "llm", "row": row}
+        yield {"event": "done", "result": result}
+
+    def process_sections(self, pattern_text: str, manifest_file: str) -> List[Dict[str, str]]:
+        """
+        按部分提取尺码，未修改的部分（内容哈希相同）直接复用 manifest 里上一次的结果
+        """
+        cache = SectionCache(manifest_file, 'parse_pattern')
+        sections = []
+        for section in self.split_pattern_by_sections(pattern_text):
+            processed = cache.get(section)
+            if processed is None:
+                errors = self.size_extractor.errors
+                content = self.size_extractor.process_knitting_pattern(section['content'])
+                processed = self.split_pattern_by_sections(f"#{section['title']}\n{content}")[0]
+                # 有行提取失败时不写入缓存，下次重新处理
+                if self.size_extractor.errors == errors:
+                    cache.put(section, processed)
+            sections.append(processed)
+        cache.save()
+        return sections
+
+    def parse_pattern(self, pattern_text: str, manifest_file: Optional[str] = None) -> Dict[str, Any]:
+        """
+        解析编织图解文本，返回JSON格式的解析结果
+        传入 manifest_file 时只重新处理修改过的部分，行号范围仍然整体重新计算
+        """
+        self.size_extractor.router.reset()
+        reset_prompt_stats('size_extractor')
+        if manifest_file:
+            sections = self.process_sections(pattern_text, manifest_file)
+        else:
+            # 首先提取第二个尺码的数据
+            processed_text = self.size_extractor.process_knitting_pattern(pattern_text)
+            
+            # 按部分切分内容
+            sections = self.split_pattern_by_sections(processed_text)
         
         # 计算每个部分的行数范围
         processed_sections = self.calculate_row_ranges(sections)
@@ -212,21 +397,24 @@ class KnittingPatternParser:
             "sections": processed_sections,
             "total_rows": sum(section.get('row_count', 0) for section in processed_sections)
         }
+        self.size_extractor.router.print_report()
+        print_prompt_stats('size_extractor')
         
         return result
 
     def create_knitting_data(self, title: str, pattern_text: str) -> KnittingData:
         """创建编织数据对象"""
-        pattern_json = self.parse_pattern(pattern_text)
+        output_dir = os.path.join('data', 'output')
+        pattern_json = self.parse_pattern(pattern_text, os.path.join(output_dir, 'parse_manifest.json'))
         knitting_data = KnittingData(title, pattern_text, pattern_json)
         
         # 确保输出目录存在
-        output_dir = os.path.join('data', 'output')
         os.makedirs(output_dir, exist_ok=True)
         
         # 保存到指定目录
         output_file = os.path.join(output_dir, 'knitting_data.json')
         knitting_data.save_to_file(output_file)
+        knitting_data.save_to_binary(os.path.join(output_dir, 'knitting_data.knit'))
         
         return knitting_data
 
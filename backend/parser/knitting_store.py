@@ -0,0 +1,313 @@
+"""
+KnittingData 的紧凑二进制格式（小端）：
+
+    文件头     MAGIC, 版本, 各区块的数量和偏移
+    字符串表   所有字符串去重后存一份，u32 偏移数组 + UTF-8 数据
+    部分索引   每个部分一条定长记录：起止行号、标题、其余字段、行区间
+    行表       按列存放：flags / 类型 / 行号 / 针数 / 说明 / 针法重复 / 其余字段
+
+说明文本、针法类型、stitch_repeat 这类大量重复的内容都只是字符串表里的一个编号。
+读取时用 mmap 打开，只解析文件头和部分索引，字符串和行在访问时才解码，
+所以只看一个部分的说明时不需要读整份图解。
+"""
+import os
+import json
+import mmap
+import struct
+from typing import Dict, List, Any, Optional, Tuple
+
+MAGIC = b'KNIT'
+VERSION = 1
+# magic, 版本, 字符串数, 字符串表偏移, 部分数, 部分索引偏移, 行数, 行表偏移,
+# 标题, 图解原文, pattern_json 其余字段, 顶层 pattern 行的起点和行数（无则为 NONE_ID）
+HEADER = struct.Struct('<4sHxxIIIIIIIIIII')
+# 起始行, 结束行, 标题, 部分的其余字段, 行表起点, 行数
+SECTION = struct.Struct('<iiIIII')
+NONE_ID = 0xFFFFFFFF
+NONE_INT = -2 ** 31
+
+# 行的 flags：对应的列是否有值
+HAS_TYPE = 1
+HAS_ROW_NUMBER = 2
+HAS_STITCHES = 4
+HAS_INSTRUCTION = 8
+HAS_REPEAT = 16
+HAS_EXTRA = 32
+
+# 行表各列的 struct 格式码，顺序即文件中的顺序
+ROW_COLUMNS = [
+    ('flags', 'B'), ('type', 'I'), ('row_number', 'i'), ('stitches_per_row', 'i'),
+    ('instruction', 'I'), ('stitch_repeat', 'I'), ('extra', 'I')
+]
+
+
+def _dump_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+class StringTable:
+    """写入时的字符串驻留表"""
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def intern(self, text: Optional[str]) -> int:
+        if text is None:
+            return NONE_ID
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+
+    def to_bytes(self) -> bytes:
+        blobs = [text.encode('utf-8') for text in self.strings]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        return struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(blobs)
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and NONE_INT < value < 2 ** 31
+
+
+def _encode_row(row: Dict[str, Any], strings: StringTable) -> Tuple:
+    """把一行拆成各列的值，放不进列的字段合并成一个 JSON 字符串"""
+    extra = dict(row)
+    flags = 0
+    values = {'type': NONE_ID, 'row_number': 0, 'stitches_per_row': 0,
+              'instruction': NONE_ID, 'stitch_repeat': NONE_ID, 'extra': NONE_ID}
+    if isinstance(extra.get('type'), str):
+        flags |= HAS_TYPE
+        values['type'] = strings.intern(extra.pop('type'))
+    if _is_int(extra.get('row_number')):
+        flags |= HAS_ROW_NUMBER
+        values['row_number'] = extra.pop('row_number')
+    if _is_int(extra.get('stitches_per_row')):
+        flags |= HAS_STITCHES
+        values['stitches_per_row'] = extra.pop('stitches_per_row')
+    if isinstance(extra.get('instruction'), str):
+        flags |= HAS_INSTRUCTION
+        values['instruction'] = strings.intern(extra.pop('instruction'))
+    if isinstance(extra.get('stitch_repeat'), list):
+        flags |= HAS_REPEAT
+        values['stitch_repeat'] = strings.intern(_dump_json(extra.pop('stitch_repeat')))
+    if extra:
+        flags |= HAS_EXTRA
+        values['extra'] = strings.intern(_dump_json(extra))
+    return (flags,) + tuple(values[name] for name, _ in ROW_COLUMNS[1:])
+
+
+def dump_knitting_data(title: str, pattern_text: str, pattern_json: Dict[str, Any]) -> bytes:
+    """把 KnittingData 的三个字段编码成二进制"""
+    strings = StringTable()
+    rows: List[Tuple] = []
+    section_records = []
+
+    # 非空的 sections / pattern 列表拆进部分索引和行表，其余字段整体存成 JSON
+    sections = pattern_json.get('sections')
+    sections = sections if isinstance(sections, list) and sections else []
+    pattern = pattern_json.get('pattern')
+    pattern = pattern if isinstance(pattern, list) and pattern else None
+    for section in sections:
+        section = dict(section)
+        section_rows = section.pop('rows', None) if isinstance(section.get('rows'), list) else None
+        title_key = 'section_title' if 'section_title' in section else 'title'
+        start_row = section.get('start_row')
+        end_row = section.get('end_row')
+        row_start = len(rows)
+        if section_rows is not None:
+            rows.extend(_encode_row(row, strings) for row in section_rows)
+        section_records.append(SECTION.pack(
+            start_row if _is_int(start_row) else NONE_INT,
+            end_row if _is_int(end_row) else NONE_INT,
+            strings.intern(section.get(title_key) if isinstance(section.get(title_key), str) else None),
+            strings.intern(_dump_json(section)),
+            row_start,
+            len(section_rows) if section_rows is not None else NONE_ID
+        ))
+
+    pattern_start, pattern_count = NONE_ID, NONE_ID
+    if pattern is not None:
+        pattern_start, pattern_count = len(rows), len(pattern)
+        rows.extend(_encode_row(row, strings) for row in pattern)
+
+    rest = {key: value for key, value in pattern_json.items()
+            if not (key == 'sections' and sections) and not (key == 'pattern' and pattern is not None)}
+    title_id = strings.intern(title)
+    text_id = strings.intern(pattern_text)
+    rest_id = strings.intern(_dump_json(rest))
+
+    # 行表按列写出
+    columns = b''.join(
+        struct.pack(f'<{len(rows)}{code}', *(row[i] for row in rows))
+        for i, (_, code) in enumerate(ROW_COLUMNS)
+    )
+    string_bytes = strings.to_bytes()
+    section_bytes = b''.join(section_records)
+
+    strings_offset = HEADER.size
+    sections_offset = strings_offset + len(string_bytes)
+    rows_offset = sections_offset + len(section_bytes)
+    header = HEADER.pack(
+        MAGIC, VERSION, len(strings.strings), strings_offset, len(section_records), sections_offset,
+        len(rows), rows_offset, title_id, text_id, rest_id, pattern_start, pattern_count
+    )
+    return header + string_bytes + section_bytes + columns
+
+
+def _write_atomic(filename: str, data: bytes):
+    """先写临时文件再替换，避免读者 mmap 到写了一半的文件"""
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    temp_file = filename + '.tmp'
+    with open(temp_file, 'wb') as f:
+        f.write(data)
+    os.replace(temp_file, filename)
+
+
+def save_knitting_data(filename: str, title: str, pattern_text: str, pattern_json: Dict[str, Any]):
+    _write_atomic(filename, dump_knitting_data(title, pattern_text, pattern_json))
+
+
+class KnittingStore:
+    """
+    以 mmap 方式打开的二进制图解，按需解码：
+        with KnittingStore(path) as store:
+            store.section(3)          # 只解码第 3 个部分及其行
+    """
+    def __init__(self, filename: str = None, data: bytes = None):
+        if data is not None:
+            self._file = None
+            self.buffer = data
+        else:
+            self._file = open(filename, 'rb')
+            self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.string_count, strings_offset, self.section_count, self.sections_offset,
+         self.row_count, rows_offset, self.title_id, self.text_id, self.rest_id,
+         self.pattern_start, self.pattern_count) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("不是编织数据二进制文件")
+        if version != VERSION:
+            raise ValueError(f"不支持的文件版本: {version}")
+        self.strings_offset = strings_offset
+        self.blob_offset = strings_offset + 4 * (self.string_count + 1)
+        # 各列的起始偏移
+        self.column_offsets = {}
+        offset = rows_offset
+        for name, code in ROW_COLUMNS:
+            self.column_offsets[name] = (offset, code)
+            offset += struct.calcsize(f'<{code}') * self.row_count
+        self._string_cache: Dict[int, str] = {}
+        self._repeat_cache: Dict[int, List[Dict[str, Any]]] = {}
+
+    def close(self):
+        if self._file:
+            self.buffer.close()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'KnittingStore':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == NONE_ID:
+            return None
+        text = self._string_cache.get(string_id)
+        if text is None:
+            start, end = struct.unpack_from('<2I', self.buffer, self.strings_offset + 4 * string_id)
+            text = bytes(self.buffer[self.blob_offset + start:self.blob_offset + end]).decode('utf-8')
+            self._string_cache[string_id] = text
+        return text
+
+    def repeat(self, string_id: int) -> List[Dict[str, Any]]:
+        """
+        解析 stitch_repeat，相同内容只解析一次：
+        读出的行之间共享同一个 stitch_repeat 对象，需要修改时先复制
+        """
+        value = self._repeat_cache.get(string_id)
+        if value is None:
+            value = json.loads(self.string(string_id))
+            self._repeat_cache[string_id] = value
+        return value
+
+    @property
+    def title(self) -> str:
+        return self.string(self.title_id)
+
+    @property
+    def pattern_text(self) -> str:
+        return self.string(self.text_id)
+
+    def _column(self, name: str, start: int, count: int) -> Tuple:
+        offset, code = self.column_offsets[name]
+        size = struct.calcsize(f'<{code}')
+        return struct.unpack_from(f'<{count}{code}', self.buffer, offset + size * start)
+
+    def rows(self, start: int, count: int) -> List[Dict[str, Any]]:
+        """解码行表中 [start, start + count) 的行"""
+        columns = [self._column(name, start, count) for name, _ in ROW_COLUMNS]
+        rows = []
+        string = self.string
+        for flags, type_id, row_number, stitches, instruction_id, repeat_id, extra_id in zip(*columns):
+            row = {}
+            if flags & HAS_TYPE:
+                row['type'] = string(type_id)
+            if flags & HAS_ROW_NUMBER:
+                row['row_number'] = row_number
+            if flags & HAS_STITCHES:
+                row['stitches_per_row'] = stitches
+            if flags & HAS_INSTRUCTION:
+                row['instruction'] = string(instruction_id)
+            if flags & HAS_REPEAT:
+                row['stitch_repeat'] = self.repeat(repeat_id)
+            if flags & HAS_EXTRA:
+                row.update(json.loads(string(extra_id)))
+            rows.append(row)
+        return rows
+
+    def section_info(self, index: int) -> Tuple:
+        """部分索引中的一条记录：(起始行, 结束行, 标题, 其余字段编号, 行表起点, 行数)"""
+        if not 0 <= index < self.section_count:
+            raise IndexError(index)
+        start_row, end_row, title_id, meta_id, row_start, row_count = SECTION.unpack_from(
+            self.buffer, self.sections_offset + SECTION.size * index)
+        return (None if start_row == NONE_INT else start_row,
+                None if end_row == NONE_INT else end_row,
+                self.string(title_id), meta_id, row_start, row_count)
+
+    def section_titles(self) -> List[str]:
+        return [self.section_info(i)[2] for i in range(self.section_count)]
+
+    def find_section(self, title: str) -> Optional[int]:
+        for i in range(self.section_count):
+            if self.section_info(i)[2] == title:
+                return i
+        return None
+
+    def section(self, index: int) -> Dict[str, Any]:
+        """完整解码一个部分（包括它的行）"""
+        _, _, _, meta_id, row_start, row_count = self.section_info(index)
+        section = json.loads(self.string(meta_id))
+        if row_count != NONE_ID:
+            section['rows'] = self.rows(row_start, row_count)
+        return section
+
+    def pattern_json(self) -> Dict[str, Any]:
+        """完整解码 pattern_json"""
+        pattern_json = json.loads(self.string(self.rest_id))
+        if self.section_count:
+            pattern_json['sections'] = [self.section(i) for i in range(self.section_count)]
+        if self.pattern_count != NONE_ID:
+            pattern_json['pattern'] = self.rows(self.pattern_start, self.pattern_count)
+        return pattern_json
+
+
+def load_knitting_data(filename: str) -> Tuple[str, str, Dict[str, Any]]:
+    """整体读取，返回 (title, pattern_text, pattern_json)"""
+    with KnittingStore(filename) as store:
+        return store.title, store.pattern_text, store.pattern_json()
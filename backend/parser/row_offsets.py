@@ -0,0 +1,56 @@
+from typing import List, Tuple
+
+
+class RowOffsets:
+    """
+    各部分行数的树状数组（Fenwick tree）
+    第 i 个部分的起始行 = first_row + 前 i 个部分的行数之和，
+    修改一个部分的行数和查询任意部分的起止行都是 O(log n)，不需要从第一部分重新累加
+    """
+    def __init__(self, row_counts: List[int], first_row: int = 1):
+        self.first_row = first_row
+        self.counts = list(row_counts)
+        # tree[i] 保存 (i - lowbit(i), i] 区间的和，下标从 1 开始；O(n) 建树
+        self.tree = [0] + self.counts
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def prefix_sum(self, index: int) -> int:
+        """前 index 个部分（下标 0 到 index-1）的行数之和"""
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def row_count(self, index: int) -> int:
+        return self.counts[index]
+
+    def set_row_count(self, index: int, row_count: int) -> int:
+        """修改一个部分的行数，返回变化量"""
+        delta = row_count - self.counts[index]
+        if delta:
+            self.counts[index] = row_count
+            i = index + 1
+            while i < len(self.tree):
+                self.tree[i] += delta
+                i += i & -i
+        return delta
+
+    def start_row(self, index: int) -> int:
+        return self.first_row + self.prefix_sum(index)
+
+    def row_range(self, index: int) -> Tuple[int, int]:
+        """(start_row, end_row)，没有行的部分起止行相同（与 calculate_row_ranges 的约定一致）"""
+        start = self.start_row(index)
+        count = self.counts[index]
+        return start, start + count - 1 if count > 0 else start
+
+    @property
+    def total_rows(self) -> int:
+        return self.prefix_sum(len(self.counts))
@@ -1,100 +1,18 @@
 import re
 from typing import Dict, List, Tuple
-import openai
 import os
 from dotenv import load_dotenv
+from utils.model_router import ModelRouter
+from utils.prompt_builder import PromptBuilder, count_tokens
+from utils.llm_clients import get_openai_client
 
-class SizeExtractor:
-    def __init__(self):
-        # 加载环境变量
-        load_dotenv()
-        # 初始化 OpenAI 客户端
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    
-    def normalize_brackets(self, text: str) -> str:
-        """
-        统一括号格式，将中文括号转换为英文括号
-        """
-        # 将中文括号转换为英文括号
-        text = text.replace('（', '(').replace('）', ')')
-        return text
-
-    def is_size_sequence(self, text: str) -> bool:
-        """
-        判断括号中的内容是否为尺码序列
-        """
-        # 移除括号（包括中文括号）
-        content = text.strip('()（）')
-        # 分割内容
-        parts = [p.strip() for p in content.split('-')]
-        
-        # 检查每个部分是否符合尺码格式
-        for part in parts:
-            # 如果是空或x，跳过
-            if not part or part.lower() == 'x':
-                continue
-            # 检查是否为数字或字母尺码
-            if not (part.isdigit() or part.upper() in ['S', 'M', 'L', 'XL', '2XL', '3XL', '4XL']):
-                return False
-        return True
+# 预处理时只需要关心括号和换行
+_BRACKET_OR_NEWLINE = re.compile(r'[()\n]')
+# 尺码序列中的数字，可以带小数，例如 (42.5 - 45 - 47.5)，OCR 可能在小数点后多出空格
+_SIZE_NUMBER = re.compile(r'\d+(?:[.,]\s*\d+)?')
 
-    def preprocess_text(self, text: str) -> str:
-        """
-        预处理文本，合并跨行的尺码数据
-        """
-        # 先统一括号格式
-        text = self.normalize_brackets(text)
-        
-        lines = text.split('\n')
-        processed_lines = []
-        current_line = ""
-        bracket_stack = []  # 用于跟踪括号嵌套
-        
-        for line in lines:
-            # 处理当前行的每个字符
-            for char in line:
-                if char in ['(', '（']:
-                    bracket_stack.append(len(current_line))  # 记录括号开始位置
-                    current_line += '('  # 统一使用英文括号
-                elif char in [')', '）']:
-                    if bracket_stack:  # 如果有未闭合的括号
-                        start_pos = bracket_stack.pop()
-                        # 提取括号内容
-                        bracket_content = current_line[start_pos:]
-                        if self.is_size_sequence(bracket_content):
-                            # 如果是尺码序列，保持原样
-                            current_line += ')'
-                        else:
-                            # 如果不是尺码序列，保持原样
-                            current_line += ')'
-                    else:
-                        # 没有对应的开始括号，保持原样
-                        current_line += ')'
-                else:
-                    current_line += char
-            
-            # 如果当前行结束且没有未闭合的括号，添加到处理后的行
-            if not bracket_stack:
-                processed_lines.append(current_line)
-                current_line = ""
-            else:
-                # 有未闭合的括号，继续处理下一行
-                current_line += ' '  # 添加空格连接行
-        
-        # 处理最后一行
-        if current_line:
-            processed_lines.append(current_line)
-        
-        return '\n'.join(processed_lines)
-    
-    def extract_second_size(self, text: str) -> str:
-        """
-        使用 AI 从文本中提取括号中的第一个数字作为第二个尺码，并保留其他文本内容
-        """
-        # 先统一括号格式
-        text = self.normalize_brackets(text)
-        
-        prompt = f"""
+# 尺码提取的规则和示例，单行和批量请求共用
+SIZE_RULES_PROMPT = """
         请处理以下文本，将括号中的第一个数字作为第二个尺码替换到原文本中。
         
         规则：
@@ -142,40 +60,270 @@ class SizeExtractor:
         
         输入：行32 (32 - 34 - 30 - 30 - 30 - 32 - 32)，52 (52 - 56 - 48 - 48 - 48 - 52 - 52)和x (x-x-66-66-66-72-72) (扣眼行)
         输出：行32，52 和x(扣眼行)
+"""
+
+SYSTEM_PROMPT = "你是一个专门用于处理编织图解的助手。你的任务是提取括号中的第一个数字作为第二个尺码，并保留其他所有文本内容不变。不要修改任何技术术语，不要删除任何非尺码相关的括号。注意处理各种格式的尺码序列，包括数字和字母尺码，以及可能跨行的尺码序列。如果括号中的值是x，把x当成一个数字提取。当提取尺码时，不要保留括号，直接使用数字。如果一行中有多个尺码，每个尺码都单独处理，但保持它们的连接关系。"
+
+# 批量模式：每个请求中待处理文本的token预算
+BATCH_TOKEN_BUDGET = 1500
+# 批量模式输出的编号行，如 "3. 第72行"
+_NUMBERED_LINE = re.compile(r'^\s*(\d+)[.、:：]\s?(.*)$')
+
+class SizeExtractor:
+    def __init__(self):
+        # 加载环境变量
+        load_dotenv()
+        # 初始化 OpenAI 客户端
+        self.client = get_openai_client(os.getenv('OPENAI_API_KEY'))
+        # 按难度选择模型：批量请求和单行请求都先用快的模型，校验不通过再升级
+        self.router = ModelRouter('size_extractor')
+        # 系统说明和规则示例是单行、批量请求共用的固定前缀
+        self.prompt = PromptBuilder('size_extractor', SYSTEM_PROMPT + '\n' + SIZE_RULES_PROMPT)
+        # 统计出错的次数（出错的行原样返回），调用方据此不缓存出错的结果
+        # 批量请求出错时会拆开重试，最终都落到 extract_second_size，所以只在这里计数
+        self.errors = 0
+    
+    def normalize_brackets(self, text: str) -> str:
+        """
+        统一括号格式，将中文括号转换为英文括号
+        """
+        # 将中文括号转换为英文括号
+        text = text.replace('（', '(').replace('）', ')')
+        return text
+
+    def is_size_sequence(self, text: str) -> bool:
+        """
+        判断括号中的内容是否为尺码序列
+        """
+        # 移除括号（包括中文括号）
+        content = text.strip('()（）')
+        # 分割内容
+        parts = [p.strip() for p in content.split('-')]
         
-        请处理以下文本：
-        {text}
+        # 检查每个部分是否符合尺码格式
+        for part in parts:
+            # 如果是空或x，跳过
+            if not part or part.lower() == 'x':
+                continue
+            # 检查是否为数字（可带小数）或字母尺码
+            if not (_SIZE_NUMBER.fullmatch(part) or part.upper() in ['S', 'M', 'L', 'XL', '2XL', '3XL', '4XL']):
+                return False
+        return True
+
+    def preprocess_with_spans(self, text: str) -> Tuple[str, List[Tuple[int, int]]]:
+        """
+        预处理文本，合并跨行的尺码数据，同时返回尺码序列括号在结果文本中的位置
+        只扫描括号和换行，整体是线性的：
+        - 括号未闭合时遇到换行，换行替换成空格（即把下一行接上来）
+        - 只对不含嵌套括号的括号判断是否为尺码序列，每个字符最多被检查一次
+        返回 (合并后的文本, [(左括号位置, 右括号之后的位置), ...])
         """
+        # 先统一括号格式
+        text = self.normalize_brackets(text)
         
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "你是一个专门用于处理编织图解的助手。你的任务是提取括号中的第一个数字作为第二个尺码，并保留其他所有文本内容不变。不要修改任何技术术语，不要删除任何非尺码相关的括号。注意处理各种格式的尺码序列，包括数字和字母尺码，以及可能跨行的尺码序列。如果括号中的值是x，把x当成一个数字提取。当提取尺码时，不要保留括号，直接使用数字。如果一行中有多个尺码，每个尺码都单独处理，但保持它们的连接关系。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0
+        pieces = []
+        spans = []
+        stack = []  # 未闭合的左括号：[位置, 是否含有嵌套括号]
+        last = 0
+        for match in _BRACKET_OR_NEWLINE.finditer(text):
+            pos = match.start()
+            char = text[pos]
+            if char == '\n':
+                if stack:
+                    # 有未闭合的括号，用空格连接下一行
+                    pieces.append(text[last:pos])
+                    pieces.append(' ')
+                    last = pos + 1
+            elif char == '(':
+                if stack:
+                    stack[-1][1] = True
+                stack.append([pos, False])
+            elif stack:
+                start, nested = stack.pop()
+                if not nested and self.is_size_sequence(text[start:pos + 1]):
+                    spans.append((start, pos + 1))
+        pieces.append(text[last:])
+        if stack:
+            # 与逐行处理保持一致：文本结束时仍有未闭合括号，末尾带一个连接空格
+            pieces.append(' ')
+        
+        # 合并行时换行和空格都是一个字符，位置不需要调整
+        return ''.join(pieces), sorted(spans)
+
+    def preprocess_text(self, text: str) -> str:
+        """
+        预处理文本，合并跨行的尺码数据
+        """
+        return self.preprocess_with_spans(text)[0]
+    
+    def extract_second_size(self, text: str) -> str:
+        """
+        使用 AI 从文本中提取括号中的第一个数字作为第二个尺码，并保留其他文本内容
+        """
+        # 先统一括号格式
+        text = self.normalize_brackets(text)
+        
+        def request(model, timeout):
+            return self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0,
+                timeout=timeout
             )
-            return response.choices[0].message.content.strip()
+        
+        def parse(response):
+            output = response.choices[0].message.content.strip()
+            # 单行文本的结果没通过校验时换更强的模型；多行文本无法逐行对应，不做校验
+            if '\n' not in text and not self.validate_extraction(text, output):
+                raise ValueError(f"尺码提取结果未通过校验: {output}")
+            return output
+        
+        try:
+            messages = self.prompt.messages(f"请处理以下文本：\n{text}")
+            return self.router.call(text, request, parse)
         except Exception as e:
+            self.errors += 1
             print(f"AI 处理出错: {e}")
             return text
     
-    def process_knitting_pattern(self, pattern_text: str) -> str:
+    def estimate_tokens(self, text: str) -> int:
+        """估计token数，与提示词预算使用同一种计数"""
+        return count_tokens(text)
+
+    def build_batches(self, lines: List[str], token_budget: int = BATCH_TOKEN_BUDGET) -> List[List[int]]:
+        """按token预算把行打包，返回每批的行下标"""
+        batches = []
+        current = []
+        used = 0
+        for i, line in enumerate(lines):
+            cost = self.estimate_tokens(line) + 2  # 编号和换行
+            if current and used + cost > token_budget:
+                batches.append(current)
+                current = []
+                used = 0
+            current.append(i)
+            used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    def validate_extraction(self, source: str, output: str) -> bool:
+        """
+        检查单行的提取结果：
+        1. 不能为空，也不能变成多行
+        2. 不能再含有尺码序列
+        3. 每个尺码序列的第一个值都要出现在结果里
+        4. 非尺码括号要全部保留
+        """
+        if not output or '\n' in output:
+            return False
+        source, spans = self.preprocess_with_spans(source)
+        output = self.normalize_brackets(output)
+        if self.preprocess_with_spans(output)[1]:
+            return False
+        for start, end in spans:
+            first = source[start + 1:end - 1].split('-')[0].strip()
+            if first and first not in output:
+                return False
+        return output.count('(') == source.count('(') - len(spans)
+
+    def request_batch(self, lines: List[str]) -> Dict[int, str]:
+        """一次请求处理多行，返回 {编号: 结果}，编号从1开始"""
+        numbered = '\n'.join(f"{i}. {line}" for i, line in enumerate(lines, 1))
+        def request(model, timeout):
+            return self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0,
+                timeout=timeout
+            )
+        
+        try:
+            messages = self.prompt.messages(
+                '下面每一行以"编号. "开头，请把每一行当作独立的文本处理，\n'
+                '输出同样数量的行，每行保留原来的编号，格式为"编号. 处理结果"：\n'
+                f'{numbered}\n'
+                '只输出编号行，不要输出任何其他内容。'
+            )
+            # 批量请求固定用最快的模型、不升级：校验失败的行会拆开重试，拆到单行时由 extract_second_size 升级
+            content = self.router.call(
+                '', request, lambda response: response.choices[0].message.content.strip(), escalate=False
+            )
+        except Exception as e:
+            print(f"AI 批量处理出错: {e}")
+            return {}
+        
+        results = {}
+        for output_line in content.split('\n'):
+            match = _NUMBERED_LINE.match(output_line)
+            if match:
+                results[int(match.group(1))] = match.group(2).strip()
+        return results
+
+    def extract_sizes_batch(self, lines: List[str], token_budget: int = BATCH_TOKEN_BUDGET) -> List[str]:
+        """
+        批量提取尺码：多行打包进一个请求，规则说明只发送一次
+        校验失败的行对半拆分后重试，拆到单行时走 extract_second_size
+        """
+        results = list(lines)
+        queue = self.build_batches(lines, token_budget)
+        request_count = 0
+        while queue:
+            batch = queue.pop()
+            if len(batch) == 1:
+                results[batch[0]] = self.extract_second_size(lines[batch[0]])
+                request_count += 1
+                continue
+            
+            outputs = self.request_batch([lines[i] for i in batch])
+            request_count += 1
+            failed = []
+            for number, i in enumerate(batch, 1):
+                output = outputs.get(number)
+                if output is not None and self.validate_extraction(lines[i], output):
+                    results[i] = output
+                else:
+                    failed.append(i)
+            if failed:
+                middle = (len(failed) + 1) // 2
+                queue.append(failed[:middle])
+                if failed[middle:]:
+                    queue.append(failed[middle:])
+        print(f"批量提取尺码: {len(lines)} 行，共 {request_count} 次请求")
+        return results
+    
+    def process_knitting_pattern(self, pattern_text: str, batched: bool = True) -> str:
         """
         处理编织图解文本，提取括号中的第一个数字
+        batched 为 True 时多行打包成一个请求，否则每行单独请求
         """
         # 预处理文本，合并跨行的尺码数据
-        processed_text = self.preprocess_text(pattern_text)
+        processed_text, spans = self.preprocess_with_spans(pattern_text)
         
         lines = processed_text.split('\n')
-        processed_lines = []
-        for line in lines:
-            if '(' in line:  # 检查是否包含括号（现在只检查英文括号，因为已经统一了格式）
-                processed_line = self.extract_second_size(line)
-                processed_lines.append(processed_line)
-            else:
-                processed_lines.append(line)
+        size_line_indexes = []
+        span_index = 0
+        offset = 0
+        for i, line in enumerate(lines):
+            line_end = offset + len(line)
+            # 只有含尺码序列的行需要交给AI处理
+            has_size = False
+            while span_index < len(spans) and spans[span_index][0] < line_end:
+                has_size = True
+                span_index += 1
+            if has_size:
+                size_line_indexes.append(i)
+            offset = line_end + 1
+        
+        size_lines = [lines[i] for i in size_line_indexes]
+        if batched:
+            extracted = self.extract_sizes_batch(size_lines)
+        else:
+            extracted = [self.extract_second_size(line) for line in size_lines]
+        
+        processed_lines = list(lines)
+        for i, processed_line in zip(size_line_indexes, extracted):
+            processed_lines[i] = processed_line
         return '\n'.join(processed_lines)
 
 def main():
@@ -0,0 +1,411 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# 前端针法符号配置中的针法（stitch_type 必须从这里选取）
+STITCH_TYPES = [
+    '上针', '下针', '空针', '空加针', '挂针', '加针', '并针', '反针', '绞针', '长针', '引线',
+    '左上2并1', '左下二并一', '右上二并一', '右下二并一', 'M1L', 'M1R', 'M1LP', 'M1RP'
+]
+
+# 针法 -> (消耗针数, 产生针数, 前端 stitch_type)
+STITCH_EFFECTS = {
+    '下针': (1, 1, '下针'),
+    '下': (1, 1, '下针'),
+    '上针': (1, 1, '上针'),
+    '上': (1, 1, '上针'),
+    '空加针': (0, 1, '空加针'),
+    '挂针': (0, 1, '挂针'),
+    '加针': (0, 1, '加针'),
+    'M1LP': (0, 1, 'M1LP'),
+    'M1RP': (0, 1, 'M1RP'),
+    'M1L': (0, 1, 'M1L'),
+    'M1R': (0, 1, 'M1R'),
+    '左上2并1': (2, 1, '左上2并1'),
+    '右上2并1': (2, 1, '右上二并一'),
+    '左下2并1': (2, 1, '左下二并一'),
+    '右下2并1': (2, 1, '右下二并一'),
+    '并针': (2, 1, '并针'),
+}
+_STITCH_NAMES = '|'.join(sorted(STITCH_EFFECTS, key=len, reverse=True))
+
+_SEPARATORS = ',;、'
+_FULL_WIDTH = str.maketrans({'，': ',', '：': ':', '；': ';', '（': '(', '）': ')', '［': '【', '］': '】'})
+
+_COUNTED_STITCH = re.compile(rf'(\d*)({_STITCH_NAMES})')
+_UNTIL_END = re.compile(r'(下针|上针)到(?:底|最后)')
+_UNTIL_LEFT = re.compile(r'(下针|上针)到(?:最后|剩)(\d+)针')
+_BIND_OFF = re.compile(r'收(\d*)针')
+_CHECK_LEFT = re.compile(r'直至剩(\d+)针')
+_STOCKINETTE = re.compile(r'织?平针')
+_GROUP_TIMES = re.compile(r'(?:重复)?(\d+)次')
+_GROUP_AGAIN = re.compile(r'重复【】再(\d+)次')
+_GROUP_UNTIL_LEFT = re.compile(r'到最后(?:(\d+)针)?|到底')
+_REPEAT_ROW = re.compile(r'重复第(\d+)行')
+_REPEAT_ROWS = re.compile(r'重复第(\d+)行?(?:到|和)第(\d+)行再(\d+)次')
+# 说明末尾“一一剩45针”之类的针数提示；“一一”是OCR把破折号识别成的字
+_TRAILER = re.compile(r'(?:一一|——|--)(.*)$')
+_HINT = re.compile(r'剩?(\d+)针')
+_PIECE = re.compile(r'([一-龥和]*?[片带袖身])各?(\d+)针')
+_CAST_ON = re.compile(r'起(\d+)针')
+_ROW_LINE = re.compile(r'^(第?[\d和到\-行第]*\d[^:]*?行[^:]*):(.*)$')
+_PARITY_LINE = re.compile(r'^(奇数行|偶数行):?织?(.+)$')
+
+
+class UnresolvedInstruction(Exception):
+    """无法在本地分词或模拟的针法说明"""
+
+
+def normalize(text: str) -> str:
+    """统一全角符号、去掉空白，并把减针里的中文数字换成阿拉伯数字"""
+    text = re.sub(r'\s+', '', text.translate(_FULL_WIDTH))
+    return re.sub(r'([左右][上下])[2二]并[1一]', r'\g<1>2并1', text)
+
+
+def split_top_level(text: str) -> List[str]:
+    """按顶层的分隔符切分，括号内的分隔符不切"""
+    parts = []
+    depth = 0
+    current = []
+    for char in text:
+        if char in '(【':
+            depth += 1
+        elif char in ')】':
+            depth -= 1
+        if char in _SEPARATORS and depth == 0:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return [part for part in parts if part]
+
+
+def _matching(text: str, start: int) -> int:
+    """返回与 text[start] 处左括号匹配的右括号位置"""
+    pairs = {'(': ')', '【': '】'}
+    opening = text[start]
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == opening:
+            depth += 1
+        elif text[i] == pairs[opening]:
+            depth -= 1
+            if depth == 0:
+                return i
+    raise UnresolvedInstruction(f"括号不完整: {text}")
+
+
+def tokenize(text: str, row_number: Optional[int] = None) -> List[Tuple]:
+    """
+    把（已规范化的）针法说明解析成节点列表：
+    ('stitch', 名称, 次数) ('until_end', 名称) ('until_left', 名称, 剩余针数)
+    ('bind_off', 针数或None) ('check', 剩余针数) ('group', 子节点, 'times'|'until_left', 数值)
+    """
+    nodes = []
+    for part in split_top_level(text):
+        if part[0] in '(【':
+            end = _matching(part, 0)
+            inner, suffix = part[1:end], part[end + 1:]
+            if part[0] == '(' and not suffix:
+                # 例如 (反面)、(扣眼行) 等注释
+                try:
+                    nodes.append(('group', tokenize(inner, row_number), 'times', 1))
+                except UnresolvedInstruction:
+                    pass
+                continue
+            children = tokenize(inner, row_number)
+            if not suffix:
+                nodes.append(('group', children, 'times', 1))
+            elif _GROUP_AGAIN.fullmatch(suffix):
+                nodes.append(('group', children, 'times', int(_GROUP_AGAIN.fullmatch(suffix).group(1)) + 1))
+            elif _GROUP_TIMES.fullmatch(suffix):
+                nodes.append(('group', children, 'times', int(_GROUP_TIMES.fullmatch(suffix).group(1))))
+            elif _GROUP_UNTIL_LEFT.fullmatch(suffix):
+                nodes.append(('group', children, 'until_left', int(_GROUP_UNTIL_LEFT.fullmatch(suffix).group(1) or 0)))
+            else:
+                raise UnresolvedInstruction(part)
+        elif part in ('上针', '下针'):
+            # 单独的“上针”/“下针”表示整行
+            nodes.append(('until_end', part))
+        elif _UNTIL_END.fullmatch(part):
+            nodes.append(('until_end', _UNTIL_END.fullmatch(part).group(1)))
+        elif _UNTIL_LEFT.fullmatch(part):
+            match = _UNTIL_LEFT.fullmatch(part)
+            nodes.append(('until_left', match.group(1), int(match.group(2))))
+        elif _BIND_OFF.fullmatch(part):
+            count = _BIND_OFF.fullmatch(part).group(1)
+            nodes.append(('bind_off', int(count) if count else None))
+        elif _CHECK_LEFT.fullmatch(part):
+            nodes.append(('check', int(_CHECK_LEFT.fullmatch(part).group(1))))
+        elif _STOCKINETTE.fullmatch(part) and row_number is not None:
+            nodes.append(('until_end', '下针' if row_number % 2 == 0 else '上针'))
+        elif _COUNTED_STITCH.fullmatch(part):
+            match = _COUNTED_STITCH.fullmatch(part)
+            nodes.append(('stitch', match.group(2), int(match.group(1) or 1)))
+        else:
+            raise UnresolvedInstruction(part)
+    return nodes
+
+
+class RowState:
+    """模拟一行时的状态：左针上剩余的针数、已织出的针数"""
+    def __init__(self, stitches: Optional[int]):
+        self.remaining = stitches
+        self.produced = 0
+        self.bind_off = 0
+        self.warnings = []
+
+    def work(self, name: str, count: int):
+        consumed, produced, _ = STITCH_EFFECTS[name]
+        if consumed:
+            if self.remaining is None:
+                raise UnresolvedInstruction("起始针数未知")
+            self.remaining -= consumed * count
+            if self.remaining < 0:
+                raise UnresolvedInstruction(f"针数不足: {name} x{count}")
+        self.produced += produced * count
+
+
+def _need_count(state: RowState) -> int:
+    if state.remaining is None:
+        raise UnresolvedInstruction("起始针数未知")
+    return state.remaining
+
+
+def simulate_nodes(nodes: List[Tuple], state: RowState) -> List[Dict[str, Any]]:
+    """按节点模拟一行，返回前端使用的 stitch_repeat 列表"""
+    repeats = []
+    for node in nodes:
+        kind = node[0]
+        if kind == 'stitch':
+            state.work(node[1], node[2])
+            repeats.append({"repeat": node[2], "stitches": [{"stitch_type": STITCH_EFFECTS[node[1]][2]}]})
+        elif kind in ('until_end', 'until_left'):
+            count = _need_count(state) - (node[2] if kind == 'until_left' else 0)
+            if count < 0:
+                raise UnresolvedInstruction(f"针数不足: {node}")
+            state.work(node[1], count)
+            if count:
+                repeats.append({"repeat": count, "stitches": [{"stitch_type": node[1]}]})
+        elif kind == 'bind_off':
+            count = node[1] if node[1] is not None else _need_count(state)
+            if state.remaining is not None:
+                state.remaining -= count
+                if state.remaining < 0:
+                    raise UnresolvedInstruction("收针数超过剩余针数")
+            state.bind_off += count
+        elif kind == 'check':
+            if state.remaining is not None and state.remaining != node[1]:
+                state.warnings.append(f"应剩 {node[1]} 针，模拟剩 {state.remaining} 针")
+        elif kind == 'group':
+            children, mode, value = node[1], node[2], node[3]
+            if mode == 'times':
+                times = value
+            else:
+                # 先模拟一次得到每次重复消耗的针数
+                probe = RowState(_need_count(state))
+                simulate_nodes(children, probe)
+                per_repeat = state.remaining - probe.remaining
+                if per_repeat <= 0:
+                    raise UnresolvedInstruction("重复单元不消耗针数")
+                times = max(0, (state.remaining - value) // per_repeat)
+            stitches = None
+            for _ in range(times):
+                stitches = simulate_nodes(children, state)
+            if times and stitches:
+                repeats.append({
+                    "repeat": times,
+                    "stitches": [s for entry in stitches for s in entry["stitches"] * entry["repeat"]]
+                })
+    return repeats
+
+
+def split_trailer(text: str) -> Tuple[str, Optional[int]]:
+    """拆出说明末尾的针数提示，返回 (说明, 提示针数或None)"""
+    trailer = _TRAILER.search(text)
+    if not trailer:
+        return text, None
+    hint = _HINT.fullmatch(trailer.group(1))
+    return text[:trailer.start()], int(hint.group(1)) if hint else None
+
+
+def simulate_row(instruction: str, stitches: Optional[int], row_number: Optional[int] = None) -> Dict[str, Any]:
+    """
+    模拟一行：返回 stitches_per_row（织完后的针数）、stitch_repeat 和校验警告
+    说明末尾的“一一剩N针”会作为校验，并以图解给出的针数为准
+    """
+    text, expected = split_trailer(normalize(instruction))
+    text = text.rstrip(_SEPARATORS)
+    if not text:
+        raise UnresolvedInstruction(instruction)
+    state = RowState(stitches)
+    repeats = simulate_nodes(tokenize(text, row_number), state)
+    if state.remaining:
+        state.warnings.append(f"行末还剩 {state.remaining} 针未织")
+    result = state.produced + (state.remaining or 0)
+    if expected is not None and result != expected:
+        state.warnings.append(f"图解针数 {expected}，模拟针数 {result}")
+        result = expected
+    row = {"stitches_per_row": result, "stitch_repeat": repeats}
+    if state.bind_off:
+        row["bind_off"] = state.bind_off
+    if state.warnings:
+        row["warnings"] = state.warnings
+    return row
+
+
+def parse_pieces(text: str) -> Dict[str, int]:
+    """从“左前片 46 针，后片 91 针”“左后片和右后片各22针”中读出各片的针数"""
+    pieces = {}
+    for part in split_top_level(normalize(text)):
+        match = _PIECE.fullmatch(part)
+        if match:
+            for name in match.group(1).split('和'):
+                if name:
+                    pieces[name] = int(match.group(2))
+    return pieces
+
+
+def parse_row_header(header: str) -> List[int]:
+    """解析行号部分，如 第5和7行、第11-18行的所有奇数行、第92行到第103行"""
+    header = re.sub(r'\([^)]*\)', '', header)
+    numbers = [int(n) for n in re.findall(r'\d+', header)]
+    if not numbers:
+        return []
+    if len(numbers) == 2 and re.search(r'\d+行?(?:到|-)第?\d+', header):
+        rows = list(range(numbers[0], numbers[1] + 1))
+    else:
+        rows = numbers
+    if '奇数行' in header:
+        rows = [n for n in rows if n % 2 == 1]
+    elif '偶数行' in header:
+        rows = [n for n in rows if n % 2 == 0]
+    return rows
+
+
+class StitchSimulator:
+    """
+    按行追踪针数的本地模拟器
+    能分词的说明直接计算 stitches_per_row 和 stitch_repeat，
+    不能分词或模拟结果有警告的行记录在 unresolved 里，交给 LLM 处理（针数按不变处理，遇到针数提示再校准）
+    各部分之间共用一个模拟器，针数从上一部分延续；
+    前文出现的“左前片 46 针”这类说明会作为同名部分的起始针数
+    """
+    def __init__(self, stitches: Optional[int] = None):
+        self.stitches = stitches
+        self.pieces = {}
+
+    def _row_body(self, row_number: int, explicit: Dict, refs: Dict, parity: Dict, depth: int = 0) -> Optional[str]:
+        """取某一行的（规范化）说明，展开“重复第N行”和区间重复"""
+        if depth > 8:
+            return None
+        if row_number in refs:
+            source = self._row_body(refs[row_number], explicit, refs, parity, depth + 1)
+            return split_trailer(source)[0] if source is not None else None
+        if row_number in explicit:
+            body = normalize(explicit[row_number][1])
+            text, expected = split_trailer(body)
+            match = _REPEAT_ROW.fullmatch(text)
+            if match:
+                source = self._row_body(int(match.group(1)), explicit, refs, parity, depth + 1)
+                if source is None:
+                    return None
+                source = split_trailer(source)[0]
+                return source + (f'一一{expected}针' if expected is not None else '')
+            return body
+        if row_number % 2 in parity:
+            return normalize(parity[row_number % 2][1])
+        return None
+
+    def parse_section(self, content: str, title: Optional[str] = None) -> Dict[str, Any]:
+        """解析一个部分，返回 rows（按原文顺序，包括 meta）、需要 LLM 的 unresolved 行和结束针数"""
+        if title and title in self.pieces:
+            self.stitches = self.pieces[title]
+        explicit = {}   # 行号 -> (原文, 说明)
+        refs = {}       # 行号 -> 被重复的行号（来自“重复第A行到第B行再N次”）
+        parity = {}     # 1/0 -> 奇数行/偶数行的默认说明
+        items = []
+        unresolved = []
+        for line in content.split('\n'):
+            text = line.strip()
+            if not text:
+                continue
+            compact = normalize(text)
+            row_match = _ROW_LINE.match(compact)
+            parity_match = _PARITY_LINE.match(compact)
+            row_numbers = parse_row_header(row_match.group(1)) if row_match else []
+            if parity_match:
+                parity[1 if parity_match.group(1) == '奇数行' else 0] = (text, parity_match.group(2))
+            elif row_numbers:
+                body = row_match.group(2)
+                repeat_rows = _REPEAT_ROWS.fullmatch(split_trailer(body)[0])
+                if repeat_rows and len(row_numbers) > 1:
+                    first, last, times = (int(n) for n in repeat_rows.groups())
+                    length = last - first + 1
+                    if length * times != len(row_numbers):
+                        unresolved.append(text)
+                        continue
+                    for i, row_number in enumerate(row_numbers):
+                        refs[row_number] = first + i % length
+                        explicit[row_number] = (text, '')
+                    # 区间末尾的针数提示只属于最后一行
+                    refs.pop(row_numbers[-1])
+                    explicit[row_numbers[-1]] = (text, f'重复第{last}行' + body[len(split_trailer(body)[0]):])
+                else:
+                    # 针数提示只属于最后一行，例如“第80和84行: 重复第76行一一14针”
+                    for row_number in row_numbers[:-1]:
+                        explicit[row_number] = (text, split_trailer(body)[0])
+                    explicit[row_numbers[-1]] = (text, body)
+                items.append(('rows', row_numbers))
+            elif re.match(r'第?\d+.*行', compact):
+                # 有行号但没有冒号，例如“第 20 到 59 行织平针，同时……”
+                unresolved.append(text)
+            else:
+                items.append(('meta', text))
+                cast_on = _CAST_ON.search(compact)
+                if cast_on:
+                    self.stitches = int(cast_on.group(1))
+                self.pieces.update(parse_pieces(text))
+
+        rows = {}
+        if explicit:
+            for row_number in range(min(explicit), max(explicit) + 1):
+                body = self._row_body(row_number, explicit, refs, parity)
+                if body is None:
+                    continue
+                line = explicit[row_number][0] if row_number in explicit else parity[row_number % 2][0]
+                try:
+                    row = simulate_row(body, self.stitches, row_number)
+                except UnresolvedInstruction:
+                    unresolved.append(line)
+                    continue
+                if row.get("warnings"):
+                    # 模拟结果和图解对不上，说明没有正确理解这一行，交给 LLM；有针数提示时按提示校准
+                    unresolved.append(line)
+                    expected = split_trailer(body)[1]
+                    if expected is not None:
+                        self.stitches = expected
+                    continue
+                self.stitches = row["stitches_per_row"]
+                rows[row_number] = {"type": "row", "row_number": row_number, "instruction": line, **row}
+                # 行末说明也可能给出各片针数，例如“——左后片和右后片各22针”
+                trailer = _TRAILER.search(normalize(line))
+                if trailer:
+                    self.pieces.update(parse_pieces(trailer.group(1)))
+
+        # 按原文顺序输出；由奇数行/偶数行默认说明补出的行插在后面的行号之前
+        ordered = []
+        pending = sorted(set(rows) - {n for kind, value in items if kind == 'rows' for n in value})
+        emitted = set()
+        for kind, value in items:
+            if kind == 'meta':
+                ordered.append({"type": "meta", "instruction": value})
+                continue
+            for row_number in value:
+                while pending and pending[0] < row_number:
+                    ordered.append(rows[pending.pop(0)])
+                if row_number in rows and row_number not in emitted:
+                    ordered.append(rows[row_number])
+                    emitted.add(row_number)
+        ordered.extend(rows[row_number] for row_number in pending)
+        return {"rows": ordered, "unresolved": list(dict.fromkeys(unresolved)), "end_stitches": self.stitches}
@@ -1,6 +1,7 @@
 import os
 from size_extractor import SizeExtractor
 import unittest
+from types import SimpleNamespace
 
 def test_size_extractor():
     # 创建测试用例
@@ -81,6 +82,43 @@ class TestSizeExtractor(unittest.TestCase):
                 self.assertEqual(result, test_case["expected"], 
                                f"测试用例 {i} 失败：\n输入：{test_case['input']}\n期望：{test_case['expected']}\n实际：{result}")
 
+    def test_preprocess_with_spans(self):
+        text = "重复【 】再8 (9 - 10 - 11\n- 11 - 14) 次\n第10行: (左上2并1) 3次\n第 9行(反面: 上针\n1 (2-3)针"
+        merged, spans = self.extractor.preprocess_with_spans(text)
+        self.assertEqual(merged, "重复【 】再8 (9 - 10 - 11 - 11 - 14) 次\n第10行: (左上2并1) 3次\n第 9行(反面: 上针 1 (2-3)针 ")
+        # 只有尺码序列会被记录，嵌套在未闭合括号里的也能识别
+        self.assertEqual([merged[start:end] for start, end in spans], ["(9 - 10 - 11 - 11 - 14)", "(2-3)"])
+
+    def test_decimal_size_sequence(self):
+        self.assertTrue(self.extractor.is_size_sequence("(42.5 - 45 - 47.5)"))
+        self.assertTrue(self.extractor.is_size_sequence("(42. 5 - 45 - x)"))
+        self.assertFalse(self.extractor.is_size_sequence("(见“折叠边”)"))
+        merged, spans = self.extractor.preprocess_with_spans("胸围 40 (42.5 - 45\n- 47.5) cm")
+        self.assertEqual([merged[start:end] for start, end in spans], ["(42.5 - 45 - 47.5)"])
+
+    def test_extract_sizes_batch(self):
+        lines = [
+            "用 3.5mm 环针，起 370 (406 - 442 - 478 - 514 - 586 - 622 - 658)针",
+            "剩51 (56 - 65 - 71 - 81 - 87 - 92)针",
+            "(左上2并1) 3次，重复【 】再8 (9 - 10 - 11 - 11 - 14 - 15 - 16) 次",
+        ]
+        prompts = []
+
+        def create(model, messages, temperature):
+            prompt = messages[-1]["content"]
+            prompts.append(prompt)
+            if "编号" in prompt:
+                # 第3行故意漏掉非尺码括号，应该单独重试
+                content = "1. 用 3.5mm 环针，起 406针\n2. 剩56针\n3. 左上2并1 3次，重复【 】再9次"
+            else:
+                content = "(左上2并1) 3次，重复【 】再9次"
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+        self.extractor.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        results = self.extractor.extract_sizes_batch(lines)
+        self.assertEqual(results, ["用 3.5mm 环针，起 406针", "剩56针", "(左上2并1) 3次，重复【 】再9次"])
+        self.assertEqual(len(prompts), 2)
+
 if __name__ == '__main__':
     unittest.main()
 
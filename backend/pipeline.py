@@ -0,0 +1,218 @@
+import os
+import tempfile
+from typing import Dict, Iterable, Iterator, List
+
+from ocr.ocr_post_processor import get_processor
+from ocr.page_margins import MARGIN_LINES, margin_indexes, margin_key
+from utils.profiling import stage
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class RepeatedLineFilter:
+    """
+    流式去除页眉页脚：某一行在之前页面的页首/页尾出现过，再次出现在页首/页尾时视为页眉页脚并删除
+    （第一页的页眉无法提前判断，会保留）
+    只删除不像编织说明的行：含“行”“针”“重复”的行即使在页边重复出现（例如“奇数行: 上针”）也保留；
+    比较时数字都视为相同，这样逐页变化的页码也能识别（与 pdf_text.remove_repeated_lines 共用 page_margins 的规则）
+    """
+    def __init__(self, margin_lines: int = MARGIN_LINES):
+        self.margin_lines = margin_lines
+        self.seen = set()
+
+    def feed(self, page_text: str) -> str:
+        lines = page_text.split('\n')
+        margins = set(margin_indexes(lines, self.margin_lines))
+        kept = []
+        for i, line in enumerate(lines):
+            key = margin_key(line) if i in margins else None
+            if key is not None:
+                if key in self.seen:
+                    continue
+                self.seen.add(key)
+            kept.append(line)
+        return '\n'.join(kept)
+
+
+class BracketCarry:
+    """
+    跨页合并括号：括号未闭合的行留到下一页再处理，
+    输出的每一行括号都是完整的，可以直接交给尺码提取
+    """
+    def __init__(self):
+        self.carry = ''
+        self.depth = 0
+
+    def feed(self, text: str) -> List[str]:
+        """输入一段文本，返回括号已经闭合的完整行"""
+        complete = []
+        for line in text.split('\n'):
+            self.carry = self.carry + ' ' + line if self.depth > 0 else line
+            for char in line:
+                if char in '(（':
+                    self.depth += 1
+                elif char in ')）' and self.depth > 0:
+                    self.depth -= 1
+            if self.depth == 0:
+                complete.append(self.carry)
+                self.carry = ''
+        return complete
+
+    def close(self) -> List[str]:
+        """文本结束时，把剩下的未闭合内容原样输出"""
+        rest = [self.carry] if self.carry else []
+        self.carry = ''
+        self.depth = 0
+        return rest
+
+
+class SectionStream:
+    """
+    增量切分章节（与 RowCounter.split_pattern_by_sections 规则相同）：
+    看到下一个 # 标题时，上一个章节才算完整
+    第一个标题之前的内容（OCR 和 PDF 文本通常没有 # 标题）保留为标题为空的章节，不会丢弃
+    """
+    def __init__(self):
+        self.current = {"title": "", "content": ""}
+
+    def _finished(self) -> List[Dict[str, str]]:
+        current = self.current
+        if current is None or (not current["title"] and not current["content"].strip()):
+            return []
+        return [current]
+
+    def feed(self, lines: Iterable[str]) -> List[Dict[str, str]]:
+        finished = []
+        for line in lines:
+            line = line.lstrip()
+            if line.startswith('#') or line.startswith('＃'):
+                finished.extend(self._finished())
+                self.current = {"title": line.lstrip('#＃').strip(), "content": ""}
+            else:
+                self.current["content"] += line + '\n'
+        return finished
+
+    def close(self) -> List[Dict[str, str]]:
+        finished = self._finished()
+        self.current = {"title": "", "content": ""}
+        return finished
+
+
+class StreamingPipeline:
+    """
+    流式的 OCR -> 后处理 -> 尺码提取 -> 章节切分
+    每一页文本产出后立刻往下游传，跨页的括号和章节通过 carry-over 处理；
+    全文从不拼成一个大字符串，章节一完整就产出
+    """
+    def __init__(self, post_processor=None, size_extractor=None, remove_repeated_lines: bool = True):
+        self.post_processor = post_processor or get_processor()
+        # size_extractor 为 None 时不做尺码提取（例如只需要切分章节）
+        self.size_extractor = size_extractor
+        self.line_filter = RepeatedLineFilter() if remove_repeated_lines else None
+
+    def extract_sizes(self, lines: List[str]) -> List[str]:
+        if not self.size_extractor or not lines:
+            return lines
+        # 同一页里含尺码序列的行打包成批量请求，普通括号（如“(见图1)”）的行不发送
+        indexes = []
+        size_lines = []
+        for i, line in enumerate(lines):
+            processed, spans = self.size_extractor.preprocess_with_spans(line)
+            if spans:
+                indexes.append(i)
+                size_lines.append(processed)
+        if not indexes:
+            return lines
+        extracted = self.size_extractor.extract_sizes_batch(size_lines)
+        lines = list(lines)
+        for i, line in zip(indexes, extracted):
+            lines[i] = line
+        return lines
+
+    def run(self, pages: Iterable[str]) -> Iterator[Dict[str, str]]:
+        """输入逐页文本，逐个产出完整的章节"""
+        brackets = BracketCarry()
+        sections = SectionStream()
+        pages = iter(pages)
+        while True:
+            # 读取/OCR 发生在取下一页的时候
+            with stage('read_page'):
+                page_text = next(pages, None)
+            if page_text is None:
+                break
+            with stage('post_process'):
+                if self.line_filter:
+                    page_text = self.line_filter.feed(page_text)
+                page_text = self.post_processor.process(page_text)
+            with stage('extract_sizes'):
+                lines = self.extract_sizes(brackets.feed(page_text))
+            with stage('split_sections'):
+                finished = sections.feed(lines)
+            yield from finished
+
+        with stage('extract_sizes'):
+            lines = self.extract_sizes(brackets.close())
+        with stage('split_sections'):
+            finished = sections.feed(lines) + sections.close()
+        yield from finished
+
+    def run_to_file(self, pages: Iterable[str], output_file: str) -> int:
+        """
+        流式写出 extracted_sizes 格式的文本，返回章节数；没有标题的章节只写内容
+        先写临时文件，得到至少一个章节才替换 output_file，否则原文件保持不变
+        """
+        directory = os.path.dirname(output_file) or '.'
+        os.makedirs(directory, exist_ok=True)
+        count = 0
+        fd, temp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for section in self.run(pages):
+                    f.write(f"#{section['title']}\n{section['content']}" if section['title'] else section['content'])
+                    f.flush()
+                    count += 1
+                    print(f"章节完成: {section['title'] or '（无标题）'}")
+            if count:
+                os.replace(temp_file, output_file)
+            else:
+                print(f"没有得到任何内容，{output_file} 保持不变")
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        return count
+
+
+def image_pages(image_dir: str, use_layout: bool = True) -> Iterator[str]:
+    """图片目录的逐页文本"""
+    from ocr.image_to_text import iter_page_texts
+    for _, text in iter_page_texts(image_dir, use_layout):
+        yield text
+
+
+def pdf_pages(pdf_path: str) -> Iterator[str]:
+    """PDF 的逐页文本（优先读取文字层）"""
+    from ocr.pdf_text import iter_pdf_page_texts
+    for _, text, _ in iter_pdf_page_texts(pdf_path):
+        yield text
+
+
+def main():
+    from parser.size_extractor import SizeExtractor
+
+    pdf_path = os.path.join(BACKEND_DIR, 'data', 'raw', 'PDF', '大吉岭背心-text.pdf')
+    output_file = os.path.join(BACKEND_DIR, 'data', 'processed', 'extracted_sizes.txt')
+    pipeline = StreamingPipeline(size_extractor=SizeExtractor())
+    count = pipeline.run_to_file(pdf_pages(pdf_path), output_file)
+    print(f"处理完成！共 {count} 个章节，结果已保存到: {output_file}")
+    if not count:
+        return
+
+    # 导入搜索索引（只更新这个图解的索引分段）
+    from search_index import index_file
+    pattern_id = os.path.splitext(os.path.basename(pdf_path))[0]
+    if index_file(output_file, pattern_id):
+        print(f"已更新搜索索引: {pattern_id}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import os
+import json
+from bisect import bisect_right
+from typing import Dict, List, Any, Optional, Tuple
+
+from row_layout import ROW_COUNTS_FILE, ROW_COUNT_EDITS_FILE, get_row_layout
+
+PARSED_RESULT_FILE = os.path.join('data', 'output', 'parsed_result.json')
+# 一次范围查询最多返回的行数
+MAX_RANGE_ROWS = 200
+
+
+class RowIndex:
+    """
+    全局行号索引：行号 -> 覆盖该行的部分和该行的说明
+    左前片、后片等部分的行号会重叠，所以一行可能属于多个部分。
+    构建时把所有 [start_row, end_row] 的端点排序，切成互不重叠的小区间，
+    每个小区间预先记下覆盖它的部分，查询时二分找到小区间即可，O(log n)
+    """
+    def __init__(self, sections: List[Dict[str, Any]], section_rows: Optional[Dict[str, List[Dict]]] = None):
+        # 只索引有行号范围的部分
+        self.sections = [
+            {
+                "section_title": section["section_title"],
+                "start_row": section["start_row"],
+                "end_row": section["end_row"],
+                "row_count": section.get("row_count", 0)
+            }
+            for section in sections
+            if section.get("start_row") is not None and section.get("end_row") is not None
+        ]
+
+        # 小区间的起点，以及每个小区间被哪些部分覆盖
+        points = sorted(
+            {section["start_row"] for section in self.sections} |
+            {section["end_row"] + 1 for section in self.sections}
+        )
+        self.points = points
+        self.covering: List[Tuple[int, ...]] = []
+        for point in points:
+            self.covering.append(tuple(
+                i for i, section in enumerate(self.sections)
+                if section["start_row"] <= point <= section["end_row"]
+            ))
+
+        # 逐行说明表：(部分下标, 行号) -> 行
+        self.instructions: Dict[Tuple[int, int], Dict] = {}
+        section_rows = section_rows or {}
+        for i, section in enumerate(self.sections):
+            for row in section_rows.get(section["section_title"], []):
+                if row.get("type") == "row" and isinstance(row.get("row_number"), int):
+                    self.instructions[(i, row["row_number"])] = row
+
+        self.total_rows = max((section["end_row"] for section in self.sections), default=0)
+
+    def sections_at(self, row_number: int) -> List[int]:
+        """覆盖某一行的部分下标"""
+        position = bisect_right(self.points, row_number) - 1
+        if position < 0:
+            return []
+        return list(self.covering[position])
+
+    def lookup(self, row_number: int) -> Optional[Dict[str, Any]]:
+        """查询一行：所属的部分以及每个部分在这一行的说明，不在任何部分内时返回 None"""
+        indexes = self.sections_at(row_number)
+        if not indexes:
+            return None
+        entries = []
+        for i in indexes:
+            section = self.sections[i]
+            row = self.instructions.get((i, row_number), {})
+            entries.append({
+                "section_title": section["section_title"],
+                "start_row": section["start_row"],
+                "end_row": section["end_row"],
+                "instruction": row.get("instruction"),
+                "stitches_per_row": row.get("stitches_per_row"),
+                "stitch_repeat": row.get("stitch_repeat", [])
+            })
+        return {"row_number": row_number, "sections": entries}
+
+    def lookup_range(self, start: int, end: int) -> List[Dict[str, Any]]:
+        """查询 [start, end] 内的所有行，跳过不属于任何部分的行号"""
+        end = min(end, start + MAX_RANGE_ROWS - 1)
+        rows = []
+        for row_number in range(start, end + 1):
+            row = self.lookup(row_number)
+            if row:
+                rows.append(row)
+        return rows
+
+    @classmethod
+    def from_files(cls, row_counts_file: str = ROW_COUNTS_FILE,
+                   parsed_file: Optional[str] = PARSED_RESULT_FILE,
+                   edits_file: str = ROW_COUNT_EDITS_FILE) -> 'RowIndex':
+        """从 row_counts.json（加上修改行数的记录）和（可选的）逐行解析结果构建索引"""
+        sections = get_row_layout(row_counts_file, edits_file).ranges()
+        section_rows = {}
+        if parsed_file and os.path.exists(parsed_file):
+            with open(parsed_file, 'r', encoding='utf-8') as f:
+                for section in json.load(f).get('sections', []):
+                    section_rows[section.get('section_title', '')] = section.get('rows', [])
+        return cls(sections, section_rows)
+
+
+_cached_index = None
+_cached_mtimes = None
+
+
+def get_row_index(row_counts_file: str = ROW_COUNTS_FILE,
+                  parsed_file: Optional[str] = PARSED_RESULT_FILE,
+                  edits_file: str = ROW_COUNT_EDITS_FILE) -> RowIndex:
+    """获取缓存的索引，数据文件或修改记录有变化时才重新构建"""
+    global _cached_index, _cached_mtimes
+    mtimes = tuple(
+        os.path.getmtime(path) if path and os.path.exists(path) else None
+        for path in (row_counts_file, parsed_file, edits_file)
+    ) + (row_counts_file, parsed_file, edits_file)
+    if _cached_index is None or mtimes != _cached_mtimes:
+        _cached_index = RowIndex.from_files(row_counts_file, parsed_file, edits_file)
+        _cached_mtimes = mtimes
+    return _cached_index
@@ -0,0 +1,162 @@
+import os
+import json
+import threading
+from typing import Dict, List, Any, Optional
+
+from parser.row_offsets import RowOffsets
+
+ROW_COUNTS_FILE = os.path.join('data', 'output', 'row_counts.json')
+# 修改行数的记录，追加写入，加载时在同一版本的 row_counts.json 基础上重放
+ROW_COUNT_EDITS_FILE = os.path.join('data', 'output', 'row_count_edits.jsonl')
+
+
+class RowLayout:
+    """
+    各部分的行号布局，与 row_counts.json 的 sections 一一对应（前端的 section-N 就是这里的下标 N）
+    左前片、后片、左后片等是分开织的，行号会重叠，所以按“行号连续的一串部分”分段：
+    后一个部分从前一个部分结束之后开始时属于同一串，否则（行号回退、没有行号）另起一串。
+    修改一个部分的起始行或行数时，只有同一串中它之后的部分整体平移；
+    平移量是之前各部分起始行移动量与行数变化量之和，用 RowOffsets 在 O(log n) 内更新和查询，只返回起止行发生变化的部分，
+    修改记录（该部分当前的起始行移动量和行数）追加到 edits_file，不重写整个数据文件
+    total_rows 与 row_counts.json 中的含义相同（各部分行数之和，加上修改带来的变化），last_row 为最后一行的行号
+    """
+    def __init__(self, sections: List[Dict[str, Any]], edits_file: Optional[str] = None, version: Any = None,
+                 total_rows: Optional[int] = None):
+        self.sections = [dict(section) for section in sections]
+        self.titles = [section.get('section_title') or section.get('title', '') for section in sections]
+        self.counts = [section.get('row_count') or 0 for section in sections]
+        # 各部分起始行相对原数据（以及前面部分的平移）的移动量
+        self.shifts = [0] * len(sections)
+        self.stored_total = sum(self.counts) if total_rows is None else total_rows
+        self.count_change = 0
+        # 每串的第一个部分的下标，没有行号的部分为 None
+        self.heads: List[Optional[int]] = []
+        previous_end = None
+        for i, section in enumerate(sections):
+            if section.get('start_row') is None or section.get('end_row') is None:
+                self.heads.append(None)
+                previous_end = None
+                continue
+            if previous_end is None or section['start_row'] <= previous_end:
+                self.heads.append(i)
+            else:
+                self.heads.append(self.heads[i - 1])
+            previous_end = section['end_row']
+        # 每个部分的起始行移动量 + 行数变化量（相对 row_counts.json），前缀和就是后面部分的平移量
+        self.deltas = RowOffsets([0] * len(sections), first_row=0)
+        self.edits_file = edits_file
+        # 修改记录只对生成它的那份数据有效（数据重新生成后 version 不同，旧记录被忽略）
+        self.version = version
+        self.lock = threading.Lock()
+        if edits_file and os.path.exists(edits_file):
+            with open(edits_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    edit = json.loads(line)
+                    if edit.get('version') == version and 0 <= edit['index'] < len(self.titles) \
+                            and self.heads[edit['index']] is not None:
+                        self._set(edit['index'], edit['row_count'], edit.get('start_shift', 0))
+
+    def _set(self, index: int, row_count: int, shift: int) -> bool:
+        """设置一个部分的行数和起始行移动量，返回是否有变化"""
+        if row_count == self.counts[index] and shift == self.shifts[index]:
+            return False
+        original = self.sections[index].get('row_count') or 0
+        self.count_change += row_count - self.counts[index]
+        self.counts[index] = row_count
+        self.shifts[index] = shift
+        self.deltas.set_row_count(index, row_count - original + shift)
+        return True
+
+    def _base_start(self, index: int) -> int:
+        """不算本部分自己的移动量时的起始行（原起始行 + 同一串中前面部分带来的平移）"""
+        head = self.heads[index]
+        return self.sections[index]['start_row'] + self.deltas.prefix_sum(index) - self.deltas.prefix_sum(head)
+
+    def section_range(self, index: int) -> Dict[str, Any]:
+        if self.heads[index] is None:
+            start_row, end_row = None, None
+        else:
+            start_row = self._base_start(index) + self.shifts[index]
+            end_row = start_row + self.counts[index] - 1 if self.counts[index] > 0 else start_row
+        return {
+            "index": index,
+            "section_title": self.titles[index],
+            "start_row": start_row,
+            "end_row": end_row,
+            "row_count": self.counts[index]
+        }
+
+    def ranges(self) -> List[Dict[str, Any]]:
+        """所有部分当前的范围，格式与 row_counts.json 的 sections 相同"""
+        with self.lock:
+            return [
+                {key: value for key, value in self.section_range(i).items() if key != 'index'}
+                for i in range(len(self.titles))
+            ]
+
+    @property
+    def total_rows(self) -> int:
+        return self.stored_total + self.count_change
+
+    @property
+    def last_row(self) -> int:
+        return max((section['end_row'] for section in self.ranges() if section['end_row'] is not None), default=0)
+
+    def update_row_count(self, index: int, row_count: int) -> List[Dict[str, Any]]:
+        """修改一个部分的行数（起始行不变），见 _update"""
+        return self._update(index, row_count=row_count)
+
+    def update_range(self, index: int, start_row: int, end_row: int) -> List[Dict[str, Any]]:
+        """修改一个部分的起止行，见 _update"""
+        if end_row < start_row:
+            raise ValueError("结束行不能小于起始行")
+        return self._update(index, row_count=end_row - start_row + 1, start_row=start_row)
+
+    def _update(self, index: int, row_count: int, start_row: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        修改一个部分的起始行和行数，返回受影响的范围：
+        该部分本身，以及同一串中它之后的部分（起止行整体平移）；没有变化时返回空列表
+        """
+        if not 0 <= index < len(self.titles):
+            raise IndexError(index)
+        if row_count < 0:
+            raise ValueError("行数不能为负数")
+        if self.heads[index] is None:
+            raise ValueError(f"{self.titles[index]} 没有行号范围")
+        if start_row is not None and start_row < 1:
+            raise ValueError("起始行必须大于0")
+        with self.lock:
+            shift = self.shifts[index] if start_row is None else start_row - self._base_start(index)
+            if not self._set(index, row_count, shift):
+                return []
+            if self.edits_file:
+                with open(self.edits_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"index": index, "row_count": row_count, "start_shift": shift,
+                                        "version": self.version}) + '\n')
+            end = index + 1
+            while end < len(self.heads) and self.heads[end] == self.heads[index]:
+                end += 1
+            return [self.section_range(i) for i in range(index, end)]
+
+
+_cached_layout = None
+_cached_key = None
+_cache_lock = threading.Lock()
+
+
+def get_row_layout(row_counts_file: str = ROW_COUNTS_FILE, edits_file: str = ROW_COUNT_EDITS_FILE) -> Optional[RowLayout]:
+    """获取缓存的布局，row_counts.json 有修改时重新加载（旧的修改记录随之失效）；文件不存在时返回 None"""
+    global _cached_layout, _cached_key
+    if not os.path.exists(row_counts_file):
+        return None
+    mtime = os.path.getmtime(row_counts_file)
+    with _cache_lock:
+        if _cached_layout is None or _cached_key != (row_counts_file, mtime):
+            with open(row_counts_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            _cached_layout = RowLayout(data.get('sections', []), edits_file, version=mtime,
+                                       total_rows=data.get('total_rows'))
+            _cached_key = (row_counts_file, mtime)
+        return _cached_layout
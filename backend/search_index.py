@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import math
+import heapq
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, List, Any, Optional
+
+from parser.stitch_simulator import STITCH_EFFECTS, STITCH_TYPES, normalize
+
+INDEX_DIR = os.path.join('data', 'index')
+# 搜索结果中展示的内容长度
+PREVIEW_CHARS = 120
+
+# 针法术语作为整体的词元，例如“左上2并1”；单字的“上”“下”只靠二元组检索
+STITCH_TERMS = sorted(
+    {normalize(term) for term in list(STITCH_EFFECTS) + STITCH_TYPES if len(term) > 1},
+    key=len, reverse=True
+)
+_STITCH_TERM = re.compile('|'.join(re.escape(term) for term in STITCH_TERMS))
+# 带单位的数字，例如“20行”“406针”“3次”
+_COUNT = re.compile(r'(\d+)(行|针|次)')
+_CJK_RUN = re.compile(r'[一-鿿]+')
+_WORD = re.compile(r'[A-Za-z][A-Za-z0-9]*')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切分词元：针法术语 + 带单位的数字 + 英文单词 + 连续汉字的二元组
+    文本先做与针数模拟器相同的规范化（去空白、“二并一”统一为“2并1”）
+    """
+    text = normalize(text)
+    tokens = _STITCH_TERM.findall(text)
+    tokens += [number + unit for number, unit in _COUNT.findall(text)]
+    tokens += [word.lower() for word in _WORD.findall(text)]
+    for run in _CJK_RUN.findall(text):
+        tokens += [run[i:i + 2] for i in range(len(run) - 1)]
+    return tokens
+
+
+def _write_json_atomic(path: str, data: Any):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_file, path)
+
+
+class SearchIndex:
+    """
+    各图解所有部分（标题 + 内容）的倒排索引
+    磁盘上每个图解一个分段文件（各部分的词频），manifest.json 记录所有分段；
+    重新导入一个图解只重写它自己的分段和 manifest，内存中的倒排表也只增删这个图解的部分
+    Flask 多线程下共用一个实例：修改倒排表和查询都持有 self.lock，查询不会看到改到一半的索引
+    """
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.index_dir = index_dir
+        self.manifest_file = os.path.join(index_dir, 'manifest.json')
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.docs: Dict[int, Dict[str, Any]] = {}
+        self.pattern_docs: Dict[str, List[int]] = {}
+        self.versions: Dict[str, str] = {}
+        self.next_doc_id = 0
+        self._manifest_mtime = None
+        # refresh 会在 add_pattern、search 内部调用，用可重入锁
+        self.lock = threading.RLock()
+        self.refresh()
+
+    def _segment_file(self, pattern_id: str) -> str:
+        name = hashlib.sha1(pattern_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.index_dir, 'segments', f'{name}.json')
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        if not os.path.exists(self.manifest_file):
+            return {"patterns": {}}
+        with open(self.manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def refresh(self):
+        """manifest 有变化时（例如另一个进程导入了图解）只重新加载版本变化的分段"""
+        mtime = os.path.getmtime(self.manifest_file) if os.path.exists(self.manifest_file) else None
+        with self.lock:
+            if mtime == self._manifest_mtime:
+                return
+            self._manifest_mtime = mtime
+            patterns = self._read_manifest().get('patterns', {})
+            for pattern_id in list(self.versions):
+                if pattern_id not in patterns:
+                    self._remove_docs(pattern_id)
+            for pattern_id, version in patterns.items():
+                if self.versions.get(pattern_id) == version:
+                    continue
+                try:
+                    with open(self._segment_file(pattern_id), 'r', encoding='utf-8') as f:
+                        segment = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"读取索引分段出错 {pattern_id}: {e}")
+                    continue
+                self._load_segment(segment)
+
+    def _remove_docs(self, pattern_id: str):
+        for doc_id in self.pattern_docs.pop(pattern_id, []):
+            for token in self.docs.pop(doc_id)['tokens']:
+                postings = self.postings[token]
+                del postings[doc_id]
+                if not postings:
+                    del self.postings[token]
+        self.versions.pop(pattern_id, None)
+
+    def _load_segment(self, segment: Dict[str, Any]):
+        pattern_id = segment['pattern_id']
+        self._remove_docs(pattern_id)
+        doc_ids = []
+        for section in segment['sections']:
+            doc_id = self.next_doc_id
+            self.next_doc_id += 1
+            for token, count in section['tokens'].items():
+                self.postings.setdefault(token, {})[doc_id] = count
+            self.docs[doc_id] = {
+                "pattern_id": pattern_id,
+                "section_index": section['section_index'],
+                "title": section['title'],
+                "preview": section['preview'],
+                "tokens": list(section['tokens'])
+            }
+            doc_ids.append(doc_id)
+        self.pattern_docs[pattern_id] = doc_ids
+        self.versions[pattern_id] = segment['version']
+
+    def add_pattern(self, pattern_id: str, sections: List[Dict[str, str]]) -> bool:
+        """导入（或重新导入）一个图解；内容没有变化时直接返回 False"""
+        version = hashlib.sha256(json.dumps(sections, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+        self.refresh()
+        if self.versions.get(pattern_id) == version:
+            return False
+        # 分词在锁外完成，锁内只写文件和更新倒排表
+        segment = {
+            "pattern_id": pattern_id,
+            "version": version,
+            "sections": [
+                {
+                    "section_index": i,
+                    "title": section['title'],
+                    "preview": section['content'].strip()[:PREVIEW_CHARS],
+                    # 标题的词元计两次，标题命中排在前面
+                    "tokens": dict(Counter(tokenize(section['title']) * 2 + tokenize(section['content'])))
+                }
+                for i, section in enumerate(sections)
+            ]
+        }
+        with self.lock:
+            _write_json_atomic(self._segment_file(pattern_id), segment)
+            self._load_segment(segment)
+            self._save_manifest()
+        return True
+
+    def remove_pattern(self, pattern_id: str):
+        self.refresh()
+        with self.lock:
+            self._remove_docs(pattern_id)
+            segment_file = self._segment_file(pattern_id)
+            if os.path.exists(segment_file):
+                os.remove(segment_file)
+            self._save_manifest()
+
+    def _save_manifest(self):
+        _write_json_atomic(self.manifest_file, {"patterns": self.versions})
+        self._manifest_mtime = os.path.getmtime(self.manifest_file)
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """所有词元都出现的部分，按 tf-idf 排序"""
+        self.refresh()
+        # 查询里的空格用来分隔检索词，分开切分，避免“2并1 20行”被规范化成“2并120行”
+        tokens = list(dict.fromkeys(token for part in query.split() for token in tokenize(part)))
+        if not tokens:
+            return []
+        with self.lock:
+            return self._search(tokens, limit)
+
+    def _search(self, tokens: List[str], limit: int) -> List[Dict[str, Any]]:
+        postings = [self.postings.get(token) for token in tokens]
+        if not all(postings):
+            return []
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for other in postings[1:]:
+            candidates.intersection_update(other)
+            if not candidates:
+                return []
+
+        doc_count = len(self.docs)
+        weighted = [(math.log(1 + doc_count / len(p)), p) for p in postings]
+        scored = heapq.nsmallest(
+            limit,
+            ((-sum(weight * p[doc_id] for weight, p in weighted), doc_id) for doc_id in candidates)
+        )
+        return [
+            {
+                "pattern_id": self.docs[doc_id]['pattern_id'],
+                "section_index": self.docs[doc_id]['section_index'],
+                "title": self.docs[doc_id]['title'],
+                "preview": self.docs[doc_id]['preview'],
+                "score": round(-score, 3)
+            }
+            for score, doc_id in scored
+        ]
+
+
+def split_sections(text: str) -> List[Dict[str, str]]:
+    """按 # 标题切分 extracted_sizes 格式的文本，第一个标题之前的内容作为标题为空的部分"""
+    sections = []
+    current = {"title": "", "content": ""}
+    for line in text.split('\n'):
+        stripped = line.lstrip()
+        if stripped.startswith('#') or stripped.startswith('＃'):
+            if current["title"] or current["content"].strip():
+                sections.append(current)
+            current = {"title": stripped.lstrip('#＃').strip(), "content": ""}
+        else:
+            current["content"] += line + '\n'
+    if current["title"] or current["content"].strip():
+        sections.append(current)
+    return sections
+
+
+def index_file(path: str, pattern_id: Optional[str] = None, index: Optional[SearchIndex] = None) -> bool:
+    """把一个 extracted_sizes 格式的文件导入索引，pattern_id 默认取文件名"""
+    index = index or get_search_index()
+    pattern_id = pattern_id or os.path.splitext(os.path.basename(path))[0]
+    with open(path, 'r', encoding='utf-8') as f:
+        return index.add_pattern(pattern_id, split_sections(f.read()))
+
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex()
+        return _search_index
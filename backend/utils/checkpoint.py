@@ -0,0 +1,101 @@
+import os
+import json
+import hashlib
+import tempfile
+from typing import Any, Dict, Iterable, Optional
+
+
+def fingerprint(items: Iterable[Any]) -> str:
+    """输入的指纹：输入变了，旧的断点记录就不再适用"""
+    digest = hashlib.sha256()
+    for item in items:
+        digest.update(json.dumps(item, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def file_fingerprint(paths: Iterable[str]) -> str:
+    """按文件路径、大小和修改时间计算指纹（不读文件内容）"""
+    items = []
+    for path in paths:
+        stat = os.stat(path)
+        items.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    return fingerprint(items)
+
+
+class Checkpoint:
+    """
+    以页/部分为单位的断点记录，中断后重跑时跳过已完成的单元
+    日志是追加写的 JSON Lines：第一行记录输入指纹，之后每完成一个单元追加一行并 fsync；
+    写到一半崩溃留下的残缺行在加载时丢弃，所以每条记录要么完整生效、要么不存在
+    resume 为 False 时忽略已有的日志，从头开始
+    """
+    def __init__(self, journal_file: str, run_key: str, resume: bool = True):
+        self.journal_file = journal_file
+        self.run_key = run_key
+        self.results: Dict[str, Any] = {}
+        if not (resume and self._load()):
+            self._start()
+
+    def _load(self) -> bool:
+        """加载同一输入的日志，返回是否可以续跑"""
+        if not os.path.exists(self.journal_file):
+            return False
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        try:
+            header = json.loads(lines[0])
+        except json.JSONDecodeError:
+            return False
+        if header.get('run') != self.run_key:
+            return False
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 崩溃时写了一半的最后一行
+                break
+            self.results[record['unit']] = record['result']
+        if self.results:
+            print(f"从断点恢复：已完成 {len(self.results)} 个单元")
+        # 重写一遍，去掉可能存在的残缺行
+        self._rewrite()
+        return True
+
+    def _rewrite(self):
+        directory = os.path.dirname(self.journal_file) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"run": self.run_key}) + '\n')
+            for unit, result in self.results.items():
+                f.write(json.dumps({"unit": unit, "result": result}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.journal_file)
+
+    def _start(self):
+        self.results = {}
+        self._rewrite()
+
+    def done(self, unit: str) -> bool:
+        return unit in self.results
+
+    def get(self, unit: str, default: Optional[Any] = None) -> Any:
+        return self.results.get(unit, default)
+
+    def record(self, unit: str, result: Any):
+        """记录一个完成的单元，返回前已落盘"""
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"unit": unit, "result": result}, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.results[unit] = result
+
+    def clear(self):
+        """整个任务完成后删除日志"""
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self.results = {}
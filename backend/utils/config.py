@@ -1,23 +1,30 @@
 import os
 from pathlib import Path
 import json
-from dotenv import load_dotenv
 
 class Config:
     def __init__(self):
+        # 只记录路径：导入模块时不创建目录、不写文件，也不加载 .env
         self.config_dir = Path.home() / '.knitting_config'
         self.config_file = self.config_dir / 'config.json'
-        self._ensure_config_exists()
-        load_dotenv()
+        self._env_loaded = False
 
     def _ensure_config_exists(self):
-        """确保配置目录和文件存在"""
+        """确保配置目录和文件存在（只在写入配置时调用）"""
         self.config_dir.mkdir(exist_ok=True)
         if not self.config_file.exists():
             self.config_file.write_text('{}')
 
+    def _load_env(self):
+        """第一次读取密钥时才加载 .env"""
+        if not self._env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            self._env_loaded = True
+
     def get_api_key(self) -> str:
         """获取API密钥，优先从环境变量获取"""
+        self._load_env()
         env_api_key = os.getenv('OPENAI_API_KEY')
         if env_api_key:
             return env_api_key
@@ -31,7 +38,9 @@ class Config:
         self._save_config(config)
 
     def _load_config(self) -> dict:
-        """加载配置文件"""
+        """加载配置文件，文件不存在时返回空配置"""
+        if not self.config_file.exists():
+            return {}
         try:
             return json.loads(self.config_file.read_text())
         except json.JSONDecodeError:
@@ -39,6 +48,7 @@ class Config:
 
     def _save_config(self, config: dict):
         """保存配置到文件"""
+        self._ensure_config_exists()
         self.config_file.write_text(json.dumps(config, indent=2))
 
 # 创建全局配置实例
@@ -0,0 +1,189 @@
+import os
+import json
+import math
+import time
+import bisect
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional
+
+# 每次调用（含对冲请求）的总时限，超过后放弃并按出错处理
+DEFAULT_DEADLINE = float(os.getenv('LLM_DEADLINE_SECONDS', 90))
+# 第一个请求耗时超过历史延迟的这个分位数还没返回，就再发一个相同的请求
+DEFAULT_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', 0.9))
+# 样本太少时分位数不可靠，改用固定的对冲等待时间
+MIN_SAMPLES = 20
+DEFAULT_HEDGE_DELAY = 15.0
+MAX_ATTEMPTS = 2
+LATENCY_STATS_FILE = os.path.join('data', 'output', 'llm_latency.json')
+
+# 直方图桶的上界（秒）：从 0.1 秒开始每档乘 1.25，直到约 300 秒
+BUCKET_BOUNDS = [round(0.1 * 1.25 ** i, 3) for i in range(37)]
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class LatencyHistogram:
+    """按对数分桶的延迟直方图，用于估计对冲阈值（分位数）"""
+    def __init__(self, counts: Optional[List[int]] = None):
+        self.counts = list(counts) if counts and len(counts) == len(BUCKET_BOUNDS) + 1 else [0] * (len(BUCKET_BOUNDS) + 1)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """分位数所在桶的上界；没有样本时返回 None"""
+        total = self.total
+        if not total:
+            return None
+        target = math.ceil(p * total)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else math.inf
+        return math.inf
+
+    def merge(self, other: 'LatencyHistogram'):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+
+class HedgedCaller:
+    """
+    带时限和对冲的 LLM 调用：
+    - 整个调用有总时限 deadline，每个请求的超时是剩余时间，不会无限等待
+    - 第一个请求超过历史延迟的 hedge_percentile 分位数还没返回（或已经出错），就再发一个相同的请求，
+      先返回、且通过 parse 校验的结果胜出
+    - 每个成功请求的耗时记入延迟直方图；传入 stats_file 时直方图跨进程累积，用于调整阈值
+    """
+    def __init__(self, name: str, deadline: float = DEFAULT_DEADLINE,
+                 hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE, max_attempts: int = MAX_ATTEMPTS,
+                 stats_file: Optional[str] = None, default_hedge_delay: float = DEFAULT_HEDGE_DELAY):
+        self.name = name
+        self.deadline = deadline
+        self.default_hedge_delay = default_hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self.max_attempts = max_attempts
+        self.stats_file = stats_file
+        self.latency = LatencyHistogram()
+        self.counters = {"calls": 0, "hedged": 0, "hedge_wins": 0, "errors": 0, "timeouts": 0}
+        self._recorded = LatencyHistogram()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix=f'llm-{name}')
+        if stats_file:
+            self.latency = self._load_stats().get(name, LatencyHistogram())
+
+    def hedge_delay(self) -> float:
+        """发对冲请求前的等待时间"""
+        with self._lock:
+            if self.latency.total < MIN_SAMPLES:
+                return min(self.default_hedge_delay, self.deadline)
+            return min(self.latency.percentile(self.hedge_percentile), self.deadline)
+
+    def call(self, request: Callable[[float], Any], parse: Callable[[Any], Any]) -> Any:
+        """
+        request(timeout) 发出一次请求并返回原始响应；parse(response) 校验并解析，无效时抛出异常
+        返回第一个有效的解析结果；全部失败时抛出最后一个异常，超过总时限时抛出 DeadlineExceeded
+        """
+        start = time.monotonic()
+        deadline = start + self.deadline
+        hedge_at = start + self.hedge_delay()
+        pending = {}
+        attempts = 0
+        last_error = None
+        with self._lock:
+            self.counters["calls"] += 1
+
+        def launch():
+            nonlocal attempts
+            attempts += 1
+            sent = time.monotonic()
+            future = self._executor.submit(lambda: parse(request(max(0.1, deadline - sent))))
+            pending[future] = (attempts, sent)
+
+        launch()
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                with self._lock:
+                    self.counters["timeouts"] += 1
+                raise DeadlineExceeded(f"{self.name}: 超过 {self.deadline:.0f} 秒没有得到有效结果")
+            if attempts < self.max_attempts and (now >= hedge_at or not pending):
+                if pending:
+                    with self._lock:
+                        self.counters["hedged"] += 1
+                    print(f"{self.name}: 请求已等待 {now - start:.1f} 秒，发送对冲请求")
+                launch()
+                continue
+            if not pending:
+                raise last_error
+            timeout = deadline - now if attempts >= self.max_attempts else min(hedge_at, deadline) - now
+            done, _ = wait(list(pending), timeout=max(0, timeout), return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt, sent = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    with self._lock:
+                        self.counters["errors"] += 1
+                    print(f"{self.name}: 第 {attempt} 个请求失败: {e}")
+                    continue
+                self._record(time.monotonic() - sent, hedge_won=attempt > 1)
+                return result
+
+    def _record(self, seconds: float, hedge_won: bool):
+        with self._lock:
+            self.latency.record(seconds)
+            self._recorded.record(seconds)
+            if hedge_won:
+                self.counters["hedge_wins"] += 1
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counters,
+                "samples": self.latency.total,
+                "p50": self.latency.percentile(0.5),
+                "p90": self.latency.percentile(0.9),
+                "p99": self.latency.percentile(0.99),
+            }
+
+    def _load_stats(self) -> Dict[str, LatencyHistogram]:
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return {}
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"读取延迟统计出错: {e}")
+            return {}
+        if data.get('bucket_bounds') != BUCKET_BOUNDS:
+            return {}
+        return {name: LatencyHistogram(counts) for name, counts in data.get('histograms', {}).items()}
+
+    def save_stats(self):
+        """把本进程新记录的延迟合并进 stats_file（其他调用方的直方图保持不变）"""
+        if not self.stats_file:
+            return
+        with self._lock:
+            recorded, self._recorded = self._recorded, LatencyHistogram()
+        histograms = self._load_stats()
+        histograms.setdefault(self.name, LatencyHistogram()).merge(recorded)
+        directory = os.path.dirname(self.stats_file) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({
+                "bucket_bounds": BUCKET_BOUNDS,
+                "histograms": {name: histogram.counts for name, histogram in histograms.items()}
+            }, f)
+        os.replace(temp_file, self.stats_file)
+        print(f"{self.name} 延迟统计: {self.report()}")
@@ -0,0 +1,234 @@
+import os
+import time
+import asyncio
+import threading
+import weakref
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from utils.hedged_llm import DEFAULT_DEADLINE
+
+# 整个进程同时进行的 LLM 请求上限：所有阶段、所有 Flask 工作线程、同步和异步客户端共享
+MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', 8))
+# 空闲连接保持一段时间，后续请求直接复用，不用重新建立 TLS 连接
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_MAX_KEEPALIVE', 8))
+KEEPALIVE_EXPIRY = 60.0
+CONNECT_TIMEOUT = 10.0
+# 单个请求的默认读超时；经过 HedgedCaller 的调用会传入剩余时间作为更短的超时
+READ_TIMEOUT = DEFAULT_DEADLINE
+# 异步等待名额时的轮询间隔（秒）
+ASYNC_POLL_INTERVAL = 0.01
+
+
+class InFlightLimit:
+    """
+    全局并发上限：请求发出前取得名额，响应读完（流式响应关闭）后归还
+    同步请求阻塞等待；异步请求轮询等待，被取消时不会占用名额
+    等待时间不超过请求的超时（调用方传入的剩余时间），等不到名额时按连接池超时报错
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.waits = 0
+
+    def _acquired(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """取得名额，timeout 秒内没有空出名额时返回 False（None 表示一直等待）"""
+        if not self._semaphore.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._semaphore.acquire(timeout=timeout):
+                return False
+        self._acquired()
+        return True
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        if not self._semaphore.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._semaphore.acquire(blocking=False):
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                await asyncio.sleep(ASYNC_POLL_INTERVAL)
+        self._acquired()
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"limit": self.limit, "in_flight": self.in_flight, "peak": self.peak, "waits": self.waits}
+
+
+LIMIT = InFlightLimit(MAX_IN_FLIGHT)
+
+_clients: Dict[Any, Any] = {}
+_async_clients = weakref.WeakKeyDictionary()
+# 创建客户端时会嵌套取得共享连接池，用可重入锁
+_lock = threading.RLock()
+
+
+@lru_cache(maxsize=None)
+def _transport_classes():
+    """带全局并发上限的 httpx 传输层（httpx 随 openai 安装，用到时才导入）"""
+    import httpx
+
+    class ReleasingStream(httpx.SyncByteStream):
+        def __init__(self, stream):
+            self._stream = stream
+            self._released = False
+
+        def __iter__(self):
+            yield from self._stream
+
+        def close(self):
+            try:
+                self._stream.close()
+            finally:
+                if not self._released:
+                    self._released = True
+                    LIMIT.release()
+
+    class AsyncReleasingStream(httpx.AsyncByteStream):
+        def __init__(self, stream):
+            self._stream = stream
+            self._released = False
+
+        async def __aiter__(self):
+            async for chunk in self._stream:
+                yield chunk
+
+        async def aclose(self):
+            try:
+                await self._stream.aclose()
+            finally:
+                if not self._released:
+                    self._released = True
+                    LIMIT.release()
+
+    def pool_timeout(request) -> Optional[float]:
+        # openai 把每次调用的 timeout（经过 HedgedCaller 时是剩余时间）放在请求的扩展里
+        return (request.extensions.get('timeout') or {}).get('pool')
+
+    def limit_exceeded(request):
+        return httpx.PoolTimeout(f"{pool_timeout(request)} 秒内没有等到 LLM 并发名额（上限 {LIMIT.limit}）",
+                                 request=request)
+
+    class LimitedTransport(httpx.HTTPTransport):
+        def handle_request(self, request):
+            if not LIMIT.acquire(pool_timeout(request)):
+                raise limit_exceeded(request)
+            try:
+                response = super().handle_request(request)
+            except BaseException:
+                LIMIT.release()
+                raise
+            return httpx.Response(response.status_code, headers=response.headers,
+                                  stream=ReleasingStream(response.stream), extensions=response.extensions)
+
+    class AsyncLimitedTransport(httpx.AsyncHTTPTransport):
+        async def handle_async_request(self, request):
+            if not await LIMIT.acquire_async(pool_timeout(request)):
+                raise limit_exceeded(request)
+            try:
+                response = await super().handle_async_request(request)
+            except BaseException:
+                LIMIT.release()
+                raise
+            return httpx.Response(response.status_code, headers=response.headers,
+                                  stream=AsyncReleasingStream(response.stream), extensions=response.extensions)
+
+    return httpx, LimitedTransport, AsyncLimitedTransport
+
+
+def _cached(key: Any, create: Callable[[], Any]) -> Any:
+    with _lock:
+        if key not in _clients:
+            _clients[key] = create()
+        return _clients[key]
+
+
+def _limits_and_timeout():
+    httpx = _transport_classes()[0]
+    limits = httpx.Limits(max_connections=MAX_IN_FLIGHT, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                          keepalive_expiry=KEEPALIVE_EXPIRY)
+    return limits, httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def sync_transport():
+    """进程内共享的同步连接池，OpenAI 和 Gemini 的同步客户端都用它"""
+    def create():
+        _, LimitedTransport, _ = _transport_classes()
+        return LimitedTransport(limits=_limits_and_timeout()[0])
+    return _cached('sync_transport', create)
+
+
+def async_transport():
+    """异步连接池：连接绑定在事件循环上，每个事件循环一个，循环结束后自动释放"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        if 'transport' not in clients:
+            _, _, AsyncLimitedTransport = _transport_classes()
+            clients['transport'] = AsyncLimitedTransport(limits=_limits_and_timeout()[0])
+        return clients['transport']
+
+
+def get_openai_client(api_key: Optional[str] = None):
+    """共享的同步 OpenAI 客户端，同一个 API 密钥只创建一次"""
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+
+    def create():
+        import openai
+        httpx = _transport_classes()[0]
+        timeout = _limits_and_timeout()[1]
+        return openai.OpenAI(api_key=api_key, timeout=timeout,
+                             http_client=httpx.Client(transport=sync_transport(), timeout=timeout))
+    return _cached(('openai', api_key), create)
+
+
+def get_async_openai_client(api_key: Optional[str] = None):
+    """当前事件循环的异步 OpenAI 客户端，必须在协程中调用"""
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    transport = async_transport()
+    clients = _async_clients[asyncio.get_running_loop()]
+    with _lock:
+        if ('openai', api_key) not in clients:
+            import openai
+            httpx = _transport_classes()[0]
+            timeout = _limits_and_timeout()[1]
+            clients[('openai', api_key)] = openai.AsyncOpenAI(
+                api_key=api_key, timeout=timeout,
+                http_client=httpx.AsyncClient(transport=transport, timeout=timeout)
+            )
+        return clients[('openai', api_key)]
+
+
+def get_gemini_client(api_key: str):
+    """共享的 Gemini 客户端；SDK 版本不支持自定义 httpx 参数时退回默认连接"""
+    def create():
+        from google import genai
+        try:
+            return genai.Client(api_key=api_key, http_options={
+                "timeout": int(READ_TIMEOUT * 1000),
+                "client_args": {"transport": sync_transport()},
+            })
+        except Exception as e:
+            print(f"Gemini 客户端无法使用共享连接池，改用默认连接: {e}")
+            return genai.Client(api_key=api_key)
+    return _cached(('gemini', api_key), create)
+
+
+def client_stats() -> Dict[str, int]:
+    return LIMIT.stats()
@@ -0,0 +1,161 @@
+import os
+import re
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from parser.stitch_simulator import STITCH_EFFECTS, normalize
+from utils.hedged_llm import HedgedCaller
+
+# 按速度/价格从低到高排列的模型，可用环境变量 LLM_MODEL_TIERS 覆盖（逗号分隔）
+MODEL_TIERS = [model.strip() for model in os.getenv('LLM_MODEL_TIERS', 'gpt-3.5-turbo,gpt-4').split(',') if model.strip()]
+# 难度分数低于第 i 个阈值的部分从第 i 档模型开始，超过所有阈值的从最强的模型开始
+DIFFICULTY_THRESHOLDS = [1.5, 3.0]
+# 每百万 token 的价格（美元）：(输入, 输出)
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.5, 1.5),
+    'gpt-4': (30.0, 60.0),
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-4o': (2.5, 10.0),
+}
+
+# 打分权重：每 1000 个字符 1 分，括号每多嵌套一层 0.75 分，每个无法识别的说明片段 0.5 分
+LENGTH_UNIT = 1000
+NESTING_WEIGHT = 0.75
+UNKNOWN_WEIGHT = 0.5
+
+_KNOWN_TERM = re.compile('|'.join(sorted(STITCH_EFFECTS, key=len, reverse=True)) + r'|平针|收\d*针|剩\d+针|行|次|针')
+_FRAGMENT_SPLIT = re.compile(r'[,;、:()【】]')
+_CJK = re.compile(r'[一-鿿]')
+
+
+def nesting_depth(text: str) -> int:
+    depth = deepest = 0
+    for char in text:
+        if char in '(【':
+            depth += 1
+            deepest = max(deepest, depth)
+        elif char in ')】':
+            depth = max(0, depth - 1)
+    return deepest
+
+
+def difficulty_score(content: str) -> Dict[str, Any]:
+    """
+    部分的难度：长度、重复（括号）的嵌套层数、不含任何已知针法术语的说明片段数
+    """
+    text = normalize(content)
+    depth = nesting_depth(text)
+    unknown = sum(
+        1 for fragment in _FRAGMENT_SPLIT.split(text)
+        if _CJK.search(fragment) and not _KNOWN_TERM.search(fragment)
+    )
+    score = len(text) / LENGTH_UNIT + NESTING_WEIGHT * max(0, depth - 1) + UNKNOWN_WEIGHT * unknown
+    return {"length": len(text), "nesting": depth, "unknown_terms": unknown, "score": round(score, 3)}
+
+
+class ModelRouter:
+    """
+    按难度选择模型：简单的部分先用最快的模型，只有输出没通过 parse（格式或一致性校验）时才换下一档模型
+    每档的调用都经过 HedgedCaller（时限 + 对冲）；report() 汇总每个模型的调用次数、失败、延迟和费用
+    """
+    def __init__(self, name: str, tiers: Optional[List[str]] = None,
+                 thresholds: Optional[List[float]] = None, caller: Optional[HedgedCaller] = None):
+        self.name = name
+        self.tiers = tiers or MODEL_TIERS
+        self.thresholds = DIFFICULTY_THRESHOLDS if thresholds is None else thresholds
+        self.caller = caller or HedgedCaller(name)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """开始处理一个新图解时清空统计"""
+        with self._lock:
+            self.stats = {}
+            self.escalations = 0
+
+    def start_tier(self, score: float) -> int:
+        for i, threshold in enumerate(self.thresholds):
+            if score < threshold:
+                return min(i, len(self.tiers) - 1)
+        return len(self.tiers) - 1
+
+    def _model_stats(self, model: str) -> Dict[str, Any]:
+        return self.stats.setdefault(model, {
+            "calls": 0, "failures": 0, "latency_seconds": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0
+        })
+
+    def record_usage(self, model: str, response):
+        """记录一个请求的 token 用量和费用（对冲的重复请求也计费）；流式请求传入带 usage 的最后一块"""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        with self._lock:
+            stats = self._model_stats(model)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cost_usd"] += (prompt_tokens * input_price + completion_tokens * output_price) / 1e6
+
+    def call(self, content: str, request: Callable[[str, float], Any], parse: Callable[[Any], Any],
+             escalate: bool = True) -> Any:
+        """
+        request(model, timeout) 发出请求；parse(response) 做格式和一致性校验，不通过时抛出异常
+        从难度对应的档位开始，失败时逐档升级（escalate 为 False 时不升级），全部失败时抛出最后一个异常
+        """
+        difficulty = difficulty_score(content)
+        start = self.start_tier(difficulty['score'])
+        last_error = None
+        for tier in range(start, len(self.tiers) if escalate else start + 1):
+            model = self.tiers[tier]
+            if tier > start:
+                with self._lock:
+                    self.escalations += 1
+                print(f"{self.name}: 升级到 {model}（{last_error}）")
+
+            def parse_with_usage(response, model=model):
+                self.record_usage(model, response)
+                return parse(response)
+
+            begin = time.monotonic()
+            try:
+                result = self.caller.call(lambda timeout, model=model: request(model, timeout), parse_with_usage)
+            except Exception as e:
+                last_error = e
+                self.record_call(model, time.monotonic() - begin, failed=True)
+                continue
+            self.record_call(model, time.monotonic() - begin)
+            return result
+        raise last_error
+
+    def record_call(self, model: str, seconds: float, failed: bool = False):
+        with self._lock:
+            stats = self._model_stats(model)
+            stats["calls"] += 1
+            stats["failures"] += int(failed)
+            stats["latency_seconds"] += seconds
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            by_model = {
+                model: {**stats, "latency_seconds": round(stats["latency_seconds"], 3), "cost_usd": round(stats["cost_usd"], 6)}
+                for model, stats in self.stats.items()
+            }
+            return {
+                "calls": sum(stats["calls"] for stats in self.stats.values()),
+                "escalations": self.escalations,
+                "latency_seconds": round(sum(stats["latency_seconds"] for stats in self.stats.values()), 3),
+                "cost_usd": round(sum(stats["cost_usd"] for stats in self.stats.values()), 6),
+                "by_model": by_model,
+            }
+
+    def print_report(self):
+        report = self.report()
+        print(f"{self.name} 模型调用: {report['calls']} 次，升级 {report['escalations']} 次，"
+              f"耗时 {report['latency_seconds']:.1f} 秒，费用约 ${report['cost_usd']:.4f}")
+        for model, stats in report['by_model'].items():
+            print(f"  {model}: {stats['calls']} 次（失败 {stats['failures']}），"
+                  f"{stats['latency_seconds']:.1f} 秒，${stats['cost_usd']:.4f}")
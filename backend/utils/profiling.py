@@ -0,0 +1,181 @@
+import os
+import re
+import sys
+import json
+import time
+import pstats
+import cProfile
+import contextlib
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+# resource 只在类 Unix 系统上可用，没有时不报告 RSS
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_PROFILE_DIR = os.path.join('data', 'output', 'profile')
+# 报告中每个阶段列出的分配位置和函数个数
+TOP_ALLOCATIONS = 15
+TOP_FUNCTIONS = 15
+# 分配统计忽略 tracemalloc 自己和导入机制
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程到目前为止的最大常驻内存（MB）；Linux 上 ru_maxrss 单位是 KB，macOS 上是字节"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+class Profiler:
+    """
+    按阶段的性能分析：每个阶段一个 cProfile（同名阶段多次进入时累积），
+    并用 tracemalloc 记录阶段内的内存峰值和新增分配最多的代码位置
+    - 阶段可以嵌套，内层阶段运行时外层的 cProfile 暂停，函数耗时只算在内层；墙钟时间外层包含内层
+    - cProfile 只分析进入阶段的线程，线程池里的调用（例如 OCR 引擎池、LLM 对冲请求）不在调用统计中，
+      但它们的内存分配仍计入 tracemalloc
+    - finish() 写出每个阶段的 .prof 文件（可用 pstats 或 snakeviz 查看）和汇总的 report.json
+    """
+    def __init__(self, out_dir: str = DEFAULT_PROFILE_DIR, top: int = TOP_ALLOCATIONS):
+        self.out_dir = out_dir
+        self.top = top
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.stack: List[Dict[str, Any]] = []
+        self.started_tracing = False
+        self.begin = time.perf_counter()
+
+    def start(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.begin = time.perf_counter()
+
+    def _record(self, name: str) -> Dict[str, Any]:
+        return self.stages.setdefault(name, {
+            "profile": cProfile.Profile(), "calls": 0, "seconds": 0.0,
+            "peak_traced": 0, "rss_growth_mb": 0.0, "allocations": {}
+        })
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        record = self._record(name)
+        if self.stack:
+            outer = self.stack[-1]
+            self.stages[outer["name"]]["profile"].disable()
+            outer["peak"] = max(outer["peak"], tracemalloc.get_traced_memory()[1])
+        frame = {"name": name, "peak": 0}
+        self.stack.append(frame)
+        rss_before = peak_rss_mb()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        begin = time.perf_counter()
+        record["profile"].enable()
+        try:
+            yield
+        finally:
+            record["profile"].disable()
+            seconds = time.perf_counter() - begin
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            after = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            for diff in after.compare_to(before, 'lineno'):
+                if diff.size_diff > 0:
+                    site = str(diff.traceback)
+                    size, count = record["allocations"].get(site, (0, 0))
+                    record["allocations"][site] = (size + diff.size_diff, count + diff.count_diff)
+            record["calls"] += 1
+            record["seconds"] += seconds
+            record["peak_traced"] = max(record["peak_traced"], peak)
+            if rss_before is not None:
+                record["rss_growth_mb"] += peak_rss_mb() - rss_before
+            self.stack.pop()
+            tracemalloc.reset_peak()
+            if self.stack:
+                outer = self.stack[-1]
+                outer["peak"] = max(outer["peak"], peak)
+                self.stages[outer["name"]]["profile"].enable()
+
+    def _top_functions(self, stats: pstats.Stats) -> List[Dict[str, Any]]:
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+        return [
+            {"function": f"{file}:{line}({function})", "calls": calls,
+             "own_seconds": round(own, 4), "cumulative_seconds": round(cumulative, 4)}
+            for (file, line, function), (_, calls, own, cumulative, _) in rows
+        ]
+
+    def finish(self) -> Dict[str, Any]:
+        """写出每个阶段的 pstats 文件和 report.json，返回报告"""
+        report = {"seconds": round(time.perf_counter() - self.begin, 3), "peak_rss_mb": peak_rss_mb(), "stages": {}}
+        for index, (name, record) in enumerate(self.stages.items(), start=1):
+            safe_name = re.sub(r'[^\w.-]+', '_', name)
+            stats_file = os.path.join(self.out_dir, f"{index:02d}_{safe_name}.prof")
+            try:
+                stats = pstats.Stats(record["profile"])
+            except TypeError:
+                # 阶段内没有任何 Python 调用
+                stats, stats_file = None, None
+            if stats is not None:
+                stats.dump_stats(stats_file)
+            allocations = sorted(record["allocations"].items(), key=lambda item: item[1][0], reverse=True)[:self.top]
+            report["stages"][name] = {
+                "calls": record["calls"],
+                "seconds": round(record["seconds"], 3),
+                "peak_traced_mb": round(record["peak_traced"] / 1024 / 1024, 2),
+                "rss_growth_mb": round(record["rss_growth_mb"], 2),
+                "pstats_file": stats_file,
+                "top_functions": self._top_functions(stats) if stats is not None else [],
+                "top_allocations": [
+                    {"site": site, "size_kb": round(size / 1024, 1), "count": count}
+                    for site, (size, count) in allocations
+                ],
+            }
+        with open(os.path.join(self.out_dir, 'report.json'), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        if self.started_tracing:
+            tracemalloc.stop()
+        return report
+
+
+def print_report(report: Dict[str, Any], out_dir: str):
+    rss = f"{report['peak_rss_mb']:.1f} MB" if report['peak_rss_mb'] is not None else '未知'
+    print(f"\n性能分析: 共 {report['seconds']:.1f} 秒，进程最大常驻内存 {rss}，报告: {os.path.join(out_dir, 'report.json')}")
+    for name, stage in report['stages'].items():
+        print(f"  {name}: {stage['calls']} 次，{stage['seconds']:.2f} 秒，"
+              f"内存峰值 {stage['peak_traced_mb']:.1f} MB，RSS 增长 {stage['rss_growth_mb']:.1f} MB")
+        for allocation in stage['top_allocations'][:3]:
+            print(f"      {allocation['size_kb']:>10.1f} KB  {allocation['site']}")
+
+
+_active: Optional[Profiler] = None
+
+
+def start_profiling(out_dir: str = DEFAULT_PROFILE_DIR) -> Profiler:
+    global _active
+    _active = Profiler(out_dir)
+    _active.start()
+    return _active
+
+
+def stage(name: str):
+    """流程代码中标记阶段；没有开启性能分析时什么也不做"""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
+
+
+def finish_profiling() -> Optional[Dict[str, Any]]:
+    global _active
+    if _active is None:
+        return None
+    profiler, _active = _active, None
+    report = profiler.finish()
+    print_report(report, profiler.out_dir)
+    return report
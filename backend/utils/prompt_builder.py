@@ -0,0 +1,124 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+# 可选：安装了 tiktoken 时按模型的分词器精确计数，否则按字符估算
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('cl100k_base')
+except ImportError:
+    _encoding = None
+
+# 每次调用的 token 上限（固定前缀 + 本次内容），超出时先去掉上下文，仍超出则报错
+PROMPT_BUDGETS = {
+    'count_rows': 6000,
+    'parse_section': 6000,
+    'size_extractor': 4000,
+    'ocr_correction': 8000,
+    # 整篇交给 Gemini 纠错时内容就是全文，只防止异常大的输入
+    'ocr_full_correction': 200000,
+}
+DEFAULT_BUDGET = 8000
+# OpenAI 只缓存至少 1024 个 token 的相同前缀，短于此的前缀不计入可缓存的 token
+CACHEABLE_PREFIX_MIN_TOKENS = 1024
+
+
+class PromptBudgetExceeded(ValueError):
+    pass
+
+
+def count_tokens(text: str) -> int:
+    """本地计算 token 数：有 tiktoken 时精确计数，否则中文字符约1个token，其他字符约4个一个token"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    cjk = sum(1 for char in text if ord(char) > 0x2e80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def first_line(text: Optional[str]) -> str:
+    """上下文只取第一行非空内容，例如下一部分的起始针数"""
+    for line in (text or '').split('\n'):
+        if line.strip():
+            return line.strip()
+    return ''
+
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def prompt_stats() -> Dict[str, Dict[str, int]]:
+    with _stats_lock:
+        return {stage: dict(stats) for stage, stats in _stats.items()}
+
+
+def reset_prompt_stats(*stages: str):
+    """清空指定阶段的统计，不传阶段时全部清空"""
+    with _stats_lock:
+        for stage in stages or list(_stats):
+            _stats.pop(stage, None)
+
+
+def print_prompt_stats(*stages: str):
+    for stage, stats in prompt_stats().items():
+        if stages and stage not in stages:
+            continue
+        print(f"{stage} 提示词: {stats['calls']} 次，共 {stats['prompt_tokens']} token"
+              f"（固定前缀 {stats['prefix_tokens']}），省下 {stats['saved_tokens']} token："
+              f"上下文裁剪 {stats['trimmed_tokens']}，可缓存前缀 {stats['cached_prefix_tokens']}")
+
+
+class PromptBuilder:
+    """
+    各阶段共用的提示词构建：
+    - 规则、示例等不变的说明作为固定前缀（system 消息或文本开头），每次调用完全相同，可被服务端前缀缓存复用
+    - 每次变化的内容放在前缀之后；上下文只放真正需要的片段（例如下一部分的第一行）
+    - 每次调用按本地计数检查 token 预算，并按阶段统计 token 用量和省下的 token
+    """
+    def __init__(self, stage: str, prefix: str, budget: Optional[int] = None):
+        self.stage = stage
+        self.prefix = prefix.strip()
+        self.prefix_tokens = count_tokens(self.prefix)
+        self.budget = budget or PROMPT_BUDGETS.get(stage, DEFAULT_BUDGET)
+
+    def build(self, content: str, context: str = '', full_context: str = '', full_content: str = '') -> str:
+        """
+        返回前缀之后的可变部分
+        context 为实际放入的上下文片段；full_context、full_content 为不裁剪时会放入的完整上下文和内容，只用于统计省下的 token
+        """
+        content_tokens = count_tokens(content)
+        context_tokens = count_tokens(context)
+        if context and self.prefix_tokens + content_tokens + context_tokens > self.budget:
+            print(f"{self.stage}: 提示词超出 {self.budget} token 预算，去掉上下文")
+            context, context_tokens = '', 0
+        total = self.prefix_tokens + content_tokens + context_tokens
+        if total > self.budget:
+            raise PromptBudgetExceeded(f"{self.stage}: 提示词 {total} token，超出 {self.budget} token 预算")
+
+        trimmed = max(0, count_tokens(full_context) - context_tokens) if full_context else 0
+        trimmed += max(0, count_tokens(full_content) - content_tokens) if full_content else 0
+        with _stats_lock:
+            stats = _stats.setdefault(self.stage, {
+                "calls": 0, "prompt_tokens": 0, "prefix_tokens": self.prefix_tokens,
+                "trimmed_tokens": 0, "cached_prefix_tokens": 0, "saved_tokens": 0
+            })
+            # 第一次调用之后，相同的前缀可以命中服务端缓存
+            cached = self.prefix_tokens if stats["calls"] and self.prefix_tokens >= CACHEABLE_PREFIX_MIN_TOKENS else 0
+            stats["calls"] += 1
+            stats["prompt_tokens"] += total
+            stats["trimmed_tokens"] += trimmed
+            stats["cached_prefix_tokens"] += cached
+            stats["saved_tokens"] += trimmed + cached
+        return f"{content}\n\n{context}" if context else content
+
+    def messages(self, content: str, **kwargs) -> List[Dict[str, Any]]:
+        """聊天接口的消息：固定前缀作为 system 消息"""
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": self.build(content, **kwargs)}
+        ]
+
+    def text(self, content: str, **kwargs) -> str:
+        """单段文本的提示词（Gemini）：固定前缀在最前面"""
+        return f"{self.prefix}\n\n{self.build(content, **kwargs)}"
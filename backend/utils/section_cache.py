@@ -0,0 +1,73 @@
+import os
+import json
+import hashlib
+import tempfile
+from typing import Dict, Any, Optional
+
+MANIFEST_VERSION = 1
+
+
+def section_hash(section: Dict[str, str], namespace: str = '') -> str:
+    """部分的内容哈希：标题和内容都参与计算，namespace 区分不同的处理方式"""
+    key = f"{namespace}\0{section.get('title', '')}\0{section.get('content', '')}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class SectionCache:
+    """
+    按部分内容哈希缓存处理结果，并持久化成 manifest 文件
+    图解只改了一个部分时，其余部分的哈希不变，直接复用上一次的结果；
+    save() 只保留本次用到的条目，删掉的部分不会一直留在 manifest 里
+    """
+    def __init__(self, manifest_file: str, namespace: str = ''):
+        self.manifest_file = manifest_file
+        self.namespace = namespace
+        self.entries = self._load()
+        self.used: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"读取 manifest 出错，将重新处理所有部分: {e}")
+            return {}
+        if manifest.get('version') != MANIFEST_VERSION or manifest.get('namespace') != self.namespace:
+            return {}
+        return manifest.get('sections', {})
+
+    def get(self, section: Dict[str, str]) -> Optional[Any]:
+        """返回该部分上一次的结果，没有则返回 None"""
+        key = section_hash(section, self.namespace)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used[key] = entry
+        return entry['result']
+
+    def put(self, section: Dict[str, str], result: Any):
+        key = section_hash(section, self.namespace)
+        entry = {"title": section.get('title', ''), "result": result}
+        self.entries[key] = entry
+        self.used[key] = entry
+
+    def save(self):
+        """原子地写回 manifest（只包含本次用到的部分）"""
+        manifest = {"version": MANIFEST_VERSION, "namespace": self.namespace, "sections": self.used}
+        directory = os.path.dirname(self.manifest_file) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.manifest_file)
+        except Exception:
+            os.unlink(temp_file)
+            raise
+        print(f"复用 {self.hits} 个未修改的部分，重新处理 {self.misses} 个部分")
@@ -0,0 +1,118 @@
+// 计数器跨设备同步：优先使用 SSE，浏览器不支持或连续连接失败时退回长轮询
+// 每次只推送一个部分的增量，断线后通过 last-event-id 续传，落后太多时服务端发送快照
+const DEVICE_KEY = 'counterDeviceId'
+const LAST_EVENT_KEY = 'counterLastEventId'
+const MAX_SSE_FAILURES = 3
+const POLL_RETRY_MS = 3000
+
+function getDeviceId() {
+  let deviceId = localStorage.getItem(DEVICE_KEY)
+  if (!deviceId) {
+    deviceId = Math.random().toString(36).slice(2) + Date.now().toString(36)
+    localStorage.setItem(DEVICE_KEY, deviceId)
+  }
+  return deviceId
+}
+
+const USER_KEY = 'counterUserId'
+
+// 同步用户：链接里的 ?user=xxx 优先并记住，在其他设备上打开同样的链接即可同步；
+// 没有时为这个浏览器生成一个
+export function getUserId() {
+  const fromUrl = new URLSearchParams(window.location.search).get('user')
+  if (fromUrl) localStorage.setItem(USER_KEY, fromUrl)
+  let userId = localStorage.getItem(USER_KEY)
+  if (!userId) {
+    userId = Math.random().toString(36).slice(2) + Date.now().toString(36)
+    localStorage.setItem(USER_KEY, userId)
+  }
+  return userId
+}
+
+export function createCounterSync({ patternId, userId, onDelta, onSnapshot }) {
+  if (!patternId || !userId) throw new Error('计数器同步需要 patternId 和 userId')
+  const base = `/api/counter/${encodeURIComponent(patternId)}/${encodeURIComponent(userId)}`
+  const storageKey = `${LAST_EVENT_KEY}:${patternId}:${userId}`
+  const deviceId = getDeviceId()
+  let lastEventId = localStorage.getItem(storageKey)
+  let source = null
+  let stopped = false
+  let failures = 0
+
+  function remember(id) {
+    if (id === undefined || id === null || id === '') return
+    lastEventId = String(id)
+    localStorage.setItem(storageKey, lastEventId)
+  }
+
+  function handleDelta(id, delta) {
+    remember(id)
+    // 自己发出的增量不用再应用一次
+    if (delta.device !== deviceId) onDelta(delta)
+  }
+
+  function query() {
+    return lastEventId ? `?last_event_id=${encodeURIComponent(lastEventId)}` : ''
+  }
+
+  function startSSE() {
+    // 重连时浏览器会自动带上 Last-Event-ID 请求头，服务端优先使用它
+    source = new EventSource(`${base}/events${query()}`)
+    source.onmessage = event => {
+      failures = 0
+      handleDelta(event.lastEventId, JSON.parse(event.data))
+    }
+    source.addEventListener('snapshot', event => {
+      failures = 0
+      remember(event.lastEventId)
+      onSnapshot(JSON.parse(event.data))
+    })
+    source.onerror = () => {
+      failures++
+      if (failures >= MAX_SSE_FAILURES) {
+        source.close()
+        source = null
+        startPolling()
+      }
+    }
+  }
+
+  async function startPolling() {
+    while (!stopped) {
+      try {
+        const response = await fetch(`${base}/poll${query()}`)
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`)
+        const data = await response.json()
+        if (data.snapshot) onSnapshot(data.snapshot)
+        data.events.forEach(event => handleDelta(event.id, event.delta))
+        remember(data.last_event_id)
+      } catch (err) {
+        console.error('计数器同步错误:', err)
+        await new Promise(resolve => setTimeout(resolve, POLL_RETRY_MS))
+      }
+    }
+  }
+
+  function publish(delta) {
+    return fetch(base, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json'
+      },
+      body: JSON.stringify({ ...delta, device: deviceId })
+    }).catch(err => console.error('计数器同步发布失败:', err))
+  }
+
+  function stop() {
+    stopped = true
+    if (source) source.close()
+  }
+
+  if (window.EventSource) {
+    startSSE()
+  } else {
+    startPolling()
+  }
+
+  return { publish, stop }
+}
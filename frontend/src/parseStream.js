@@ -0,0 +1,29 @@
+// 流式解析一个部分：本地能算的行立即到达，其余行随 LLM 的输出逐行到达
+// 事件：row（新的一行）、reset（改用普通请求，之前的 LLM 行作废）、done（完整结果，按行号排好序）
+export function streamSectionRows(index, { onRow, onReset, onDone, onError }) {
+  const source = new EventSource(`/api/sections/${index}/parse/stream`)
+  let finished = false
+
+  function close() {
+    finished = true
+    source.close()
+  }
+
+  source.addEventListener('row', event => {
+    const data = JSON.parse(event.data)
+    onRow(data.row, data.source)
+  })
+  source.addEventListener('reset', () => onReset())
+  source.addEventListener('done', event => {
+    // 结束后关闭连接，否则 EventSource 会自动重连并重新解析
+    close()
+    onDone(JSON.parse(event.data).result)
+  })
+  source.onerror = err => {
+    if (finished) return
+    close()
+    onError(err)
+  }
+
+  return { close }
+}
@@ -0,0 +1,7 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+# 测试直接按 backend 目录下的模块名导入
+sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,41 @@
+from utils.checkpoint import Checkpoint, fingerprint
+
+
+def test_resume_skips_recorded_units(tmp_path):
+    journal = str(tmp_path / 'run.journal')
+    run_key = fingerprint(['第 1行: 上针'])
+
+    checkpoint = Checkpoint(journal, run_key)
+    checkpoint.record('0:折叠边', {"row_count": 1})
+    checkpoint.record('1:蕾丝花样', {"row_count": 8})
+
+    resumed = Checkpoint(journal, run_key)
+    assert resumed.done('0:折叠边') and resumed.done('1:蕾丝花样')
+    assert resumed.get('1:蕾丝花样') == {"row_count": 8}
+
+    # resume=False 忽略已有记录
+    assert not Checkpoint(journal, run_key, resume=False).done('0:折叠边')
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    journal = tmp_path / 'run.journal'
+    checkpoint = Checkpoint(str(journal), 'key')
+    checkpoint.record('page-1', '第一页')
+    # 模拟写到一半崩溃
+    with open(journal, 'a', encoding='utf-8') as f:
+        f.write('{"unit": "page-2", "res')
+
+    resumed = Checkpoint(str(journal), 'key')
+    assert resumed.results == {'page-1': '第一页'}
+    resumed.record('page-2', '第二页')
+    assert Checkpoint(str(journal), 'key').results == {'page-1': '第一页', 'page-2': '第二页'}
+
+
+def test_changed_input_starts_over(tmp_path):
+    journal = str(tmp_path / 'run.journal')
+    Checkpoint(journal, fingerprint(['旧内容'])).record('page-1', '第一页')
+
+    checkpoint = Checkpoint(journal, fingerprint(['新内容']))
+    assert not checkpoint.done('page-1')
+    checkpoint.clear()
+    assert not (tmp_path / 'run.journal').exists()
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('click')
+
+from conftest import BACKEND_DIR
+
+
+def test_help_does_not_import_heavy_dependencies():
+    code = (
+        "import sys, cli\n"
+        "sys.argv = ['cli.py', '--help']\n"
+        "try:\n"
+        "    cli.cli()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('HEAVY:' + ','.join(m for m in ['openai', 'google.genai', 'pytesseract', 'dotenv', 'PIL', 'flask'] if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert 'count-rows' in result.stdout
+    assert result.stdout.strip().splitlines()[-1] == 'HEAVY:'
+
+
+def test_config_import_has_no_side_effects(tmp_path):
+    code = "import utils.config as c; print(c.config.config_dir.exists())"
+    env = {'HOME': str(tmp_path), 'PATH': ''}
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
+
+
+def test_ocr_command_turns_on_selective_correction(monkeypatch, tmp_path):
+    for module in ('dotenv', 'PIL', 'tqdm'):
+        pytest.importorskip(module)
+    from click.testing import CliRunner
+    import cli
+    import inspect
+    from ocr import image_to_text
+
+    # 函数本身保持原来的默认值（全文纠错），只有命令行默认开启
+    assert inspect.signature(image_to_text.images_to_text).parameters['selective'].default is False
+    calls = []
+    monkeypatch.setattr(image_to_text, 'images_to_text', lambda image_dir, **kwargs: calls.append(kwargs['selective']))
+    runner = CliRunner()
+    assert runner.invoke(cli.cli, ['ocr', str(tmp_path)]).exit_code == 0
+    assert runner.invoke(cli.cli, ['ocr', str(tmp_path), '--full-correction']).exit_code == 0
+    assert calls == [True, False]
@@ -0,0 +1,30 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip('dotenv')
+
+from conftest import BACKEND_DIR
+from count_rows import check_row_count
+from search_index import split_sections
+
+DATA_DIR = os.path.join(BACKEND_DIR, 'data')
+
+
+def test_section_without_row_numbers_may_return_null_range():
+    content = "选项一: 朱迪的魔术起针法\n用 3. 5mm 环针，起 406针\n工作纱线在右手，织 1行上针，(见“折叠边”)\n"
+    check_row_count({"row_count": 0, "start_row": None, "end_row": None}, content)
+    with pytest.raises(ValueError):
+        check_row_count({"row_count": 0, "start_row": None, "end_row": None}, "第 1行: 上针\n")
+    with pytest.raises(ValueError):
+        check_row_count({"row_count": 3, "start_row": 30, "end_row": 32}, "第 9到20行: 下针\n")
+
+
+def test_stored_row_counts_pass_the_check():
+    with open(os.path.join(DATA_DIR, 'processed', 'extracted_sizes.txt'), 'r', encoding='utf-8') as f:
+        contents = {section['title']: section['content'] for section in split_sections(f.read())}
+    with open(os.path.join(DATA_DIR, 'output', 'row_counts.json'), 'r', encoding='utf-8') as f:
+        sections = json.load(f)['sections']
+    for section in sections:
+        check_row_count(section, contents[section['section_title']])
@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from counter_sync import CounterHub, format_sse, sse_stream
+
+
+def test_resume_from_last_event_id_and_snapshot_when_too_old():
+    hub = CounterHub(buffer_size=3)
+    for current in range(1, 6):
+        hub.publish('背心', 'alice', {'section_id': 'section-1', 'current': current, 'extra': 'x'})
+    channel = hub.channel('背心', 'alice')
+
+    events, snapshot = channel.since(3)
+    assert [event['id'] for event in events] == [4, 5] and snapshot is None
+    assert events[0]['delta'] == {'section_id': 'section-1', 'current': 4}
+
+    # 缓冲区只剩 3..5，更早的 id 或服务重启前的 id 都只能拿快照
+    for last_id in (1, 99):
+        events, snapshot = channel.since(last_id)
+        assert events == [] and snapshot == {'id': 5, 'state': {'section-1': {'section_id': 'section-1', 'current': 5}}}
+    assert hub.channel('背心', 'bob').since(0) == ([], None)
+
+
+def test_publish_rejects_invalid_section_id():
+    hub = CounterHub()
+    for delta in ({'current': 3}, {'section_id': ['section-1']}, {'section_id': 3}):
+        with pytest.raises(ValueError):
+            hub.publish('背心', 'alice', delta)
+    assert hub.channel('背心', 'alice').last_id == 0
+
+
+def test_wait_wakes_idle_subscribers():
+    hub = CounterHub()
+    channel = hub.channel('背心', 'alice')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(channel.wait(0, 5))) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    hub.publish('背心', 'alice', {'section_id': 'section-2', 'current': 3})
+    for thread in threads:
+        thread.join()
+    assert len(results) == 20 and all(events[0]['id'] == 1 for events, _ in results)
+
+
+def test_sse_stream_resumes_after_last_event_id():
+    hub = CounterHub()
+    for current in (1, 2):
+        hub.publish('背心', 'alice', {'section_id': 'section-1', 'current': current})
+    stream = sse_stream(hub.channel('背心', 'alice'), 1, heartbeat=0.01)
+    assert next(stream).startswith('retry:')
+    assert next(stream) == 'id: 2\ndata: {"section_id": "section-1", "current": 2}\n\n'
+    assert next(stream) == ': heartbeat\n\n'
+    assert format_sse([], {'id': 2, 'state': {}}) == 'id: 2\nevent: snapshot\ndata: {}\n\n'
+
+
+def test_endpoints_under_many_idle_connections():
+    """真实服务器上的负载测试：大量空闲的长轮询和 SSE 连接挂着时，发布仍然及时送达每个连接"""
+    pytest.importorskip('flask')
+    import http.client
+    import json
+    import time
+    import urllib.request
+    from werkzeug.serving import make_server
+    from main import app
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}/api/counter/load-test/alice'
+    poll_results, sse_results = [], []
+
+    def poll():
+        with urllib.request.urlopen(f'{base}/poll?last_event_id=0&timeout=20', timeout=30) as response:
+            poll_results.append(json.loads(response.read()))
+
+    def listen():
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=30)
+        conn.request('GET', '/api/counter/load-test/alice/events', headers={'Last-Event-ID': '0'})
+        response = conn.getresponse()
+        while True:
+            line = response.readline().decode('utf-8')
+            if line.startswith('data: '):
+                sse_results.append(json.loads(line[len('data: '):]))
+                break
+        conn.close()
+
+    try:
+        clients = [threading.Thread(target=poll) for _ in range(100)] + \
+                  [threading.Thread(target=listen) for _ in range(50)]
+        for client in clients:
+            client.start()
+        time.sleep(0.5)
+
+        # 所有连接都挂起时，发布请求不会被饿死
+        begin = time.monotonic()
+        request = urllib.request.Request(
+            base, data=json.dumps({'section_id': 'section-1', 'current': 7}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            assert json.loads(response.read()) == {'id': 1}
+        for client in clients:
+            client.join(10)
+        elapsed = time.monotonic() - begin
+    finally:
+        server.shutdown()
+
+    assert len(poll_results) == 100 and all(result['events'][0]['id'] == 1 for result in poll_results)
+    assert sse_results == [{'section_id': 'section-1', 'current': 7}] * 50
+    assert elapsed < 5
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from utils.hedged_llm import DeadlineExceeded, HedgedCaller, LatencyHistogram
+
+
+def make_request(delays):
+    """第 i 次调用等待 delays[i] 秒后返回 i"""
+    lock = threading.Lock()
+    calls = []
+
+    def request(timeout):
+        with lock:
+            index = len(calls)
+            calls.append(timeout)
+        time.sleep(delays[index])
+        return index
+    return request, calls
+
+
+def test_slow_request_is_hedged():
+    caller = HedgedCaller('test', deadline=5, default_hedge_delay=0.05)
+    request, calls = make_request([2, 0])
+    start = time.monotonic()
+    assert caller.call(request, lambda response: response) == 1
+    assert time.monotonic() - start < 1
+    report = caller.report()
+    assert (report['hedged'], report['hedge_wins'], report['samples']) == (1, 1, 1)
+
+
+def test_invalid_response_is_retried():
+    caller = HedgedCaller('test', deadline=5, default_hedge_delay=5)
+
+    def parse(response):
+        if response == 0:
+            raise ValueError('无效的JSON')
+        return response
+
+    request, calls = make_request([0, 0])
+    assert caller.call(request, parse) == 1
+    assert caller.report()['errors'] == 1
+
+
+def test_deadline():
+    caller = HedgedCaller('test', deadline=0.2, default_hedge_delay=0.05)
+    request, calls = make_request([1, 1])
+    with pytest.raises(DeadlineExceeded):
+        caller.call(request, lambda response: response)
+    # 每个请求拿到的超时不超过剩余时间
+    assert all(timeout <= 0.2 for timeout in calls)
+
+
+def test_histogram_percentile_and_stats_file(tmp_path):
+    histogram = LatencyHistogram()
+    for seconds in [0.5] * 9 + [30]:
+        histogram.record(seconds)
+    assert histogram.percentile(0.5) < 1 < 25 < histogram.percentile(0.99)
+
+    stats_file = str(tmp_path / 'llm_latency.json')
+    caller = HedgedCaller('count_rows', stats_file=stats_file)
+    caller.call(lambda timeout: 'ok', lambda response: response)
+    caller.save_stats()
+    HedgedCaller('parse_section', stats_file=stats_file).save_stats()
+    assert HedgedCaller('count_rows', stats_file=stats_file).latency.total == 1
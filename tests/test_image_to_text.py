@@ -0,0 +1,42 @@
+import pytest
+
+for module in ('dotenv', 'PIL', 'tqdm'):
+    pytest.importorskip(module)
+
+from ocr import image_to_text
+
+
+def test_failed_page_is_corrected_after_resume(tmp_path, monkeypatch):
+    pages = []
+    for name in ('page_01.png', 'page_02.png'):
+        path = tmp_path / name
+        path.write_bytes(b'')
+        pages.append(str(path))
+    failing = {pages[1]}
+    corrected = []
+
+    def fake_pages(image_dir, use_layout=True, skip=None, engine=None, with_confidence=False):
+        for path in pages:
+            if path in (skip or set()) or path in failing:
+                continue
+            yield path, f"第{pages.index(path) + 1}页"
+
+    def fake_correction(text, client):
+        corrected.append(text)
+        return f"纠错后:\n{text}"
+
+    monkeypatch.setattr(image_to_text, 'ROOT_DIR', str(tmp_path))
+    monkeypatch.setattr(image_to_text, 'setup_gemini', lambda: None)
+    monkeypatch.setattr(image_to_text, 'iter_page_texts', fake_pages)
+    monkeypatch.setattr(image_to_text, 'process_text_with_gemini', fake_correction)
+
+    # 第一次第2页识别失败：纠错结果不记录，断点日志保留
+    assert image_to_text.images_to_text(str(tmp_path), selective=False) == "纠错后:\n第1页"
+    journal = tmp_path / 'data' / 'processed' / 'images_to_text.journal'
+    assert journal.exists()
+
+    # 重跑时只识别第2页，并用完整的文本重新纠错
+    failing.clear()
+    assert image_to_text.images_to_text(str(tmp_path), selective=False) == "纠错后:\n第1页\n\n第2页"
+    assert corrected == ["第1页", "第1页\n\n第2页"]
+    assert not journal.exists()
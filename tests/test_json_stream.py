@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from parser.json_stream import RowStreamParser
+
+RESPONSE = '```json\n' + json.dumps({
+    "section_title": "蕾丝花样",
+    "rows": [
+        {"type": "row", "row_number": 9, "instruction": "3下, 【左上2并1, 空加针】重复到最后{注意\\\"花样\\\"}",
+         "stitch_repeat": [{"repeat": 3, "stitches": [{"stitch_type": "左上2并1"}, {"stitch_type": "空加针"}]}]},
+        {"type": "meta", "instruction": "换成 4mm 环针"},
+        {"type": "row", "row_number": 10, "instruction": "上针", "stitch_repeat": []},
+    ]
+}, ensure_ascii=False, indent=2) + '\n```'
+
+
+def test_rows_are_emitted_as_soon_as_they_close():
+    parser = RowStreamParser()
+    emitted = []
+    for i, char in enumerate(RESPONSE):
+        for row in parser.feed(char):
+            emitted.append((i, row))
+
+    expected = json.loads(RESPONSE[RESPONSE.index('{'):RESPONSE.rindex('}') + 1])
+    assert [row for _, row in emitted] == expected['rows']
+    # 第一行在它的右括号到达时就产出，而不是等到整个响应结束
+    assert emitted[0][0] < RESPONSE.index('"meta"')
+    assert parser.result() == expected
+
+
+def test_nested_rows_key_and_chunk_boundaries():
+    text = '{"rows": [{"type": "row", "row_number": 1, "extra": {"rows": [1, 2]}}], "note": "}"}'
+    parser = RowStreamParser()
+    rows = parser.feed(text[:20]) + parser.feed(text[20:])
+    assert rows == [{"type": "row", "row_number": 1, "extra": {"rows": [1, 2]}}]
+    assert parser.result()["note"] == "}"
+
+
+def test_incomplete_response():
+    parser = RowStreamParser()
+    assert parser.feed('{"rows": [{"type": "row", "row_number": 1}, {"type": "ro') == [{"type": "row", "row_number": 1}]
+    with pytest.raises(ValueError):
+        parser.result()
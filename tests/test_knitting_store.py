@@ -0,0 +1,34 @@
+from parser.knitting_store import KnittingStore, save_knitting_data, load_knitting_data
+
+
+PATTERN_JSON = {
+    "sections": [
+        {"section_title": "衣身", "rows": []},
+        {"section_title": "折叠边", "start_row": 1, "end_row": 2, "rows": [
+            {"type": "meta", "instruction": "起 406针"},
+            {"type": "row", "row_number": 1, "instruction": "第 1行: 上针", "stitches_per_row": 406,
+             "stitch_repeat": [{"repeat": 1, "stitches": [{"stitch_type": "上针"}]}]},
+            {"type": "row", "row_number": "2", "instruction": "第 2行: 下针", "note": None},
+        ]},
+    ],
+    "total_rows": 2
+}
+
+
+def test_round_trip_and_lazy_section(tmp_path):
+    path = str(tmp_path / 'knitting_data.knit')
+    save_knitting_data(path, "背心", "第 1行: 上针\n第 2行: 下针", PATTERN_JSON)
+    assert load_knitting_data(path) == ("背心", "第 1行: 上针\n第 2行: 下针", PATTERN_JSON)
+
+    with KnittingStore(path) as store:
+        assert store.section_titles() == ["衣身", "折叠边"]
+        index = store.find_section("折叠边")
+        assert store.section_info(index)[:3] == (1, 2, "折叠边")
+        assert store.section(index) == PATTERN_JSON["sections"][1]
+
+
+def test_top_level_pattern_rows(tmp_path):
+    path = str(tmp_path / 'knitting_data.knit')
+    pattern_json = {"total_rows": 1, "pattern": [{"type": "row", "row_number": 1, "instruction": "上针"}]}
+    save_knitting_data(path, "", "", pattern_json)
+    assert load_knitting_data(path) == ("", "", pattern_json)
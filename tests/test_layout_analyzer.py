@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+pytest.importorskip('PIL')
+from PIL import Image, ImageDraw
+
+from conftest import BACKEND_DIR
+from ocr.layout_analyzer import analyze_pages, classify_block, estimate_line_height, find_blocks
+
+REAL_PAGE = os.path.join(BACKEND_DIR, 'data', 'raw', 'imgs', 'page_01.png')
+
+WIDTH, HEIGHT = 400, 800
+
+
+def draw_text_lines(draw, top, count, length):
+    """模拟文字行：每行 10 像素高，行距 6 像素，用竖线模拟字"""
+    for line in range(count):
+        y = top + line * 16
+        for x in range(20, 20 + length, 8):
+            draw.rectangle((x, y, x + 3, y + 9), fill=0)
+
+
+def make_page(path, body_lines, figure=False):
+    image = Image.new('L', (WIDTH, HEIGHT), 255)
+    draw = ImageDraw.Draw(image)
+    # 每页相同的页眉和页脚
+    draw.rectangle((20, 20, 200, 32), fill=0)
+    draw.rectangle((180, 760, 220, 772), fill=0)
+    draw_text_lines(draw, 150, body_lines, 300 - body_lines * 20)
+    if figure:
+        draw.rectangle((50, 400, 350, 600), fill=0)
+    image.save(path)
+    return str(path)
+
+
+def test_find_blocks_splits_on_blank_gaps():
+    profile = [0] * 5 + [0.1] * 10 + [0] * 20 + [0.1] * 10 + [0] * 5
+    assert find_blocks(profile) == [(5, 15), (35, 45)]
+    # 空白少于 gap 行时不切开
+    assert find_blocks([0.1] * 10 + [0] * 5 + [0.1] * 10) == [(0, 25)]
+
+
+def test_classify_block():
+    text = ([0.1] * 10 + [0] * 6) * 5
+    assert classify_block(text, 0, len(text)) is None
+    assert classify_block([0.5] * 50, 0, 50) == "dense"
+    assert classify_block([0.2] * 200, 0, 200) == "figure"
+    assert classify_block([], 3, 3) == "empty"
+
+
+def test_repeated_header_footer_and_figures_are_skipped(tmp_path):
+    paths = [
+        make_page(tmp_path / 'p1.png', 3),
+        make_page(tmp_path / 'p2.png', 5, figure=True),
+        make_page(tmp_path / 'p3.png', 4),
+    ]
+    layouts = analyze_pages(paths)
+    for layout, lines in zip(layouts, (3, 5, 4)):
+        assert layout.size == (WIDTH, HEIGHT)
+        # 正文是一个文字块，覆盖所有文字行
+        assert len(layout.text_blocks) == 1
+        _, top, _, bottom = layout.text_blocks[0]
+        assert top == 150 and abs(bottom - (150 + lines * 16 - 6)) <= 1
+        reasons = [block["reason"] for block in layout.skipped_blocks]
+        assert reasons.count("header_footer") == 2
+    assert [block["reason"] for block in layouts[1].skipped_blocks] == ["header_footer", "dense", "header_footer"]
+    assert layouts[0].to_dict()["text_blocks"] == [list(layouts[0].text_blocks[0])]
+
+
+def test_band_on_single_page_is_kept(tmp_path):
+    paths = [make_page(tmp_path / f'p{i}.png', 3) for i in range(3)]
+    image = Image.open(paths[0])
+    draw = ImageDraw.Draw(image)
+    # 只有第一页页首有的标题不是页眉
+    draw_text_lines(draw, 50, 1, 280)
+    image.save(paths[0])
+    layouts = analyze_pages(paths)
+    assert len(layouts[0].text_blocks) == 2
+    assert len(layouts[1].text_blocks) == 1
+
+
+def test_line_height_scales_with_page():
+    profile = ([0] * 6 + [0.1] * 10) * 20
+    assert estimate_line_height(profile) == 10
+    assert estimate_line_height([0.1 if y % 130 < 100 else 0 for y in range(7000)]) == 100
+    assert estimate_line_height([0] * 50) is None
+
+
+def test_large_scan_keeps_headings_and_text():
+    # 5170x7311 的扫描页：正文行高约100像素，“开始编织”等标题约170像素，不能当成图片跳过
+    layout = analyze_pages([REAL_PAGE])[0]
+    assert layout.size == (5170, 7311)
+    assert not [block for block in layout.skipped_blocks if block["reason"] == "figure"]
+    for top, bottom in [(665, 859), (1022, 1185), (1352, 1526), (2704, 2879)]:
+        assert any(box[1] <= top and bottom <= box[3] for box in layout.text_blocks), (top, bottom)
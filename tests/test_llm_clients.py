@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+from utils.llm_clients import InFlightLimit
+
+
+def test_sync_requests_wait_for_a_slot():
+    limit = InFlightLimit(2)
+    running = []
+    lock = threading.Lock()
+
+    def request():
+        limit.acquire()
+        try:
+            with lock:
+                running.append(limit.stats()["in_flight"])
+            time.sleep(0.05)
+        finally:
+            limit.release()
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = limit.stats()
+    assert max(running) <= 2
+    assert stats["peak"] == 2 and stats["in_flight"] == 0 and stats["waits"] >= 1
+
+
+def test_async_requests_share_the_same_limit():
+    limit = InFlightLimit(1)
+
+    async def request():
+        await limit.acquire_async()
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            limit.release()
+
+    async def main():
+        # 同步请求占着名额时，异步请求等待，被取消也不会占用名额
+        limit.acquire()
+        waiting = asyncio.ensure_future(request())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        waiting.cancel()
+        limit.release()
+        await asyncio.gather(request(), request())
+
+    asyncio.run(main())
+    assert limit.stats() == {"limit": 1, "in_flight": 0, "peak": 1, "waits": 2}
+
+
+def test_acquire_gives_up_after_timeout():
+    limit = InFlightLimit(1)
+    assert limit.acquire(timeout=0.01)
+    begin = time.monotonic()
+    assert not limit.acquire(timeout=0.05)
+    assert time.monotonic() - begin < 1
+    assert not asyncio.run(limit.acquire_async(timeout=0.05))
+    limit.release()
+    assert limit.stats()["in_flight"] == 0
+    assert limit.acquire(timeout=0.01)
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from utils.hedged_llm import HedgedCaller
+from utils.model_router import ModelRouter, difficulty_score
+
+EASY = "第1行: 下针\n第2行: 上针\n"
+HARD = "第3行: 【(左上2并1, 空加针) 3次, 翻面后沿领口挑起, 【1下, 1上】重复到最后】再2次\n" * 10
+
+
+def response(text, prompt_tokens=1000, completion_tokens=100):
+    return SimpleNamespace(
+        text=text,
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    )
+
+
+def test_difficulty_score():
+    easy, hard = difficulty_score(EASY), difficulty_score(HARD)
+    assert easy['nesting'] == 0 and easy['unknown_terms'] == 0
+    assert hard['nesting'] == 2 and hard['unknown_terms'] >= 1
+    assert easy['score'] < 1.5 < hard['score']
+
+
+def test_easy_sections_escalate_only_on_failed_check():
+    router = ModelRouter('test', tiers=['gpt-3.5-turbo', 'gpt-4'], caller=HedgedCaller('test', deadline=5))
+    models = []
+
+    def request(model, timeout):
+        models.append(model)
+        return response('bad' if model == 'gpt-3.5-turbo' else 'ok')
+
+    def parse(resp):
+        if resp.text != 'ok':
+            raise ValueError('未通过校验')
+        return resp.text
+
+    assert router.call(EASY, request, parse) == 'ok'
+    # 同一档模型先重试一次（HedgedCaller），仍未通过才升级
+    assert models == ['gpt-3.5-turbo', 'gpt-3.5-turbo', 'gpt-4']
+    # 难的部分直接从最强的模型开始
+    models.clear()
+    assert router.call(HARD, request, parse) == 'ok'
+    assert models == ['gpt-4']
+
+    report = router.report()
+    assert report['escalations'] == 1
+    assert report['by_model']['gpt-3.5-turbo'] == {
+        "calls": 1, "failures": 1, "latency_seconds": report['by_model']['gpt-3.5-turbo']['latency_seconds'],
+        "prompt_tokens": 2000, "completion_tokens": 200, "cost_usd": 0.0013
+    }
+    assert report['by_model']['gpt-4']['calls'] == 2
+    assert report['cost_usd'] == round(0.0013 + 2 * 0.036, 6)
@@ -0,0 +1,59 @@
+import os
+import json
+from ocr.ocr_post_processor import OCRPostProcessor, TermTrie, process_text, get_processor
+from ocr.correction_dict import CorrectionDictionary
+
+
+def test_term_trie_longest_match():
+    trie = TermTrie({'ab': 'X', 'abc': 'Y', 'b': 'Z'})
+    assert trie.replace('abcab b') == 'YX Z'
+
+    trie.remove('abc')
+    assert trie.replace('abcab b') == 'XcX Z'
+    assert len(trie) == 2
+
+
+def test_process_matches_rule_order():
+    assert process_text('沿领窜共碱了 《3》 次') == '沿领窝共减了 (3) 次'
+    assert process_text('重复 第 5 行一一(12) 针') == '重复第5行一一12(12)针'
+    assert process_text('12 二 15') == '12——15'
+    assert process_text('第1行\n友情提示：请联系微信xx\n第2行') == '第1行\n\n第2行'
+
+
+def test_rule_order_is_remove_number_bracket_context_term():
+    # 括号在上下文规则之前：括号替换出的“二”还会被上下文规则处理；
+    # 术语在上下文规则之后：上下文规则已经处理过的“二”不会再被术语替换
+    processor = OCRPostProcessor(term_mapping={'二': '2'}, remove_patterns=[], number_patterns=[],
+                                 bracket_patterns=[('《', '二')], context_patterns=[(r"(\d+)\s*二\s*(\d+)", r"\1——\2")])
+    assert processor.process('12《15') == '12——15'
+    assert processor.process('第二行') == '第2行'
+
+
+def test_processor_is_cached():
+    assert get_processor() is get_processor()
+
+
+def test_custom_rules():
+    processor = OCRPostProcessor(term_mapping={'人行': '行'}, remove_patterns=[], number_patterns=[],
+                                 bracket_patterns=[], context_patterns=[])
+    assert processor.process('第3人行') == '第3行'
+
+
+def test_badcases_hot_reload(tmp_path):
+    badcase_file = tmp_path / 'badcases.json'
+    badcase_file.write_text(json.dumps([
+        {"wrong": "人行", "correct": "行", "type": "term", "time": "2025-05-11 11:22:46"},
+    ], ensure_ascii=False), encoding='utf-8')
+    dictionary = CorrectionDictionary({'领窜': '领窝'}, str(badcase_file))
+    assert dictionary.replace('领窜第3人行') == '领窝第3行'
+
+    # 新的 badcase 覆盖旧的同名条目，删除的条目不再生效
+    badcase_file.write_text(json.dumps([
+        {"wrong": "领窜", "correct": "领口", "type": "term", "time": "2025-05-12 10:00:00"},
+    ], ensure_ascii=False), encoding='utf-8')
+    os.utime(badcase_file, ns=(0, 10 ** 18))
+    assert dictionary.replace('领窜第3人行') == '领口第3人行'
+
+    dictionary.add_badcase('碱了', '减了')
+    assert dictionary.replace('碱了') == '减了'
+    assert len(json.loads(badcase_file.read_text(encoding='utf-8'))) == 2
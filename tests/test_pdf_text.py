@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+from ocr.pdf_text import remove_repeated_lines
+
+
+def test_headers_and_page_numbers_are_removed():
+    pages = [f"编织图解\n第 {n}行: 下针\n正文 {n}\n第 {n + 1}行: 上针\n- {n} -" for n in range(1, 5)]
+    assert remove_repeated_lines(pages) == [f"第 {n}行: 下针\n正文 {n}\n第 {n + 1}行: 上针" for n in range(1, 5)]
+
+
+def test_repeated_instructions_are_kept():
+    pages = [
+        "奇数行: 上针\n第 2行: 下针\n中间内容\n奇数行: 上针\n第 2行: 下针",
+        "奇数行: 上针\n第 4行: 下针\n中间内容\n第 2行: 下针",
+        "奇数行: 上针\n第 6行: 下针\n中间内容\n第 2行: 下针",
+    ]
+    assert remove_repeated_lines(pages) == pages
+
+
+def test_lines_repeated_only_in_the_body_are_kept():
+    parts = ["前片", "后片", "袖子", "领口"]
+    pages = [f"页眉\n{part}开始\n右侧同样织\n对折\n{part}结束\n页脚" for part in parts]
+    assert remove_repeated_lines(pages) == [f"{part}开始\n右侧同样织\n对折\n{part}结束" for part in parts]
+
+
+def test_minority_and_short_documents_are_untouched():
+    pages = ["图解说明\nA", "图解说明\nB", "C\nD", "E\nF", "G\nH"]
+    assert remove_repeated_lines(pages) == pages
+    assert remove_repeated_lines(["页眉\nA", "页眉\nB"]) == ["页眉\nA", "页眉\nB"]
+
+
+def test_ocr_stack_is_imported_only_when_needed():
+    # 文字版PDF不需要OCR，导入 pdf_text 时不加载 image_to_text（以及 Tesseract、Gemini 等依赖）
+    code = "import sys, ocr.pdf_text; assert 'ocr.image_to_text' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, check=True)
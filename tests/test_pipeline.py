@@ -0,0 +1,105 @@
+import os
+
+from conftest import BACKEND_DIR
+from pipeline import StreamingPipeline, BracketCarry, SectionStream, RepeatedLineFilter
+from parser.size_extractor import SizeExtractor
+
+PROCESSED_TEXT = os.path.join(BACKEND_DIR, '..', 'data', 'processed', 'all_processed_text.txt')
+
+
+class FakeExtractor(SizeExtractor):
+    """只取括号前的数字，模拟尺码提取；判断哪些行含尺码序列用真实的规则"""
+    def __init__(self):
+        self.requested = []
+
+    def extract_sizes_batch(self, lines):
+        self.requested.extend(lines)
+        return [line.split('(')[0].rstrip() for line in lines]
+
+
+def test_sections_span_pages():
+    pages = [
+        "页眉\n#折叠边\n第1行: 上针\n第2行: 下针",
+        "页眉\n第3行: 上针\n#蕾丝花样\n第9行: 上针",
+    ]
+    sections = list(StreamingPipeline().run(pages))
+    assert [s['title'] for s in sections] == ['', '折叠边', '蕾丝花样']
+    assert sections[0]['content'] == '页眉\n'
+    assert sections[1]['content'] == '第1行: 上针\n第2行: 下针\n第3行: 上针\n'
+    assert sections[2]['content'] == '第9行: 上针\n'
+
+
+def test_brackets_carry_over_page_break():
+    pipeline = StreamingPipeline(size_extractor=FakeExtractor(), remove_repeated_lines=False)
+    pages = ["#衣身\n起 370 (406 - 442", "- 478)针\n第1行: 上针"]
+    sections = list(pipeline.run(pages))
+    assert sections == [{"title": "衣身", "content": "起 370\n第1行: 上针\n"}]
+
+
+def test_only_size_sequences_are_sent_to_the_extractor():
+    extractor = FakeExtractor()
+    pipeline = StreamingPipeline(size_extractor=extractor, remove_repeated_lines=False)
+    sections = list(pipeline.run(["#衣身\n按图解(见图1)编织\n起 370 (406-442-478)针"]))
+    assert extractor.requested == ["起 370 (406-442-478)针"]
+    assert sections == [{"title": "衣身", "content": "按图解(见图1)编织\n起 370\n"}]
+
+
+def test_first_section_emitted_before_last_page():
+    emitted = []
+
+    def pages():
+        yield "#A\n第1行: 上针\n#B\n第2行: 下针"
+        emitted.append('page 2 requested')
+        yield "第3行: 上针"
+
+    stream = StreamingPipeline(remove_repeated_lines=False).run(pages())
+    assert next(stream)['title'] == 'A'
+    assert emitted == []
+
+
+def test_bracket_carry_and_section_stream():
+    carry = BracketCarry()
+    assert carry.feed("a (1 -\n2) b\nc (") == ['a (1 - 2) b']
+    assert carry.close() == ['c (']
+
+    stream = SectionStream()
+    assert stream.feed(['前言', '＃标题', '内容']) == [{"title": "", "content": "前言\n"}]
+    assert stream.close() == [{"title": "标题", "content": "内容\n"}]
+
+    stream = SectionStream()
+    assert stream.feed(['', '#标题']) == []
+
+
+def test_instruction_lines_at_page_edges_are_kept():
+    remove = RepeatedLineFilter()
+    assert remove.feed("图解 第 1页\n奇数行: 上针\n第 2行: 下针") == "图解 第 1页\n奇数行: 上针\n第 2行: 下针"
+    # 页码变化的页眉仍然删除，页边重复的编织说明保留
+    assert remove.feed("图解 第 2页\n奇数行: 上针\n第 2行: 下针") == "奇数行: 上针\n第 2行: 下针"
+
+
+def test_text_without_titles_is_written_through(tmp_path):
+    output_file = tmp_path / 'extracted_sizes.txt'
+    count = StreamingPipeline(remove_repeated_lines=False).run_to_file(["开始编织\n第 1行: 下针"], str(output_file))
+    assert count == 1
+    assert output_file.read_text(encoding='utf-8') == "开始编织\n第 1行: 下针\n"
+
+
+def test_no_sections_keeps_existing_output(tmp_path):
+    output_file = tmp_path / 'extracted_sizes.txt'
+    output_file.write_text("#衣身\n第 1行: 下针\n", encoding='utf-8')
+    assert StreamingPipeline().run_to_file(["", "  "], str(output_file)) == 0
+    assert output_file.read_text(encoding='utf-8') == "#衣身\n第 1行: 下针\n"
+    assert os.listdir(tmp_path) == ['extracted_sizes.txt']
+
+
+def test_processed_text_through_pipeline():
+    with open(PROCESSED_TEXT, 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    # 每 40 行当作一页
+    pages = ['\n'.join(lines[i:i + 40]) for i in range(0, len(lines), 40)]
+    sections = list(StreamingPipeline().run(pages))
+    assert sections
+    content = ''.join(section['content'] for section in sections)
+    for line in lines:
+        if '行' in line and line.strip():
+            assert line.strip() in content
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from utils import profiling
+from utils.profiling import Profiler
+
+
+def allocate(count):
+    return [str(i) * 10 for i in range(count)]
+
+
+def test_nested_stages_report(tmp_path):
+    profiler = Profiler(str(tmp_path))
+    profiler.start()
+    kept = []
+    with profiler.stage('outer'):
+        for _ in range(2):
+            with profiler.stage('inner'):
+                kept.append(allocate(20000))
+    report = profiler.finish()
+
+    assert set(report['stages']) == {'outer', 'inner'}
+    inner = report['stages']['inner']
+    assert inner['calls'] == 2
+    assert inner['peak_traced_mb'] > 0
+    assert 'test_profiling.py' in inner['top_allocations'][0]['site']
+    assert any('allocate' in function['function'] for function in inner['top_functions'])
+    # 内层阶段运行时外层的 cProfile 暂停
+    assert not any('allocate' in function['function'] for function in report['stages']['outer']['top_functions'])
+    assert os.path.exists(inner['pstats_file'])
+    with open(tmp_path / 'report.json', encoding='utf-8') as f:
+        assert json.load(f)['stages']['inner']['calls'] == 2
+
+
+def test_stage_is_noop_without_profiling():
+    with profiling.stage('anything'):
+        pass
+    assert profiling.finish_profiling() is None
+
+
+def test_cli_profile_flag(tmp_path):
+    pytest.importorskip('click')
+    from click.testing import CliRunner
+    import cli
+
+    pattern = tmp_path / 'pattern.txt'
+    pattern.write_text('# 衣身\n第1行: 下针\n第2行: 上针\n', encoding='utf-8')
+    out_dir = tmp_path / 'profile'
+    result = CliRunner().invoke(cli.cli, ['--profile', '--profile-dir', str(out_dir), 'simulate', str(pattern)])
+    assert result.exit_code == 0, result.output
+    with open(out_dir / 'report.json', encoding='utf-8') as f:
+        report = json.load(f)
+    assert list(report['stages']) == ['simulate']
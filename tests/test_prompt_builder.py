@@ -0,0 +1,60 @@
+import pytest
+
+from utils.prompt_builder import (
+    CACHEABLE_PREFIX_MIN_TOKENS, PromptBudgetExceeded, PromptBuilder,
+    count_tokens, first_line, prompt_stats, reset_prompt_stats
+)
+
+RULES = "请按规则解析编织图解。" * 150
+NEXT_SECTION = "第 9行(反面): 上针\n第10行: 3下, 空加针, 右上2并1\n第11行: 上针\n"
+
+
+def setup_function():
+    reset_prompt_stats()
+
+
+def test_count_tokens():
+    assert count_tokens('') == 0
+    assert count_tokens('上针') >= 1
+    assert count_tokens('第 1行: 下针' * 10) > count_tokens('第 1行: 下针')
+
+
+def test_first_line_skips_blank_lines():
+    assert first_line("\n\n  第 9行: 上针 \n第10行: 下针") == "第 9行: 上针"
+    assert first_line(None) == ''
+
+
+def test_prefix_is_stable_and_content_last():
+    builder = PromptBuilder('test', RULES)
+    first = builder.messages("当前部分内容：\n第1行: 下针")
+    second = builder.messages("当前部分内容：\n第2行: 上针")
+    assert first[0] == second[0] == {"role": "system", "content": RULES}
+    assert second[1]["content"].endswith("第2行: 上针")
+    assert builder.text("片段").startswith(RULES)
+
+
+def test_context_slice_and_saved_tokens():
+    builder = PromptBuilder('test', RULES)
+    for _ in range(3):
+        messages = builder.messages(
+            "当前部分内容：\n第1行: 下针",
+            context=first_line(NEXT_SECTION), full_context=NEXT_SECTION
+        )
+    assert "第 9行" in messages[1]["content"] and "第11行" not in messages[1]["content"]
+
+    stats = prompt_stats()['test']
+    trimmed = 3 * (count_tokens(NEXT_SECTION) - count_tokens(first_line(NEXT_SECTION)))
+    assert stats["calls"] == 3
+    assert stats["trimmed_tokens"] == trimmed
+    # 第一次调用之后前缀可缓存（前缀足够长时）
+    cached = 2 * builder.prefix_tokens if builder.prefix_tokens >= CACHEABLE_PREFIX_MIN_TOKENS else 0
+    assert stats["cached_prefix_tokens"] == cached
+    assert stats["saved_tokens"] == trimmed + cached
+
+
+def test_budget_drops_context_then_raises():
+    builder = PromptBuilder('test', "规则", budget=count_tokens("规则") + count_tokens("内容") + 1)
+    assert builder.build("内容", context=NEXT_SECTION) == "内容"
+    with pytest.raises(PromptBudgetExceeded):
+        builder.build("内容" * 10)
+    assert prompt_stats()['test']["calls"] == 1
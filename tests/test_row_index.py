@@ -0,0 +1,31 @@
+from row_index import RowIndex
+
+
+SECTIONS = [
+    {"section_title": "衣身", "row_count": 0, "start_row": None, "end_row": None},
+    {"section_title": "折叠边", "row_count": 8, "start_row": 1, "end_row": 8},
+    {"section_title": "左前片", "row_count": 14, "start_row": 61, "end_row": 74},
+    {"section_title": "后片", "row_count": 11, "start_row": 62, "end_row": 72},
+]
+ROWS = {
+    "左前片": [{"type": "row", "row_number": 62, "instruction": "第 62行: 1下， 右上2并1，下针到底"}],
+}
+
+
+def test_lookup_returns_every_overlapping_section():
+    index = RowIndex(SECTIONS, ROWS)
+    row = index.lookup(62)
+    assert [entry["section_title"] for entry in row["sections"]] == ["左前片", "后片"]
+    assert row["sections"][0]["instruction"] == "第 62行: 1下， 右上2并1，下针到底"
+    assert row["sections"][1]["instruction"] is None
+    assert [entry["section_title"] for entry in index.lookup(73)["sections"]] == ["左前片"]
+    assert index.lookup(8)["sections"][0]["section_title"] == "折叠边"
+    assert index.lookup(9) is None
+    assert index.lookup(0) is None
+    assert index.lookup(75) is None
+
+
+def test_lookup_range_skips_gaps():
+    index = RowIndex(SECTIONS, ROWS)
+    rows = index.lookup_range(7, 62)
+    assert [row["row_number"] for row in rows] == [7, 8, 61, 62]
@@ -0,0 +1,96 @@
+import json
+import random
+
+import pytest
+
+from parser.row_offsets import RowOffsets
+from row_index import get_row_index
+from row_layout import RowLayout, get_row_layout
+
+
+def linear_ranges(row_counts):
+    """原 calculate_row_ranges 的逐个累加"""
+    current_row = 1
+    ranges = []
+    for row_count in row_counts:
+        if row_count > 0:
+            ranges.append((current_row, current_row + row_count - 1))
+            current_row += row_count
+        else:
+            ranges.append((current_row, current_row))
+    return ranges
+
+
+def test_offsets_match_linear_ranges_after_updates():
+    rng = random.Random(0)
+    row_counts = [rng.randrange(0, 30) for _ in range(50)]
+    offsets = RowOffsets(row_counts)
+    for _ in range(200):
+        index = rng.randrange(len(row_counts))
+        row_counts[index] = rng.randrange(0, 30)
+        offsets.set_row_count(index, row_counts[index])
+        assert [offsets.row_range(i) for i in range(len(row_counts))] == linear_ranges(row_counts)
+        assert offsets.total_rows == sum(row_counts)
+
+
+SECTIONS = [
+    {"section_title": "衣身", "row_count": 0, "start_row": None, "end_row": None},
+    {"section_title": "折叠边", "row_count": 8, "start_row": 1, "end_row": 8},
+    {"section_title": "蕾丝花样", "row_count": 51, "start_row": 9, "end_row": 59},
+    {"section_title": "左前片", "row_count": 14, "start_row": 61, "end_row": 74},
+    {"section_title": "左前领窝", "row_count": 12, "start_row": 75, "end_row": 86},
+    {"section_title": "后片", "row_count": 11, "start_row": 62, "end_row": 72},
+    {"section_title": "后领窝", "row_count": 22, "start_row": 74, "end_row": 95},
+]
+
+
+def test_layout_returns_only_affected_ranges(tmp_path):
+    edits_file = str(tmp_path / 'edits.jsonl')
+    layout = RowLayout(SECTIONS, edits_file, version=1)
+    assert layout.update_row_count(1, 8) == []
+    changed = layout.update_row_count(1, 10)
+    assert [(c["section_title"], c["start_row"], c["end_row"]) for c in changed] == [
+        ("折叠边", 1, 10), ("蕾丝花样", 11, 61), ("左前片", 63, 76), ("左前领窝", 77, 88)
+    ]
+    # 后片与左前片行号重叠，是另一串，不受影响
+    changed = layout.update_row_count(5, 13)
+    assert [(c["section_title"], c["start_row"], c["end_row"]) for c in changed] == [
+        ("后片", 62, 74), ("后领窝", 76, 97)
+    ]
+    assert layout.ranges()[0]["start_row"] is None
+    with pytest.raises(ValueError):
+        layout.update_row_count(0, 3)
+
+    # 同一版本的数据重放修改记录，其他版本忽略
+    assert RowLayout(SECTIONS, edits_file, version=1).section_range(2)["start_row"] == 11
+    assert RowLayout(SECTIONS, edits_file, version=2).section_range(2)["start_row"] == 9
+
+
+def test_moving_start_row_shifts_the_rest_of_the_run(tmp_path):
+    edits_file = str(tmp_path / 'edits.jsonl')
+    layout = RowLayout(SECTIONS, edits_file, version=1, total_rows=245)
+    changed = layout.update_range(3, 63, 76)
+    assert [(c["section_title"], c["start_row"], c["end_row"]) for c in changed] == [
+        ("左前片", 63, 76), ("左前领窝", 77, 88)
+    ]
+    # 只移动起始行，行数不变，总行数（各部分行数之和）不变，最后一行可能变化
+    assert layout.total_rows == 245
+    layout.update_row_count(4, 20)
+    assert layout.total_rows == 253
+    assert layout.last_row == 96
+
+    replayed = RowLayout(SECTIONS, edits_file, version=1, total_rows=245)
+    assert replayed.ranges() == layout.ranges()
+    assert replayed.total_rows == 253
+    with pytest.raises(ValueError):
+        layout.update_range(3, 70, 60)
+
+
+def test_edits_visible_in_row_index(tmp_path):
+    row_counts_file = tmp_path / 'row_counts.json'
+    row_counts_file.write_text(json.dumps({"sections": SECTIONS, "total_rows": 95}), encoding='utf-8')
+    edits_file = str(tmp_path / 'edits.jsonl')
+    get_row_layout(str(row_counts_file), edits_file).update_row_count(2, 53)
+    index = get_row_index(str(row_counts_file), None, edits_file)
+    assert [entry["section_title"] for entry in index.lookup(63)["sections"]] == ["左前片", "后片"]
+    assert index.lookup(61)["sections"][0]["section_title"] == "蕾丝花样"
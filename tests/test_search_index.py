@@ -0,0 +1,58 @@
+import threading
+
+from search_index import SearchIndex, tokenize
+
+
+def test_tokenize_normalizes_stitch_terms_and_counts():
+    tokens = tokenize("第 20 行:【左上 2 并1，右上二并一】")
+    assert '左上2并1' in tokens and '右上2并1' in tokens and '20行' in tokens
+    assert '左上' in tokens
+
+
+def test_search_and_incremental_reingest(tmp_path):
+    index = SearchIndex(str(tmp_path))
+    index.add_pattern('背心', [
+        {"title": "折叠边", "content": "第4行:【左上 2 并1，空加针】到最后1针\n"},
+        {"title": "左前片", "content": "第 62行: 1下， 右上2并1，下针到底\n"},
+    ])
+    index.add_pattern('毛衣', [{"title": "袖子", "content": "第 20 行: 左上二并一\n"}])
+    assert {(r["pattern_id"], r["title"]) for r in index.search("左上2并1")} == {("背心", "折叠边"), ("毛衣", "袖子")}
+    assert [r["title"] for r in index.search("左上二并一 20行")] == ["袖子"]
+
+    # 重新导入只替换这个图解的部分，另一个进程打开的索引从磁盘读到同样的结果
+    assert index.add_pattern('背心', [{"title": "折叠边", "content": "第 1行: 上针\n"}])
+    assert not index.add_pattern('背心', [{"title": "折叠边", "content": "第 1行: 上针\n"}])
+    assert [r["pattern_id"] for r in index.search("左上2并1")] == ["毛衣"]
+    assert [r["pattern_id"] for r in SearchIndex(str(tmp_path)).search("左上2并1")] == ["毛衣"]
+
+
+def test_search_while_reingesting_from_other_threads(tmp_path):
+    index = SearchIndex(str(tmp_path))
+    errors = []
+
+    def reingest(n):
+        try:
+            for i in range(30):
+                index.add_pattern(f'图解{n}', [
+                    {"title": "折叠边", "content": f"第{i}行:【左上 2 并1，空加针】到最后1针\n"},
+                    {"title": "后片", "content": "第 62行: 1下， 右上2并1，下针到底\n" * (i % 3 + 1)},
+                ])
+        except Exception as e:
+            errors.append(e)
+
+    def search():
+        try:
+            for _ in range(200):
+                for result in index.search('左上2并1'):
+                    assert result['title'] == '折叠边'
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reingest, args=(n,)) for n in range(3)]
+    threads += [threading.Thread(target=search) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(index.search('左上2并1')) == 3
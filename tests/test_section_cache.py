@@ -0,0 +1,54 @@
+from utils.section_cache import SectionCache
+
+
+def test_unchanged_sections_are_reused(tmp_path):
+    manifest = str(tmp_path / 'manifest.json')
+    sections = [{"title": "折叠边", "content": "第 1行: 上针\n"}, {"title": "蕾丝花样", "content": "第 9行: 上针\n"}]
+
+    cache = SectionCache(manifest, 'count_rows')
+    for section in sections:
+        assert cache.get(section) is None
+        cache.put(section, {"section_title": section["title"], "row_count": 1})
+    cache.save()
+
+    sections[1] = {"title": "蕾丝花样", "content": "第 9行: 上针\n第 10行: 下针\n"}
+    cache = SectionCache(manifest, 'count_rows')
+    assert cache.get(sections[0]) == {"section_title": "折叠边", "row_count": 1}
+    assert cache.get(sections[1]) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.save()
+
+    # 没用到的旧条目不会保留，不同 namespace 互不影响
+    assert len(SectionCache(manifest, 'count_rows').entries) == 1
+    assert SectionCache(manifest, 'parse_pattern').get(sections[0]) is None
+
+
+class FlakyExtractor:
+    """第一次处理“蕾丝花样”时出错（原样返回并计数），之后正常"""
+    def __init__(self):
+        self.errors = 0
+        self.calls = []
+
+    def process_knitting_pattern(self, text):
+        self.calls.append(text)
+        if '(' in text and self.calls.count(text) == 1:
+            self.errors += 1
+            return text
+        return text.replace('(9-11)', '9')
+
+
+def test_failed_extraction_is_not_cached(tmp_path):
+    from parser.knitting_parser import KnittingPatternParser
+
+    manifest = str(tmp_path / 'manifest.json')
+    pattern = "#折叠边\n第 1行: 上针\n#蕾丝花样\n第 9行: 加(9-11)针\n"
+    parser = KnittingPatternParser.__new__(KnittingPatternParser)
+    parser.size_extractor = FlakyExtractor()
+
+    first = parser.process_sections(pattern, manifest)
+    assert '(9-11)' in first[1]['content']
+
+    second = parser.process_sections(pattern, manifest)
+    assert '(9-11)' not in second[1]['content']
+    # 成功的部分第二次直接用缓存，出错的部分重新处理
+    assert len(parser.size_extractor.calls) == 3
@@ -0,0 +1,49 @@
+import json
+
+from ocr.selective_correction import SelectiveCorrector, merge_page_lines
+
+
+class FakeModels:
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def generate_content(self, model, contents, config=None):
+        self.prompts.append(contents)
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return type('Response', (), {'text': self.reply})()
+
+
+class FakeClient:
+    def __init__(self, reply):
+        self.models = FakeModels(reply)
+
+
+PAGES = [
+    [{"text": "第 1行: 下针", "conf": 96.0}, {"text": "第 2行: 上针", "conf": 93.0}],
+    [{"text": "第 3行: 左上2井1", "conf": 41.0}, {"text": "第 4行: 上针", "conf": 95.0},
+     {"text": "第 5行: 下针", "conf": 97.0}],
+]
+
+
+def test_only_low_confidence_lines_are_sent():
+    lines = merge_page_lines(PAGES)
+    client = FakeClient(json.dumps({"3": "第 3行: 左上2并1"}))
+    corrector = SelectiveCorrector(client, processor=type('Identity', (), {'process': lambda self, t: t})())
+
+    text, ok = corrector.correct(lines)
+
+    assert ok
+    assert text.split('\n') == ['第 1行: 下针', '第 2行: 上针', '', '第 3行: 左上2并1', '第 4行: 上针', '第 5行: 下针']
+    prompt = client.models.prompts[0]
+    assert '[3] 第 3行: 左上2井1' in prompt and '第 4行: 上针' in prompt
+    assert '第 2行' not in prompt and '第 5行' not in prompt
+    assert corrector.stats['low_confidence_lines'] == 1
+
+
+def test_llm_failure_keeps_local_text():
+    corrector = SelectiveCorrector(FakeClient(RuntimeError('timeout')))
+    text, ok = corrector.correct(merge_page_lines(PAGES))
+    assert not ok
+    assert '左上2井1' in text or '左上2并1' in text
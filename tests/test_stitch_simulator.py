@@ -0,0 +1,44 @@
+from parser.stitch_simulator import StitchSimulator, simulate_row
+
+
+def test_simulate_row_counts_decreases_and_repeats():
+    row = simulate_row('【左上 2 并1，空加针】到最后1针，1 下', 9, 4)
+    assert row["stitches_per_row"] == 9
+    row = simulate_row('1下， 右上2并1，下针到底一一剩45针', 46, 62)
+    assert row["stitches_per_row"] == 45
+    assert "warnings" not in row
+
+
+def test_parse_section_tracks_stitches_and_defers_unknown_lines():
+    simulator = StitchSimulator()
+    simulator.parse_section("用 3. 5mm 环针，起 20针\n左前片 10 针，后片 10 针。\n", "衣身")
+    result = simulator.parse_section(
+        "奇数行织上针\n"
+        "第 1行: 上针\n"
+        "第 2行: 1下， 右上2并1，下针到底一一剩9针\n"
+        "第 4行: 重复第2行一一剩8针\n"
+        "第 6行: 将织物对折后织到一起\n",
+        "左前片"
+    )
+    rows = {row["row_number"]: row for row in result["rows"] if row["type"] == "row"}
+    assert [rows[n]["stitches_per_row"] for n in range(1, 6)] == [10, 9, 9, 8, 8]
+    assert result["unresolved"] == ["第 6行: 将织物对折后织到一起"]
+    assert result["end_stitches"] == 8
+
+
+def test_rows_with_warnings_go_to_llm():
+    simulator = StitchSimulator(406)
+    result = simulator.parse_section(
+        "第 9行(反面): 上针\n"
+        "第10行: 3下,【(左上 2 并1) 3次，(空加针，1 下) 5 次，空加针，(右上2并1) 3次，1上】重复【 】再8 次，"
+        "直至剩 20针，(左上2 并1) 3 次，(空加针，1 下) 5 次，空加针，(右上2 并1)3次，3 下\n"
+        "第 11行: 上针一一405针\n",
+        "蕾丝花样"
+    )
+    rows = [row for row in result["rows"] if row["type"] == "row"]
+    assert [row["row_number"] for row in rows] == [9]
+    assert not any("warnings" in row for row in rows)
+    assert result["unresolved"][0].startswith("第10行")
+    # 针数提示和模拟结果不同时也交给 LLM，针数按提示校准
+    assert result["unresolved"][1] == "第 11行: 上针一一405针"
+    assert result["end_stitches"] == 405
@@ -0,0 +1,40 @@
+import importlib.util
+
+import pytest
+
+from ocr.tesseract_pool import PytesseractEngine, get_engine, parse_tesseract_config
+
+
+def test_parse_tesseract_config():
+    oem, psm, variables = parse_tesseract_config(
+        '--oem 3 --psm 6 -c preserve_interword_spaces=1 -c textord_min_linesize=2.5'
+    )
+    assert (oem, psm) == (3, 6)
+    assert variables == {"preserve_interword_spaces": "1", "textord_min_linesize": "2.5"}
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        get_engine('easyocr')
+
+
+@pytest.mark.skipif(importlib.util.find_spec('tesserocr') is not None, reason='tesserocr 已安装')
+def test_pool_falls_back_to_pytesseract_without_tesserocr():
+    engine = get_engine('pool', config='--psm 6')
+    assert isinstance(engine, PytesseractEngine)
+    assert get_engine('pool', config='--psm 6') is engine
+
+
+def test_group_words_into_lines():
+    from ocr.tesseract_pool import group_words
+    words = [
+        ((1, 1, 1), (1, 1), '第', 95.0), ((1, 1, 1), (1, 1), '1行:', 90.0), ((1, 1, 1), (1, 1), '下针', 62.5),
+        ((1, 1, 2), (1, 1), '185', 91.0), ((1, 1, 2), (1, 1), '(203', 88.0), ((1, 1, 2), (1, 1), '针', -1.0),
+        ((1, 2, 1), (1, 2), '重复', 99.0),
+    ]
+    assert group_words(words) == [
+        {"text": "第1行:下针", "conf": 62.5},
+        {"text": "185 (203针", "conf": 88.0},
+        {"text": "", "conf": None},
+        {"text": "重复", "conf": 99.0},
+    ]